@@ -27,61 +27,68 @@ class Comparable(type):
 
     def __init__(cls, name, bases, classdict):
         super(Comparable, cls).__init__(name, bases, classdict)
+        def defines(attr):
+            # not hasattr(cls,attr): in python 2.6+ it also finds the rich
+            # comparison methods of the metaclass (type)
+            for base in cls.__mro__:
+                if attr in base.__dict__:
+                    return True
+            return False
         def setIfUnset(attr,value):
-            if not hasattr(cls,attr): setattr(cls,attr,value)
-        if hasattr(cls,'__ne__'):
+            if not defines(attr): setattr(cls,attr,value)
+        if defines('__ne__'):
             setIfUnset('__eq__', lambda self,other: not self != other)
-            if hasattr(cls,'__gt__'):
+            if defines('__gt__'):
                 setIfUnset('__le__', lambda self,other: not self>other)
                 setIfUnset('__ge__',
                             lambda self,other: self>other or not self!=other)
                 setIfUnset('__lt__',
                             lambda self,other: not self>other and self!=other)
-            elif hasattr(cls,'__lt__'):
+            elif defines('__lt__'):
                 setIfUnset('__ge__', lambda self,other: not self<other)
                 setIfUnset('__gt__',
                             lambda self,other: not self<other and self!=other)
                 setIfUnset('__le__',
                             lambda self,other: self<other or not self!=other)
-            elif hasattr(cls,'__ge__'):
+            elif defines('__ge__'):
                 setIfUnset('__lt__', lambda self,other: not self>=other)
                 setIfUnset('__gt__',
                             lambda self,other: self>=other and self!=other)
                 setIfUnset('__le__',
                             lambda self,other: not (self>=other and self!=other))
-            elif hasattr(cls,'__le__'):
+            elif defines('__le__'):
                 setIfUnset('__gt__', lambda self,other: not self<=other)
                 setIfUnset('__ge__',
                             lambda self,other: not (self<=other and self!=other))
                 setIfUnset('__lt__',
                             lambda self,other: self<=other and self!=other)
-        elif hasattr(cls,'__eq__'):
+        elif defines('__eq__'):
             setIfUnset('__ne__', lambda self,other: not self == other)
-            if hasattr(cls,'__gt__'):
+            if defines('__gt__'):
                 setIfUnset('__le__', lambda self,other: not self>other)
                 setIfUnset('__ge__',
                             lambda self,other: self>other or self==other)
                 setIfUnset('__lt__',
                             lambda self,other: not (self>other or self==other))
-            elif hasattr(cls,'__lt__'):
+            elif defines('__lt__'):
                 setIfUnset('__ge__', lambda self,other: not self<other)
                 setIfUnset('__gt__',
                             lambda self,other: not (self<other or self==other))
                 setIfUnset('__le__',
                             lambda self,other: self<other or self==other)
-            elif hasattr(cls,'__ge__'):
+            elif defines('__ge__'):
                 setIfUnset('__lt__', lambda self,other: not self>=other)
                 setIfUnset('__gt__',
                             lambda self,other: self>=other and not self==other)
                 setIfUnset('__le__',
                             lambda self,other: not self>=other or self==other)
-            elif hasattr(cls,'__le__'):
+            elif defines('__le__'):
                 setIfUnset('__gt__', lambda self,other: not self<=other)
                 setIfUnset('__ge__',
                             lambda self,other: not self<=other or self==other)
                 setIfUnset('__lt__',
                             lambda self,other: self<=other and not self==other)
-        elif (hasattr(cls,'__gt__') or hasattr(cls,'__lt__')
-              or hasattr(cls,'__ge__') or hasattr(cls,'__le__')):
+        elif (defines('__gt__') or defines('__lt__')
+              or defines('__ge__') or defines('__le__')):
             raise TypeError("Potentially incosistent comparable; define __eq__"
                             " or __ne__ in class '%s'" % cls.__name__)
@@ -0,0 +1,925 @@
+'''A compressed set of non-negative integers.'''
+
+import sys
+import sets
+import struct
+import operator
+from array import array
+from bisect import bisect_left, bisect_right
+from binascii import hexlify, unhexlify
+from itertools import izip, ifilter
+
+__author__ = "George Sakkis <gsakkis@rutgers.edu>"
+__all__ = ['BitmapSet']
+
+_set_types = (set, frozenset, sets.BaseSet)
+
+# the maximum cardinality of an array container
+_ARRAY_MAX = 4096
+# the size in bytes of a bitmap container (2**16 bits)
+_BITMAP_BYTES = 8192
+# the maximum high 48 bits of an element
+_MAX_KEY = 2**48 - 1
+# the serialized header of a container: key, kind, size
+_HEADER = struct.Struct('<QBI')
+
+# the positions of the set bits of each byte
+_BITS = [tuple([bit for bit in xrange(8) if byte >> bit & 1])
+         for byte in xrange(256)]
+# translation table from each byte to the number of its set bits
+_POPCOUNT = ''.join([chr(len(bits)) for bits in _BITS])
+
+
+class BitmapSet(object):
+    '''A set of integers in C{range(2**64)}, compressed as in Roaring bitmaps.
+
+    The elements are grouped into chunks by their high 48 bits, and the low
+    16 bits of the elements of each chunk are stored in one of three
+    containers:
+        - a sorted C{array('H')}, for chunks of up to 4096 elements (2 bytes
+          per element);
+        - a bitmap of 2**16 bits (8 KiB), for denser chunks;
+        - a list of runs of consecutive integers, for chunks that take less
+          space this way.
+
+    Compared to the builtin C{set}, which takes 50-70 bytes per integer,
+    a C{BitmapSet} takes at most 2 bytes per element (plus a small overhead
+    per chunk) and much less for dense ranges of integers. The binary
+    operations between C{BitmapSet}s (C{&}, C{|}, C{-}, C{^}) work on whole
+    containers at a time instead of on single elements, and the cardinality
+    is cached, so C{len} takes constant time.
+
+    C{BitmapSet}s support the operations of C{set}; their iteration order is
+    ascending (so they can be passed to L{datastructs.sortediters}), and
+    L{pop} removes the largest element. L{tostring} and L{fromstring}
+    convert them to and from a compact byte string, which is also used for
+    pickling.
+    '''
+
+    __slots__ = ['_keys', '_containers', '_len']
+
+    def __init__(self, iterable=()):
+        '''Initialize the set with the elements of an iterable.
+
+        @raise TypeError: If an element is not equal to an integer.
+        @raise ValueError: If an element is not in C{range(2**64)}.
+        '''
+        self._keys, self._containers, self._len = [], [], 0
+        if isinstance(iterable, BitmapSet):
+            self._keys = iterable._keys[:]
+            self._containers = [c.copy() for c in iterable._containers]
+            self._len = iterable._len
+        else:
+            self._build(iterable)
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        for key,container in izip(self._keys, self._containers):
+            high = key << 16
+            for low in container:
+                yield high | low
+
+    def __contains__(self, element):
+        split = _split(element)
+        if split is None:
+            return False
+        key,low = split
+        keys = self._keys
+        i = bisect_left(keys, key)
+        return i < len(keys) and keys[i] == key and low in self._containers[i]
+
+    def __repr__(self):
+        return '%s(%r)' % (self.__class__.__name__, list(self))
+
+    def __reduce__(self):
+        return (self.__class__, (), self.tostring())
+
+    def __setstate__(self, data):
+        other = self.fromstring(data)
+        self._keys, self._containers, self._len = (other._keys,
+                                                   other._containers,
+                                                   other._len)
+
+    #--- Comparisons ---------------------------------------------------------
+
+    def __eq__(self, other):
+        if isinstance(other, BitmapSet):
+            return (self._len == other._len and self._keys == other._keys
+                    and self._containers == other._containers)
+        if isinstance(other, _set_types):
+            return len(self) == len(other) and self.issubset(other)
+        return False
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        raise TypeError("can't hash a BitmapSet")
+
+    def issubset(self, other):
+        '''Report whether another set contains this set.'''
+        if isinstance(other, BitmapSet):
+            return len(self) <= len(other) and not self._apply('-', other)
+        if not isinstance(other, _set_types):
+            other = set(other)
+        if len(self) > len(other):
+            return False
+        for element in self:
+            if element not in other:
+                return False
+        return True
+
+    def issuperset(self, other):
+        '''Report whether this set contains another set.'''
+        if isinstance(other, BitmapSet):
+            return other.issubset(self)
+        for element in other:
+            if element not in self:
+                return False
+        return True
+
+    def __le__(self, other):
+        self._binary_sanity_check(other)
+        return self.issubset(other)
+
+    def __ge__(self, other):
+        self._binary_sanity_check(other)
+        return self.issuperset(other)
+
+    def __lt__(self, other):
+        self._binary_sanity_check(other)
+        return len(self) < len(other) and self.issubset(other)
+
+    def __gt__(self, other):
+        self._binary_sanity_check(other)
+        return len(self) > len(other) and self.issuperset(other)
+
+    #--- Standard set operations ---------------------------------------------
+
+    def __or__(self, other):
+        """Return the union of two sets as a new set.
+
+        (I.e. all elements that are in either set.)
+        """
+        if not isinstance(other, (BitmapSet,) + _set_types):
+            return NotImplemented
+        return self.union(other)
+
+    def union(self, other):
+        '''Return the union of two sets as a new set.
+
+        (I.e. all elements that are in either set.)
+        '''
+        return self._apply('|', self._bitmapSet(other))
+
+    def __and__(self, other):
+        """Return the intersection of two sets as a new set.
+
+        (I.e. all elements that are in both sets.)
+        """
+        if not isinstance(other, (BitmapSet,) + _set_types):
+            return NotImplemented
+        return self.intersection(other)
+
+    def intersection(self, other):
+        '''Return the intersection of two sets as a new set.
+
+        (I.e. all elements that are in both sets.)
+        '''
+        if isinstance(other, BitmapSet):
+            return self._apply('&', other)
+        return self.__class__(ifilter(self.__contains__, other))
+
+    def __xor__(self, other):
+        """Return the symmetric difference of two sets as a new set.
+
+        (I.e. all elements that are in exactly one of the sets.)
+        """
+        if not isinstance(other, (BitmapSet,) + _set_types):
+            return NotImplemented
+        return self.symmetric_difference(other)
+
+    def symmetric_difference(self, other):
+        '''Return the symmetric difference of two sets as a new set.
+
+        (I.e. all elements that are in exactly one of the sets.)
+        '''
+        return self._apply('^', self._bitmapSet(other))
+
+    def __sub__(self, other):
+        """Return the difference of two sets as a new set.
+
+        (I.e. all elements that are in this set and not in the other.)
+        """
+        if not isinstance(other, (BitmapSet,) + _set_types):
+            return NotImplemented
+        return self.difference(other)
+
+    def difference(self, other):
+        '''Return the difference of two sets as a new set.
+
+        (I.e. all elements that are in this set and not in the other.)
+        '''
+        if isinstance(other, BitmapSet):
+            return self._apply('-', other)
+        result = self.copy()
+        result.difference_update(other)
+        return result
+
+    # the operations with other kinds of sets on the left return a set of
+    # the same kind as the left operand
+    def __ror__(self, other):
+        if not isinstance(other, _set_types):
+            return NotImplemented
+        return other.union(self)
+
+    def __rand__(self, other):
+        if not isinstance(other, _set_types):
+            return NotImplemented
+        return other.intersection(self)
+
+    def __rxor__(self, other):
+        if not isinstance(other, _set_types):
+            return NotImplemented
+        return other.symmetric_difference(self)
+
+    def __rsub__(self, other):
+        if not isinstance(other, _set_types):
+            return NotImplemented
+        return other.difference(self)
+
+    #--- Mutating set operations ---------------------------------------------
+
+    def __ior__(self, other):
+        '''Update a set with the union of itself and another.'''
+        self._binary_sanity_check(other)
+        self.update(other)
+        return self
+
+    def update(self, *others):
+        '''Update a set with the union of itself and others.'''
+        for other in others:
+            self._apply('|', self._bitmapSet(other), inplace=True)
+
+    union_update = update
+
+    def __iand__(self, other):
+        '''Update a set with the intersection of itself and another.'''
+        self._binary_sanity_check(other)
+        self.intersection_update(other)
+        return self
+
+    def intersection_update(self, other):
+        '''Update a set with the intersection of itself and another.'''
+        if not isinstance(other, BitmapSet):
+            other = self.intersection(other)
+        self._apply('&', other, inplace=True)
+
+    def __ixor__(self, other):
+        '''Update a set with the symmetric difference of itself and another.'''
+        self._binary_sanity_check(other)
+        self.symmetric_difference_update(other)
+        return self
+
+    def symmetric_difference_update(self, other):
+        '''Update a set with the symmetric difference of itself and another.'''
+        self._apply('^', self._bitmapSet(other), inplace=True)
+
+    def __isub__(self, other):
+        '''Remove all elements of another set from this set.'''
+        self._binary_sanity_check(other)
+        self.difference_update(other)
+        return self
+
+    def difference_update(self, other):
+        '''Remove all elements of another set from this set.'''
+        if isinstance(other, BitmapSet):
+            self._apply('-', other, inplace=True)
+        else:
+            for element in other:
+                self.discard(element)
+
+    #--- Other mutating operations -------------------------------------------
+
+    def add(self, element):
+        '''Add an element to a set.
+
+        This has no effect if the element is already present.
+
+        @raise TypeError: If the element is not equal to an integer.
+        @raise ValueError: If the element is not in C{range(2**64)}.
+        '''
+        try: key = element >> 16
+        except TypeError:
+            element = _integer(element)
+            key = element >> 16
+        if not 0 <= key <= _MAX_KEY:
+            raise ValueError('BitmapSet elements must be in range(2**64)')
+        low = element & 0xFFFF
+        keys = self._keys
+        i = bisect_left(keys, key)
+        if i < len(keys) and keys[i] == key:
+            container = self._containers[i]
+            if container.add(low):
+                self._len += 1
+                self._containers[i] = container.normalized()
+        else:
+            keys.insert(i, key)
+            self._containers.insert(i, _ArrayContainer(array('H', [low])))
+            self._len += 1
+
+    def discard(self, element):
+        '''Remove an element from a set if it is a member.
+
+        If the element is not a member, do nothing.
+        '''
+        split = _split(element)
+        if split is None:
+            return
+        key,low = split
+        keys = self._keys
+        i = bisect_left(keys, key)
+        if i < len(keys) and keys[i] == key:
+            container = self._containers[i]
+            if container.discard(low):
+                self._len -= 1
+                if container:
+                    self._containers[i] = container.normalized()
+                else:
+                    del keys[i]
+                    del self._containers[i]
+
+    def remove(self, element):
+        '''Remove an element from a set; it must be a member.
+
+        @raise KeyError: If the element is not a member.
+        '''
+        length = self._len
+        self.discard(element)
+        if self._len == length:
+            raise KeyError(element)
+
+    def pop(self):
+        '''Remove and return the largest element of the set.
+
+        @raise KeyError: If the set is empty.
+        '''
+        if not self._len:
+            raise KeyError('pop from an empty set')
+        element = self._keys[-1] << 16 | self._containers[-1].last()
+        self.discard(element)
+        return element
+
+    def clear(self):
+        '''Remove all elements from this set.'''
+        self._keys, self._containers, self._len = [], [], 0
+
+    def optimize(self):
+        '''Convert each container to its most compact kind.
+
+        The sets that are built from iterables and the results of the binary
+        operations between arrays use arrays and bitmaps only, and adding
+        elements one by one never creates runs either; this converts the
+        chunks of consecutive integers to runs (e.g. after
+        C{BitmapSet(xrange(10**6))}).
+        '''
+        self._containers = [_container(c.tolong()) for c in self._containers]
+
+    #--- Copying and serialization -------------------------------------------
+
+    def copy(self):
+        '''Return a shallow copy of a set.'''
+        return self.__class__(self)
+
+    __copy__ = copy
+
+    def __deepcopy__(self, memo):
+        # the elements are immutable
+        return self.copy()
+
+    def tostring(self):
+        '''Return a compact and platform independent byte string of the set.
+
+        L{fromstring} converts it back to a set.
+        '''
+        chunks = []
+        for key,container in izip(self._keys, self._containers):
+            chunks.append(_HEADER.pack(key, container.kind, container.size()))
+            chunks.append(container.tostring())
+        return ''.join(chunks)
+
+    @classmethod
+    def fromstring(cls, data):
+        '''Return a set from a string returned by L{tostring}.'''
+        self = cls()
+        offset = 0
+        while offset < len(data):
+            key,kind,size = _HEADER.unpack_from(data, offset)
+            offset += _HEADER.size
+            container,offset = _KINDS[kind].fromstring(data, offset, size)
+            self._keys.append(key)
+            self._containers.append(container)
+        self._len = sum(map(len, self._containers))
+        return self
+
+    #--- Assorted helpers ----------------------------------------------------
+
+    def _build(self, iterable):
+        # fill an empty set with the elements of iterable
+        groups = {}
+        for element in iterable:
+            try: key = element >> 16
+            except TypeError:
+                element = _integer(element)
+                key = element >> 16
+            try: groups[key].append(element & 0xFFFF)
+            except KeyError:
+                groups[key] = [element & 0xFFFF]
+        keys = sorted(groups)
+        if keys and not 0 <= keys[0] <= keys[-1] <= _MAX_KEY:
+            raise ValueError('BitmapSet elements must be in range(2**64)')
+        self._keys = keys
+        self._containers = [_containerOf(sorted(set(groups[key])))
+                            for key in keys]
+        self._len = sum(map(len, self._containers))
+
+    def _apply(self, op, other, inplace=False):
+        # combine the containers of self and other (a BitmapSet) with op;
+        # return the result as a new set, or store it in self if inplace
+        keys1,containers1 = self._keys, self._containers
+        keys2,containers2 = other._keys, other._containers
+        keepLeft = op != '&'
+        keepRight = op in ('|', '^')
+        n1,n2 = len(keys1), len(keys2)
+        keys,containers = [], []
+        i = j = 0
+        while i < n1 or j < n2:
+            if j == n2 or i < n1 and keys1[i] < keys2[j]:
+                if keepLeft:
+                    keys.append(keys1[i])
+                    if inplace:
+                        containers.append(containers1[i])
+                    else:
+                        containers.append(containers1[i].copy())
+                i += 1
+            elif i == n1 or keys2[j] < keys1[i]:
+                if keepRight:
+                    keys.append(keys2[j])
+                    containers.append(containers2[j].copy())
+                j += 1
+            else:
+                container = _combine(op, containers1[i], containers2[j])
+                if container is not None:
+                    keys.append(keys1[i])
+                    containers.append(container)
+                i += 1
+                j += 1
+        if inplace:
+            result = self
+        else:
+            result = self.__class__()
+        result._keys, result._containers = keys, containers
+        result._len = sum(map(len, containers))
+        return result
+
+    def _bitmapSet(self, iterable):
+        if isinstance(iterable, BitmapSet):
+            return iterable
+        return self.__class__(iterable)
+
+    def _binary_sanity_check(self, other):
+        # Check that the other argument to a binary operation is also
+        # a set, raising a TypeError otherwise.
+        if not isinstance(other, (BitmapSet,) + _set_types):
+            raise TypeError('Binary operation only permitted between sets')
+
+
+#----- containers -------------------------------------------------------------
+
+class _Container(object):
+    '''The low 16 bits of the elements of a chunk.
+
+    Besides the methods of sets, containers provide C{last()} (the largest
+    element), C{tolong()} (a long whose bit i is set iff i is an element),
+    C{normalized()} (a container that satisfies the limits of its kind, e.g.
+    an array instead of a bitmap that became sparse) and C{size()} and
+    C{tostring()} for serialization.
+    '''
+
+    __slots__ = []
+
+    def __eq__(self, other):
+        return len(self) == len(other) and self.tolong() == other.tolong()
+
+    def __ne__(self, other):
+        return not self == other
+
+
+class _ArrayContainer(_Container):
+
+    __slots__ = ['values']
+    kind = 0
+
+    def __init__(self, values):
+        self.values = values
+
+    def __len__(self):
+        return len(self.values)
+
+    def __iter__(self):
+        return iter(self.values)
+
+    def __contains__(self, low):
+        values = self.values
+        i = bisect_left(values, low)
+        return i < len(values) and values[i] == low
+
+    def __eq__(self, other):
+        if other.__class__ is _ArrayContainer:
+            return self.values == other.values
+        return _Container.__eq__(self, other)
+
+    def add(self, low):
+        values = self.values
+        i = bisect_left(values, low)
+        if i < len(values) and values[i] == low:
+            return False
+        values.insert(i, low)
+        return True
+
+    def discard(self, low):
+        values = self.values
+        i = bisect_left(values, low)
+        if i < len(values) and values[i] == low:
+            del values[i]
+            return True
+        return False
+
+    def last(self):
+        return self.values[-1]
+
+    def copy(self):
+        return _ArrayContainer(self.values[:])
+
+    def tolong(self):
+        return _bytesToLong(_bitmapOf(self.values).tostring())
+
+    def normalized(self):
+        if len(self.values) > _ARRAY_MAX:
+            return _BitmapContainer(_bitmapOf(self.values), len(self.values))
+        return self
+
+    def size(self):
+        return len(self.values)
+
+    def tostring(self):
+        return _pack(self.values)
+
+    @classmethod
+    def fromstring(cls, data, offset, size):
+        end = offset + 2*size
+        return cls(_unpack(data[offset:end])), end
+
+
+class _BitmapContainer(_Container):
+
+    __slots__ = ['bits', 'count']
+    kind = 1
+
+    def __init__(self, bits, count):
+        self.bits = bits
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return iter(_positions(self.bits.tostring()))
+
+    def __contains__(self, low):
+        return bool(self.bits[low >> 3] >> (low & 7) & 1)
+
+    def __eq__(self, other):
+        if other.__class__ is _BitmapContainer:
+            return self.bits.tostring() == other.bits.tostring()
+        return _Container.__eq__(self, other)
+
+    def add(self, low):
+        i,mask = low >> 3, 1 << (low & 7)
+        byte = self.bits[i]
+        if byte & mask:
+            return False
+        self.bits[i] = byte | mask
+        self.count += 1
+        return True
+
+    def discard(self, low):
+        i,mask = low >> 3, 1 << (low & 7)
+        byte = self.bits[i]
+        if not byte & mask:
+            return False
+        self.bits[i] = byte & ~mask
+        self.count -= 1
+        return True
+
+    def last(self):
+        data = self.bits.tostring().rstrip('\x00')
+        return 8 * (len(data)-1) + _BITS[ord(data[-1])][-1]
+
+    def copy(self):
+        return _BitmapContainer(self.bits[:], self.count)
+
+    def tolong(self):
+        return _bytesToLong(self.bits.tostring())
+
+    def normalized(self):
+        if self.count <= _ARRAY_MAX:
+            return _ArrayContainer(array('H', _positions(self.bits.tostring())))
+        return self
+
+    def size(self):
+        return self.count
+
+    def tostring(self):
+        return self.bits.tostring()
+
+    @classmethod
+    def fromstring(cls, data, offset, size):
+        end = offset + _BITMAP_BYTES
+        return cls(array('B', data[offset:end]), size), end
+
+
+class _RunContainer(_Container):
+
+    # the runs are maximal: starts[i+1] > lasts[i] + 1
+    __slots__ = ['starts', 'lasts', 'count']
+    kind = 2
+
+    def __init__(self, starts, lasts, count):
+        self.starts = starts
+        self.lasts = lasts
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        for start,last in izip(self.starts, self.lasts):
+            for low in xrange(start, last+1):
+                yield low
+
+    def __contains__(self, low):
+        i = bisect_right(self.starts, low) - 1
+        return i >= 0 and low <= self.lasts[i]
+
+    def __eq__(self, other):
+        if other.__class__ is _RunContainer:
+            return self.starts == other.starts and self.lasts == other.lasts
+        return _Container.__eq__(self, other)
+
+    def add(self, low):
+        starts,lasts = self.starts, self.lasts
+        i = bisect_right(starts, low) - 1
+        if i >= 0 and low <= lasts[i]:
+            return False
+        joinLeft = i >= 0 and lasts[i] == low - 1
+        joinRight = i+1 < len(starts) and starts[i+1] == low + 1
+        if joinLeft and joinRight:
+            lasts[i] = lasts[i+1]
+            del starts[i+1]
+            del lasts[i+1]
+        elif joinLeft:
+            lasts[i] = low
+        elif joinRight:
+            starts[i+1] = low
+        else:
+            starts.insert(i+1, low)
+            lasts.insert(i+1, low)
+        self.count += 1
+        return True
+
+    def discard(self, low):
+        starts,lasts = self.starts, self.lasts
+        i = bisect_right(starts, low) - 1
+        if i < 0 or low > lasts[i]:
+            return False
+        start,last = starts[i], lasts[i]
+        if start == last:
+            del starts[i]
+            del lasts[i]
+        elif low == start:
+            starts[i] = low + 1
+        elif low == last:
+            lasts[i] = low - 1
+        else:
+            lasts[i] = low - 1
+            starts.insert(i+1, low + 1)
+            lasts.insert(i+1, last)
+        self.count -= 1
+        return True
+
+    def last(self):
+        return self.lasts[-1]
+
+    def copy(self):
+        return _RunContainer(self.starts[:], self.lasts[:], self.count)
+
+    def tolong(self):
+        n = 0L
+        for start,last in izip(self.starts, self.lasts):
+            n |= ((1L << (last - start + 1)) - 1) << start
+        return n
+
+    def normalized(self):
+        if 4 * len(self.starts) < min(2 * self.count, _BITMAP_BYTES):
+            return self
+        return _container(self.tolong())
+
+    def size(self):
+        return len(self.starts)
+
+    def tostring(self):
+        return _pack(self.starts) + _pack(self.lasts)
+
+    @classmethod
+    def fromstring(cls, data, offset, size):
+        middle,end = offset + 2*size, offset + 4*size
+        starts,lasts = _unpack(data[offset:middle]), _unpack(data[middle:end])
+        count = sum(lasts) - sum(starts) + size
+        return cls(starts, lasts, count), end
+
+
+_KINDS = [_ArrayContainer, _BitmapContainer, _RunContainer]
+
+_SET_OPS = {'&': operator.and_, '|': operator.or_, '^': operator.xor,
+            '-': operator.sub}
+_LONG_OPS = {'&': operator.and_, '|': operator.or_, '^': operator.xor,
+             '-': lambda x,y: x & ~y}
+
+
+def _split(element):
+    '''Return the key and the low 16 bits of an element, or None if it is not
+    equal to an integer (so C{1.0} is split as C{1}, and C{1.5} gives None).'''
+    try: return element >> 16, element & 0xFFFF
+    except TypeError:
+        try: n = _integer(element)
+        except TypeError:
+            return None
+        return n >> 16, n & 0xFFFF
+
+
+def _integer(element):
+    # return the integer that is equal to element (e.g. 1 for 1.0), or raise
+    # TypeError if there is none
+    try: n = int(element)
+    except (TypeError, ValueError, OverflowError):
+        n = None
+    if n is None or n != element:
+        raise TypeError('BitmapSet elements must be integers, not %r'
+                        % (element,))
+    return n
+
+
+def _combine(op, container1, container2):
+    # return the container of the result of op, or None if it is empty
+    if op == '&' and container2.__class__ is _ArrayContainer:
+        container1,container2 = container2,container1
+    if container1.__class__ is _ArrayContainer:
+        if container2.__class__ is _ArrayContainer:
+            return _containerOf(sorted(_SET_OPS[op](set(container1.values),
+                                                    set(container2.values))))
+        # look up the few elements of the array in the other container
+        if op == '&':
+            return _containerOf(filter(container2.__contains__,
+                                       container1.values))
+        if op == '-':
+            return _containerOf([low for low in container1.values
+                                 if low not in container2])
+    return _container(_LONG_OPS[op](container1.tolong(), container2.tolong()))
+
+
+def _containerOf(values):
+    # return a container of the sorted distinct values, or None if empty
+    if not values:
+        return None
+    if len(values) <= _ARRAY_MAX:
+        return _ArrayContainer(array('H', values))
+    return _BitmapContainer(_bitmapOf(values), len(values))
+
+
+def _container(n):
+    # return the most compact container of the set bits of n, or None if 0
+    if not n:
+        return None
+    data = _longToBytes(n, _BITMAP_BYTES)
+    count = _popcount(data)
+    # each run starts and ends (one past its last element) at a bit that
+    # differs from the bit before it
+    edges = _longToBytes(n ^ (n << 1), _BITMAP_BYTES + 1)
+    if 4 * (_popcount(edges) // 2) < min(2 * count, _BITMAP_BYTES):
+        edges = _positions(edges)
+        return _RunContainer(array('H', edges[::2]),
+                             array('H', [edge-1 for edge in edges[1::2]]),
+                             count)
+    if count <= _ARRAY_MAX:
+        return _ArrayContainer(array('H', _positions(data)))
+    return _BitmapContainer(array('B', data), count)
+
+
+#----- bit twiddling ----------------------------------------------------------
+# bitmaps are byte strings where bit i is bit i%8 of byte i//8
+
+def _bitmapOf(values):
+    bits = array('B', '\x00' * _BITMAP_BYTES)
+    for low in values:
+        bits[low >> 3] |= 1 << (low & 7)
+    return bits
+
+
+def _positions(data):
+    # the sorted positions of the set bits of a bitmap
+    positions = []
+    extend = positions.extend
+    offset = 0
+    for byte in array('B', data):
+        if byte:
+            extend([offset + bit for bit in _BITS[byte]])
+        offset += 8
+    return positions
+
+
+def _popcount(data):
+    return sum(array('B', data.translate(_POPCOUNT)))
+
+
+def _bytesToLong(data):
+    return long(hexlify(data[::-1]), 16)
+
+
+def _longToBytes(n, size):
+    return unhexlify(('%x' % n).zfill(2*size))[::-1]
+
+
+def _pack(values):
+    # array('H') to little endian bytes
+    if sys.byteorder == 'big':
+        values = values[:]
+        values.byteswap()
+    return values.tostring()
+
+
+def _unpack(data):
+    values = array('H')
+    values.fromstring(data)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+
+if __name__ == '__main__':
+    import time
+    import random
+    import cPickle as pickle
+
+    def memory(x):
+        # approximate size in bytes, including the int objects of sets
+        if not isinstance(x, BitmapSet):
+            return sys.getsizeof(x) + len(x) * sys.getsizeof(universe)
+        size = sys.getsizeof(x._keys) + sys.getsizeof(x._containers)
+        for c in x._containers:
+            size += sys.getsizeof(c) + sum([sys.getsizeof(getattr(c, attr))
+                                            for attr in c.__slots__])
+        return size
+
+    universe = 2**22
+
+    def benchmark(n=1000000):
+        print '%d random ids in range(%d):' % (n, universe)
+        ids1 = random.sample(xrange(universe), n)
+        ids2 = random.sample(xrange(universe), n)
+        for name,factory in ('set', set), ('BitmapSet', BitmapSet):
+            start = time.time()
+            x,y = factory(ids1), factory(ids2)
+            timings = [time.time() - start]
+            for op in operator.and_, operator.or_, operator.sub:
+                start = time.time()
+                op(x, y)
+                timings.append(time.time() - start)
+            start = time.time()
+            for i in xrange(0, universe, universe // 100000):
+                i in x
+            timings.append(time.time() - start)
+            sizes = (memory(x), len(pickle.dumps(x, 2)))
+            print ('  %-10s build %.3fs, & %.3fs, | %.3fs, - %.3fs, '
+                   '100000 lookups %.3fs\n'
+                   '             %.1f bytes/element in memory, %.1f pickled'
+                   % ((name,) + tuple(timings) +
+                      tuple([float(size) / len(x) for size in sizes])))
+        x = BitmapSet(xrange(n))
+        x.optimize()
+        print '  BitmapSet(xrange(%d)) pickled: %d bytes' % (
+            n, len(pickle.dumps(x, 2)))
+
+    benchmark()
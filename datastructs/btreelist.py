@@ -0,0 +1,456 @@
+'''A list type stored in a B+tree, for fast insertions and deletions.'''
+
+from bisect import bisect_left, bisect_right
+
+from datastructs.listmixin import ListMixin
+
+__author__ = "George Sakkis <gsakkis@rutgers.edu>"
+__all__ = ['BTreeList']
+
+
+class BTreeList(ListMixin):
+    '''A mutable sequence with the interface of C{list}, stored in a B+tree.
+
+    The elements are kept in the leaves of a balanced tree, 32 to 64 per
+    leaf; each internal node has 32 to 64 children and knows the number of
+    elements under each child. Compared to C{list}:
+     - Indexing and item assignment take O(log n) instead of O(1) time.
+     - Insertion and deletion of any slice of length k take O(k + log n)
+       instead of O(n) time; e.g. C{insert} and C{pop} are O(log n)
+       anywhere in the list.
+     - Slicing (with step 1) takes O(log n) time and concatenation of two
+       BTreeLists (L{__add__}, L{__iadd__}, L{extend}) O(log n + log m)
+       time, since the result shares most of its nodes with the operands.
+     - L{copy} takes constant time: the copies share all the nodes and a
+       node is copied when it is first modified through one of them
+       (copy-on-write).
+    '''
+
+    def __init__(self, iterable=()):
+        # self._owner: the token of the nodes that belong exclusively to this
+        # list and can be modified in place. Whenever nodes start to be
+        # shared with another list (or within the same list), the token is
+        # renewed, so that they are copied before they are modified.
+        self._owner = object()
+        if isinstance(iterable, BTreeList):
+            self._root, self._height = iterable._share()
+        else:
+            self._root, self._height = _build(list(iterable), self._owner)
+
+    def copy(self):
+        '''Return a shallow copy of this list in constant time.'''
+        return self._new(*self._share())
+
+    __copy__ = copy
+
+    def __reduce__(self):
+        return (self.__class__, (list(self),))
+
+    def __len__(self):
+        return self._root.size
+
+    def __iter__(self):
+        return _iterNode(self._root, self._height)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            (start, end, step) = self._tuple_from_slice(i)
+            if step is None:
+                # the slice shares nodes with this list
+                root, height = self._share()
+                left = _split(root, height, start)[1]
+                return self._new(*_split(left[0], left[1], end - start)[0])
+            return ListMixin.__getitem__(self, i)
+        return self._get_element(self._fix_index(i))
+
+    def __setitem__(self, i, value):
+        if isinstance(i, slice):
+            (start, end, step) = self._tuple_from_slice(i)
+            if step is None:
+                if isinstance(value, BTreeList):
+                    self._splice(start, end, value._share())
+                    return
+                value = list(value)
+                if not (start == end and len(value) == 1 and
+                        self._resizeLeaf(start, 1, value[0])):
+                    self._splice(start, end, _build(value))
+                return
+        ListMixin.__setitem__(self, i, value)
+
+    def __iadd__(self, other):
+        if isinstance(other, BTreeList):
+            self._splice(len(self), len(self), other._share())
+        else:
+            self._splice(len(self), len(self), _build(list(other)))
+        return self
+
+    def extend(self, other):
+        self += other
+
+    def reverse(self):
+        self[:] = list(self)[::-1]
+
+    def index(self, x, i=0, j=None):
+        (i, j, ignore) = self._tuple_from_slice(slice(i, j))
+        elements = []
+        _collect(self._root, self._height, i, j, elements)
+        try: return i + elements.index(x)
+        except ValueError:
+            raise ValueError('index(x): x not in list')
+
+    def __add__(self, other):
+        if isinstance(other, BTreeList):
+            return self._new(*_join(self._share(), other._share()))
+        return ListMixin.__add__(self, other)
+
+    def __imul__(self, num):
+        result = _EMPTY_TREE
+        tree = self._share()
+        # repeated doubling: O(log n * log num)
+        while num > 0:
+            if num & 1:
+                result = _join(result, tree)
+            num >>= 1
+            if num:
+                tree = _join(tree, tree)
+        self._root, self._height = result
+        return self
+
+    def __mul__(self, num):
+        return self.copy().__imul__(num)
+
+    #---- ListMixin hooks ----------------------------------------------------
+
+    def _constructor(self, iterable):
+        return self.__class__(iterable)
+
+    def _get_element(self, i):
+        node = self._root
+        for _ in xrange(self._height):
+            j = bisect_right(node.ends, i)
+            if j:
+                i -= node.ends[j-1]
+            node = node.children[j]
+        return node.children[i]
+
+    def _set_element(self, i, x):
+        owner = self._owner
+        node = self._root
+        if node.owner is not owner:
+            node = self._root = node.copy(owner)
+        for _ in xrange(self._height):
+            j = bisect_right(node.ends, i)
+            if j:
+                i -= node.ends[j-1]
+            child = node.children[j]
+            if child.owner is not owner:
+                child = node.children[j] = child.copy(owner)
+            node = child
+        node.children[i] = x
+
+    def _resize_region(self, start, end, new_size):
+        if not (end == start + 1 and not new_size and
+                self._resizeLeaf(start, -1)):
+            self._splice(start, end, _build([None] * new_size))
+
+    def _get_slice(self, start, end, step):
+        if step > 0:
+            elements = []
+            _collect(self._root, self._height, start, end, elements)
+        else:
+            elements = []
+            _collect(self._root, self._height, end+1, start+1, elements)
+        return elements[::step]
+
+    #---- internal methods ---------------------------------------------------
+
+    def _new(self, root, height):
+        new = self._constructor(())
+        new._root, new._height = root, height
+        return new
+
+    def _share(self):
+        # return the tree of this list so that it can be shared
+        self._owner = object()
+        return self._root, self._height
+
+    def _resizeLeaf(self, i, delta, x=None):
+        # insert x at i (delta=1) or delete the element at i (delta=-1) in
+        # place; an overflowing leaf is split, but if the leaf would have too
+        # few elements nothing is done. Return whether it was done.
+        node = self._root
+        indices = []
+        for _ in xrange(self._height):
+            if delta > 0:
+                j = bisect_left(node.ends, i)
+            else:
+                j = bisect_right(node.ends, i)
+            if j:
+                i -= node.ends[j-1]
+            indices.append(j)
+            node = node.children[j]
+        if delta < 0 and indices and len(node.children) <= _MINSIZE:
+            return False
+        owner = self._owner
+        node = self._root
+        if node.owner is not owner:
+            node = self._root = node.copy(owner)
+        path = []
+        for j in indices:
+            path.append(node)
+            node.size += delta
+            ends = node.ends
+            for k in xrange(j, len(ends)):
+                ends[k] += delta
+            child = node.children[j]
+            if child.owner is not owner:
+                child = node.children[j] = child.copy(owner)
+            node = child
+        node.size += delta
+        if delta < 0:
+            del node.children[i]
+            return True
+        node.children.insert(i, x)
+        # split the overflowing nodes bottom up
+        height = 0
+        while len(node.children) > _MAXSIZE:
+            halves = _splitChildren(node.children, height, owner)
+            if not path:
+                self._root = _makeNode(halves, height+1, owner)
+                self._height += 1
+                break
+            node = path.pop()
+            j = indices.pop()
+            node.children[j:j+1] = halves
+            node.ends[j:j+1] = [node.ends[j] - halves[1].size, node.ends[j]]
+            height += 1
+        return True
+
+    def _splice(self, start, end, middle):
+        # replace the elements in [start,end) with the tree `middle`
+        tree = self._share()
+        left, right = _split(tree[0], tree[1], start)
+        right = _split(right[0], right[1], end - start)[1]
+        self._root, self._height = _join(_join(left, middle), right)
+
+
+#----- B+tree ----------------------------------------------------------------
+# A tree is a (root, height) tuple; the nodes of height 0 are leaves whose
+# children are the elements. Every node except for the root has at least
+# _MINSIZE children. The functions below never modify their arguments; the
+# nodes they create have no owner.
+
+_MAXSIZE = 64
+_MINSIZE = _MAXSIZE // 2
+
+
+class _Node(object):
+    __slots__ = 'children', 'ends', 'size', 'owner'
+
+    def __init__(self, children, ends, owner=None):
+        # ends: the cumulative sizes of the children (None for leaves)
+        self.children = children
+        self.ends = ends
+        if ends is None:
+            self.size = len(children)
+        else:
+            self.size = ends[-1]
+        self.owner = owner
+
+    def copy(self, owner):
+        ends = self.ends
+        if ends is not None:
+            ends = list(ends)
+        return _Node(list(self.children), ends, owner)
+
+
+def _makeNode(children, height, owner=None):
+    if not height:
+        return _Node(children, None, owner)
+    ends = []; total = 0
+    for child in children:
+        total += child.size
+        ends.append(total)
+    return _Node(children, ends, owner)
+
+
+_EMPTY_TREE = (_Node([], None), 0)
+
+
+def _build(elements, owner=None):
+    nodes = [_Node(chunk, None, owner) for chunk in _chunks(elements)]
+    if not nodes:
+        return _EMPTY_TREE
+    height = 0
+    while len(nodes) > 1:
+        height += 1
+        nodes = [_makeNode(chunk, height, owner) for chunk in _chunks(nodes)]
+    return nodes[0], height
+
+
+def _chunks(seq):
+    # split seq into chunks of _MINSIZE to _MAXSIZE items (unless it is
+    # shorter than _MINSIZE)
+    chunks = [seq[i:i+_MAXSIZE] for i in xrange(0, len(seq), _MAXSIZE)]
+    if len(chunks) > 1 and len(chunks[-1]) < _MINSIZE:
+        last = chunks.pop(-2) + chunks.pop()
+        half = len(last) // 2
+        chunks += [last[:half], last[half:]]
+    return chunks
+
+
+def _tree(children, height):
+    # the tree whose root has the given children; the root is collapsed
+    # while it has a single child
+    if not children:
+        return _EMPTY_TREE
+    while len(children) == 1 and height:
+        children = children[0].children
+        height -= 1
+    return _makeNode(children, height), height
+
+
+def _join(left, right):
+    (leftNode, leftHeight), (rightNode, rightHeight) = left, right
+    if not leftNode.size:
+        return right
+    if not rightNode.size:
+        return left
+    if leftHeight == rightHeight:
+        nodes = _merge(leftNode, rightNode, leftHeight)
+    elif leftHeight > rightHeight:
+        nodes = _joinRight(leftNode, leftHeight, rightNode, rightHeight)
+    else:
+        nodes = _joinLeft(leftNode, leftHeight, rightNode, rightHeight)
+    return _tree(nodes, max(leftHeight, rightHeight) + 1)
+
+
+def _merge(left, right, height):
+    # join two nodes of the same height into one or two nodes that have at
+    # least _MINSIZE children each
+    if len(left.children) >= _MINSIZE and len(right.children) >= _MINSIZE:
+        return [left, right]
+    return _splitChildren(left.children + right.children, height)
+
+
+def _splitChildren(children, height, owner=None):
+    if len(children) <= _MAXSIZE:
+        return [_makeNode(children, height, owner)]
+    half = len(children) // 2
+    return [_makeNode(children[:half], height, owner),
+            _makeNode(children[half:], height, owner)]
+
+
+def _joinRight(left, leftHeight, right, rightHeight):
+    # join `right` into the rightmost path of the higher `left`
+    last = left.children[-1]
+    if leftHeight - 1 == rightHeight:
+        nodes = _merge(last, right, rightHeight)
+    else:
+        nodes = _joinRight(last, leftHeight-1, right, rightHeight)
+    return _splitChildren(left.children[:-1] + nodes, leftHeight)
+
+
+def _joinLeft(left, leftHeight, right, rightHeight):
+    # join `left` into the leftmost path of the higher `right`
+    first = right.children[0]
+    if rightHeight - 1 == leftHeight:
+        nodes = _merge(left, first, leftHeight)
+    else:
+        nodes = _joinLeft(left, leftHeight, first, rightHeight-1)
+    return _splitChildren(nodes + right.children[1:], rightHeight)
+
+
+def _split(node, height, index):
+    # split the tree into the trees of its first `index` elements and the rest
+    if index <= 0:
+        return _EMPTY_TREE, (node, height)
+    if index >= node.size:
+        return (node, height), _EMPTY_TREE
+    if not height:
+        return ((_Node(node.children[:index], None), 0),
+                (_Node(node.children[index:], None), 0))
+    j = bisect_right(node.ends, index)
+    if j:
+        index -= node.ends[j-1]
+    left, right = _split(node.children[j], height-1, index)
+    return (_join(_tree(node.children[:j], height), left),
+            _join(right, _tree(node.children[j+1:], height)))
+
+
+def _collect(node, height, start, stop, elements):
+    # append the elements in [start,stop) to the list `elements`
+    if not height:
+        elements.extend(node.children[start:stop])
+        return
+    offset = 0
+    j = bisect_right(node.ends, start)
+    if j:
+        offset = node.ends[j-1]
+    for child in node.children[j:]:
+        if offset >= stop:
+            break
+        _collect(child, height-1, max(start-offset, 0), stop-offset, elements)
+        offset += child.size
+
+
+def _iterNode(node, height):
+    if not height:
+        return iter(node.children)
+    return _iterLeaves(node, height)
+
+
+def _iterLeaves(node, height):
+    # iterate over the elements of a non-leaf node, leaf by leaf
+    stack = [iter(node.children)]
+    while stack:
+        for child in stack[-1]:
+            if len(stack) == height:
+                for element in child.children:
+                    yield element
+            else:
+                stack.append(iter(child.children))
+                break
+        else:
+            stack.pop()
+
+
+if __name__ == '__main__':
+    import time
+    import random
+
+    def benchmark(n=1000000, ops=1000):
+        positions = [random.randrange(n) for _ in xrange(ops)]
+        print '%d random operations on %d elements:' % (ops, n)
+        for cls in list, BTreeList:
+            x = cls(xrange(n))
+            timings = []
+            start = time.time()
+            for i in positions:
+                x.insert(i, i)
+            timings.append(time.time() - start)
+            start = time.time()
+            for i in positions:
+                del x[i]
+            timings.append(time.time() - start)
+            start = time.time()
+            for i in positions:
+                x[i]
+            timings.append(time.time() - start)
+            start = time.time()
+            for i in positions:
+                x[i:i+n//10]
+            timings.append(time.time() - start)
+            start = time.time()
+            for i in xrange(ops // 100):
+                x + x
+            timings.append((time.time() - start) * 100)
+            start = time.time()
+            for i in xrange(ops // 100):
+                x[:]
+            timings.append((time.time() - start) * 100)
+            print ('  %-10s insert %.4fs, del %.4fs, index %.4fs, slice '
+                   '%.4fs, concat %.4fs, copy %.4fs' % ((cls.__name__,) +
+                                                         tuple(timings)))
+
+    benchmark()
@@ -0,0 +1,426 @@
+'''Bounded dict-like caches.
+
+The caches of this module hold a bounded number (or total weight) of items
+and evict items to make room for new ones according to a replacement policy:
+ - L{LRUCache}: evicts the least recently used item.
+ - L{LFUCache}: evicts the least frequently used item (the least recently used
+   among equally frequent ones).
+ - L{TTLCache}: expires items a fixed time after they were set; optionally it
+   is also bounded in size, evicting the oldest items first.
+ - L{WeightedLRUCache}: bounds the total weight (by default the size in bytes)
+   of the cached values, evicting the least recently used items.
+ - L{WeakValueCache}: holds weak references to the values, so that an item
+   is discarded as soon as its value is not used anywhere else; optionally it
+   also keeps the most recently used values alive.
+
+All the operations take constant (amortized) time. The caches can be used as
+the C{cacheFactory} of L{datastructs.memo.Memoize}, e.g.
+C{Memoize(f, lambda: LFUCache(1000))}.
+
+Each cache has an C{onEvict} attribute; if it is set to a callable C{f(key,
+value)}, it is called for every item that is evicted (or expires), but not for
+the items that are deleted explicitly.
+'''
+
+import sys
+import time
+import weakref
+from UserDict import DictMixin
+
+__author__ = "George Sakkis <gsakkis@rutgers.edu>"
+__all__ = ['LRUCache', 'LFUCache', 'TTLCache', 'WeightedLRUCache',
+           'WeakValueCache']
+
+# the fields of a linked list node; nodes are lists for speed
+_PREV, _NEXT, _KEY, _VALUE, _EXTRA = range(5)
+
+
+class _LinkedCache(DictMixin):
+    '''Base class of the caches that keep their items in a circular doubly
+    linked list, from the oldest to the newest.'''
+
+    onEvict = None
+
+    def __init__(self):
+        # self._map: maps each key to its linked list node
+        self._map = {}
+        self._root = _newList()
+
+    def __len__(self):
+        return len(self._map)
+
+    def __contains__(self, key):
+        return key in self._map
+
+    has_key = __contains__
+
+    def __iter__(self):
+        '''Iterate over the keys, from the oldest to the newest.'''
+        root = self._root
+        node = root[_NEXT]
+        while node is not root:
+            yield node[_KEY]
+            node = node[_NEXT]
+
+    def keys(self):
+        return list(self)
+
+    def __delitem__(self, key):
+        _unlink(self._map.pop(key))
+
+    def clear(self):
+        self._map.clear()
+        self._root = _newList()
+
+    def __repr__(self):
+        return '%s(%r)' % (self.__class__.__name__, dict(self.iteritems()))
+
+    def _popOldest(self):
+        node = self._root[_NEXT]
+        _unlink(node)
+        del self._map[node[_KEY]]
+        if self.onEvict is not None:
+            self.onEvict(node[_KEY], node[_VALUE])
+        return node
+
+
+class LRUCache(_LinkedCache):
+    '''A cache that evicts the least recently used item.'''
+
+    def __init__(self, maxsize):
+        '''
+        @param maxsize: The maximum number of cached items.
+        '''
+        if maxsize < 0:
+            raise ValueError('maxsize must be non negative')
+        _LinkedCache.__init__(self)
+        self._maxsize = maxsize
+
+    def __getitem__(self, key):
+        node = self._map[key]
+        root = self._root
+        _unlink(node); _append(root, node)
+        return node[_VALUE]
+
+    def __setitem__(self, key, value):
+        map = self._map
+        node = map.get(key)
+        if node is not None:
+            _unlink(node)
+            node[_VALUE] = value
+        else:
+            node = map[key] = [None, None, key, value]
+        _append(self._root, node)
+        if len(map) > self._maxsize:
+            self._popOldest()
+
+
+class WeightedLRUCache(_LinkedCache):
+    '''A cache that bounds the total weight of its values and evicts the least
+    recently used items.'''
+
+    def __init__(self, maxweight, weigh=getattr(sys, 'getsizeof', len)):
+        '''
+        @param maxweight: The maximum total weight of the cached values.
+        @param weigh: A callable that returns the weight of a value. By default
+            it is C{sys.getsizeof} (the size in bytes), if available.
+        '''
+        if maxweight < 0:
+            raise ValueError('maxweight must be non negative')
+        _LinkedCache.__init__(self)
+        self._maxweight = maxweight
+        self._weigh = weigh
+        self._weight = 0
+
+    def weight(self):
+        '''Return the total weight of the cached values.'''
+        return self._weight
+
+    def __getitem__(self, key):
+        node = self._map[key]
+        _unlink(node); _append(self._root, node)
+        return node[_VALUE]
+
+    def __setitem__(self, key, value):
+        if key in self._map:
+            del self[key]
+        weight = self._weigh(value)
+        # don't flush the whole cache for a value that can't fit anyway
+        if weight > self._maxweight:
+            return
+        node = self._map[key] = [None, None, key, value, weight]
+        _append(self._root, node)
+        self._weight += weight
+        while self._weight > self._maxweight:
+            self._weight -= self._popOldest()[_EXTRA]
+
+    def __delitem__(self, key):
+        node = self._map.pop(key)
+        _unlink(node)
+        self._weight -= node[_EXTRA]
+
+    def clear(self):
+        _LinkedCache.clear(self)
+        self._weight = 0
+
+
+class TTLCache(_LinkedCache):
+    '''A cache whose items expire a fixed time after they were set.'''
+
+    def __init__(self, ttl, maxsize=None, timer=time.time):
+        '''
+        @param ttl: The time to live of each item, in C{timer} units.
+        @param maxsize: The maximum number of cached items, or None for an
+            unbounded size. If it is exceeded, the oldest item is evicted.
+        @param timer: A callable that returns the current time.
+        '''
+        if maxsize is not None and maxsize < 0:
+            raise ValueError('maxsize must be non negative')
+        _LinkedCache.__init__(self)
+        self._ttl = ttl
+        self._maxsize = maxsize
+        self._timer = timer
+
+    def __len__(self):
+        self._expire(self._timer())
+        return len(self._map)
+
+    def __iter__(self):
+        self._expire(self._timer())
+        return _LinkedCache.__iter__(self)
+
+    def __contains__(self, key):
+        try: self[key]
+        except KeyError:
+            return False
+        return True
+
+    has_key = __contains__
+
+    def __getitem__(self, key):
+        node = self._map[key]
+        if node[_EXTRA] <= self._timer():
+            del self[key]
+            if self.onEvict is not None:
+                self.onEvict(key, node[_VALUE])
+            raise KeyError(key)
+        return node[_VALUE]
+
+    def __setitem__(self, key, value):
+        now = self._timer()
+        map = self._map
+        node = map.pop(key, None)
+        if node is not None:
+            _unlink(node)
+        # all items have the same ttl, so the list is sorted by expiry time
+        node = map[key] = [None, None, key, value, now + self._ttl]
+        _append(self._root, node)
+        self._expire(now)
+        if self._maxsize is not None and len(map) > self._maxsize:
+            self._popOldest()
+
+    def _expire(self, now):
+        root = self._root
+        while root[_NEXT] is not root and root[_NEXT][_EXTRA] <= now:
+            self._popOldest()
+
+
+class LFUCache(DictMixin):
+    '''A cache that evicts the least frequently used item.
+
+    Ties are broken by evicting the least recently used of the least
+    frequently used items.
+    '''
+
+    onEvict = None
+
+    def __init__(self, maxsize):
+        '''
+        @param maxsize: The maximum number of cached items.
+        '''
+        if maxsize < 0:
+            raise ValueError('maxsize must be non negative')
+        self._maxsize = maxsize
+        # self._map: maps each key to its linked list node; the extra field
+        # of a node is the key's access count
+        self._map = {}
+        # self._buckets: maps each access count to the (circular doubly
+        # linked) list of the nodes with this count, least recent first
+        self._buckets = {}
+        self._minCount = 0
+
+    def __len__(self):
+        return len(self._map)
+
+    def __contains__(self, key):
+        return key in self._map
+
+    has_key = __contains__
+
+    def __iter__(self):
+        return iter(self._map)
+
+    def keys(self):
+        return self._map.keys()
+
+    def __getitem__(self, key):
+        node = self._map[key]
+        self._touch(node)
+        return node[_VALUE]
+
+    def __setitem__(self, key, value):
+        map = self._map
+        node = map.get(key)
+        if node is not None:
+            node[_VALUE] = value
+            self._touch(node)
+            return
+        if len(map) >= self._maxsize:
+            if not self._maxsize:
+                return
+            node = self._buckets[self._minCount][_NEXT]
+            self._remove(node)
+            del map[node[_KEY]]
+            if self.onEvict is not None:
+                self.onEvict(node[_KEY], node[_VALUE])
+        node = map[key] = [None, None, key, value, 1]
+        self._bucket(1, node)
+        self._minCount = 1
+
+    def __delitem__(self, key):
+        self._remove(self._map.pop(key))
+        buckets = self._buckets
+        if self._minCount not in buckets:
+            self._minCount = buckets and min(buckets) or 0
+
+    def clear(self):
+        self._map.clear()
+        self._buckets.clear()
+        self._minCount = 0
+
+    def __repr__(self):
+        return '%s(%r)' % (self.__class__.__name__, dict(self.iteritems()))
+
+    def _touch(self, node):
+        count = node[_EXTRA]
+        self._remove(node)
+        if self._minCount == count and count not in self._buckets:
+            self._minCount = count + 1
+        node[_EXTRA] = count + 1
+        self._bucket(count + 1, node)
+
+    def _bucket(self, count, node):
+        root = self._buckets.get(count)
+        if root is None:
+            root = self._buckets[count] = _newList()
+        _append(root, node)
+
+    def _remove(self, node):
+        # unlink the node and drop its bucket if it becomes empty
+        _unlink(node)
+        if node[_NEXT] is node[_PREV] and node[_NEXT][_KEY] is _ROOT_KEY:
+            del self._buckets[node[_EXTRA]]
+
+
+class WeakValueCache(DictMixin):
+    '''A cache that holds weak references to its values.
+
+    An item is discarded as soon as there are no other (strong) references to
+    its value. To avoid discarding and recomputing values that are used
+    repeatedly but briefly, the cache can also keep strong references to the
+    most recently used values (the "hot set").
+    '''
+
+    def __init__(self, hotsize=0):
+        '''
+        @param hotsize: The number of the most recently used values that are
+            kept alive by the cache.
+        '''
+        self._weak = weakref.WeakValueDictionary()
+        if hotsize:
+            self._hot = LRUCache(hotsize)
+        else:
+            self._hot = None
+
+    def __len__(self):
+        return len(self._weak)
+
+    def __contains__(self, key):
+        return key in self._weak
+
+    has_key = __contains__
+
+    def __iter__(self):
+        return iter(self._weak.keys())
+
+    def keys(self):
+        return self._weak.keys()
+
+    def __getitem__(self, key):
+        value = self._weak[key]
+        if self._hot is not None:
+            self._hot[key] = value
+        return value
+
+    def __setitem__(self, key, value):
+        self._weak[key] = value
+        if self._hot is not None:
+            self._hot[key] = value
+
+    def __delitem__(self, key):
+        del self._weak[key]
+        if self._hot is not None and key in self._hot:
+            del self._hot[key]
+
+    def clear(self):
+        self._weak.clear()
+        if self._hot is not None:
+            self._hot.clear()
+
+    def __repr__(self):
+        return '%s(%r)' % (self.__class__.__name__, dict(self.iteritems()))
+
+
+#----- circular doubly linked list helpers -----------------------------------
+
+# the key of the sentinel node of every list
+_ROOT_KEY = object()
+
+def _newList():
+    root = [None, None, _ROOT_KEY, None]
+    root[_PREV] = root[_NEXT] = root
+    return root
+
+def _append(root, node):
+    last = root[_PREV]
+    node[_PREV] = last; node[_NEXT] = root
+    last[_NEXT] = root[_PREV] = node
+
+def _unlink(node):
+    prev,next = node[_PREV],node[_NEXT]
+    prev[_NEXT] = next; next[_PREV] = prev
+
+
+if __name__ == '__main__':
+    import random
+    from timeit import Timer
+    from datastructs.memo import Memoize
+
+    def benchmark(n=100000, universe=10000, maxsize=1000):
+        # skewed (roughly zipfian) key distribution
+        keys = [int(universe ** random.random()) for _ in xrange(n)]
+        factories = [('dict', dict),
+                     ('LRUCache', lambda: LRUCache(maxsize)),
+                     ('LFUCache', lambda: LFUCache(maxsize)),
+                     ('TTLCache', lambda: TTLCache(60, maxsize)),
+                     ('WeightedLRUCache',
+                      lambda: WeightedLRUCache(maxsize, lambda v: 1))]
+        print '%d calls, %d distinct keys, maxsize=%d' % (n, universe, maxsize)
+        for name,factory in factories:
+            f = Memoize(abs, factory)
+            cache = f._cache
+            t = min(Timer(lambda: map(f, keys)).repeat(3, 1))
+            print '  %-18s %.3fs (%.2fus/call), %d cached' % (
+                name, t, t * 1e6 / n, len(cache))
+
+    benchmark()
@@ -1,7 +1,7 @@
 __all__ = ['AbstractConfusionMatrix', 'SingleConfusionMatrix', 'MultiConfusionMatrix']
 
 import Numeric as Num
-from itertools import imap
+from itertools import imap,izip,repeat
 
 
 #====== AbstractConfusionMatrix ================================================
@@ -42,6 +42,24 @@ class AbstractConfusionMatrix(object):
         '''
         raise NotImplementedError('Abstract method')
 
+    def add_events(self, real_labels, pred_labels, weights=None):
+        '''Update the confusion matrix with a batch of events.
+
+        This is equivalent to calling C{add_event(real,pred,n)} for each
+        C{real}, C{pred} and C{n} of C{real_labels}, C{pred_labels} and
+        C{weights}.
+
+        @param real_labels,pred_labels: Sequences of the same length.
+        @param weights: A sequence of the same length, or None for a weight of
+            1 for all events.
+        @raise ValueError: If the sequences have different lengths.
+        '''
+        _check_lengths(real_labels, pred_labels, weights)
+        if weights is None:
+            weights = repeat(1)
+        for real,pred,n in izip(real_labels,pred_labels,weights):
+            self.add_event(real,pred,n)
+
     #------- metrics -----------------------------------------------------------
 
     # most metrics follow the same template, so create them dynamically
@@ -140,26 +158,77 @@ class SingleConfusionMatrix(AbstractConfusionMatrix):
 
     An event consists of a (real,pred) tuple: each instance belongs to a single
     class C{real} and it is classified in a single class C{pred}.
+
+    The events are counted in a |C|x|C| matrix (as in L{set_from_array}); the
+    per class 2x2 matrices are derived from it when a metric is requested.
+    The counts are floats, so that fractional weights are added exactly by
+    all of L{add_event}, L{add_events} and L{set_from_array}.
     '''
 
+    def __init__(self, classes):
+        self._classes = tuple(classes)
+        self._class2index = dict((c,i) for i,c in enumerate(self._classes))
+        size = len(self._classes)
+        self._matrix = Num.zeros((size,size), Num.Float)
+        self._binary = None
+
+    def set_from_array(self, array):
+        size = len(self._classes)
+        if Num.shape(array) != (size,size):
+            raise ValueError('Wrong array size: %s' % str(Num.shape(array)))
+        self._matrix += array
+        self._binary = None
+
     def add_event(self, real, pred, n=1):
-        c2m = self._class2matrix.copy()
-        summed = self._sum
-        if real == pred: # hit; update the true positives
-            c2m.pop(real)[0,0] += n
-            summed[0,0] += n
-        else: # miss
-            # update the false positives for the predicted category
-            c2m.pop(pred)[0,1] += n
-            summed[0,1] += n
-            # update the false negatives for the real category
-            c2m.pop(real)[1,0] += n
-            summed[1,0] += n
-        # update the true negative for all other categories
-        for m in c2m.itervalues():
-            m[1,1] += n
-        summed[1,1] += n*len(c2m)
-        assert Num.allclose(self._sum, sum(self._class2matrix.itervalues()))
+        c2i = self._class2index
+        self._matrix[c2i[pred],c2i[real]] += n
+        self._binary = None
+
+    def add_events(self, real_labels, pred_labels, weights=None):
+        '''Update the confusion matrix with a batch of events.
+
+        The labels are mapped to indices once and all the events are counted
+        at once, which is much faster than calling L{add_event} for each one.
+
+        @param real_labels,pred_labels: Sequences of the same length.
+        @param weights: A sequence of the same length, or None for a weight of
+            1 for all events.
+        @raise ValueError: If the sequences have different lengths.
+        '''
+        _check_lengths(real_labels, pred_labels, weights)
+        c2i = self._class2index.__getitem__
+        real = Num.array(map(c2i, real_labels))
+        pred = Num.array(map(c2i, pred_labels))
+        if weights is not None:
+            weights = Num.asarray(weights)
+        size = len(self._classes)
+        counts = _bincount(pred*size + real, weights, size*size)
+        self._matrix += Num.reshape(counts, (size,size))
+        self._binary = None
+
+    # the per class matrices and their sum, computed on demand
+    _class2matrix = property(lambda self: self._binaryMatrices()[0])
+    _sum = property(lambda self: self._binaryMatrices()[1])
+
+    def _binaryMatrices(self):
+        if self._binary is None:
+            m = self._matrix
+            total = Num.sum(Num.ravel(m))
+            hits = Num.diagonal(m)
+            # false positives: predicted as c but not in c
+            fps = Num.sum(m,1) - hits
+            # false negatives: in c but not predicted as c
+            fns = Num.sum(m,0) - hits
+            # true negatives: neither in c nor predicted as c
+            tns = total - hits - fps - fns
+            class2matrix = {}
+            for i,c in enumerate(self._classes):
+                class2matrix[c] = Num.array([[hits[i], fps[i]],
+                                             [fns[i], tns[i]]])
+            summed = Num.array([[Num.sum(hits), Num.sum(fps)],
+                                [Num.sum(fns), Num.sum(tns)]])
+            self._binary = class2matrix, summed
+        return self._binary
 
     @classmethod
     def test(cls):
@@ -173,6 +242,41 @@ class SingleConfusionMatrix(AbstractConfusionMatrix):
         cm.set_from_array(Num.array([[21,7,3],[3,38,6],[5,4,19]]))
         return cm
 
+    @classmethod
+    def test_add_events(cls):
+        '''Check that L{add_events} updates the matrix as L{add_event} does for
+        each event, with and without weights.'''
+        import random
+        rand = random.Random(0)
+        classes = ['yes', 'no', 'maybe']
+        real = [rand.choice(classes) for i in xrange(1000)]
+        pred = [rand.choice(classes) for i in xrange(1000)]
+        for weights in (None, [rand.randrange(1,5) for i in xrange(1000)],
+                        [rand.random() for i in xrange(1000)]):
+            batch = cls(classes)
+            batch.add_events(real, pred, weights)
+            single = cls(classes)
+            for i in xrange(1000):
+                single.add_event(real[i], pred[i], weights and weights[i] or 1)
+            for c in classes:
+                assert Num.allclose(batch._class2matrix[c],
+                                    single._class2matrix[c]), c
+            assert Num.allclose(batch._sum, single._sum)
+        # no events
+        cm = cls(classes)
+        cm.add_events([], [])
+        assert Num.allclose(cm._sum, Num.zeros((2,2)))
+        # both kinds of matrices reject sequences of different lengths
+        for klass in cls, MultiConfusionMatrix:
+            cm = klass(classes)
+            for args in (real, pred[1:]), (real, pred, [1]):
+                try: cm.add_events(*args)
+                except ValueError: pass
+                else: raise AssertionError('%s accepted %d, %d labels' % (
+                    klass.__name__, len(args[0]), len(args[1])))
+            assert Num.allclose(cm._sum, Num.zeros((2,2)))
+        return cm
+
 
 #====== MultiConfusionMatrix ===================================================
 
@@ -212,6 +316,27 @@ class MultiConfusionMatrix(AbstractConfusionMatrix):
         cm.add_event(['no','maybe'], 'no',3)
         return cm
 
+def _bincount(indices, weights, length):
+    # Return an array whose i-th element is the sum of the weights of the
+    # occurrences of i in indices (or the number of the occurrences if weights
+    # is None). Numeric has no bincount; sort the indices and find the bounds
+    # of each value with a single searchsorted instead.
+    if weights is None:
+        indices = Num.sort(indices)
+        bounds = Num.searchsorted(indices, Num.arange(length+1))
+        return bounds[1:] - bounds[:-1]
+    order = Num.argsort(indices)
+    bounds = Num.searchsorted(Num.take(indices,order), Num.arange(length+1))
+    sums = Num.concatenate(([0], Num.add.accumulate(Num.take(weights,order))))
+    sums = Num.take(sums, bounds)
+    return sums[1:] - sums[:-1]
+
+def _check_lengths(real_labels, pred_labels, weights):
+    if len(real_labels) != len(pred_labels):
+        raise ValueError('Different number of real and predicted labels')
+    if weights is not None and len(weights) != len(real_labels):
+        raise ValueError('Wrong number of weights: %d' % len(weights))
+
 def _make_set(arg):
     if not isinstance(arg, (set,frozenset)):
         if not isinstance(arg,(tuple,list)):
@@ -300,9 +425,25 @@ else:
 
 
 if __name__ == '__main__':
+    import time
+    import random
     from pprint import pprint
     for cls in SingleConfusionMatrix,MultiConfusionMatrix:
         cm = cls.test()
         pprint(cm._class2matrix)
         print cm.dump()
         print
+    SingleConfusionMatrix.test_add_events()
+
+    def benchmark(n=1000000, classes=('yes', 'no', 'maybe')):
+        real = [random.choice(classes) for i in xrange(n)]
+        pred = [random.choice(classes) for i in xrange(n)]
+        for name,add in (('add_event', AbstractConfusionMatrix.add_events),
+                         ('add_events', SingleConfusionMatrix.add_events)):
+            cm = SingleConfusionMatrix(classes)
+            start = time.time()
+            add(cm, real, pred)
+            cm.micro_accuracy()
+            print '%d events with %s: %.2fs' % (n, name, time.time() - start)
+
+    benchmark()
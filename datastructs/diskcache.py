@@ -0,0 +1,229 @@
+'''A persistent cache stored in an SQLite database.
+
+L{SQLiteCache} can be used as the C{cacheFactory} of
+L{datastructs.memo.Memoize} so that the memoized results survive across runs
+(and are shared among processes)::
+    features = Memoize(extractFeatures, lambda: SQLiteCache('features.db'))
+
+Keys are stored as the SHA-1 digest of a canonical encoding, which is the
+same for equal numbers, strings, tuples, mappings and frozensets of them
+(e.g. for C{1} and C{1.0}, or for equal strings that are distinct objects).
+Keys of other types are encoded by their pickle, so they must be picklable
+and equal keys must pickle identically.
+'''
+
+import time
+import zlib
+import threading
+import cPickle as pickle
+from cStringIO import StringIO
+try: from hashlib import sha1
+except ImportError:
+    from sha import new as sha1
+
+try: import sqlite3 as sqlite
+except ImportError:
+    from pysqlite2 import dbapi2 as sqlite
+
+__author__ = "George Sakkis <gsakkis@rutgers.edu>"
+__all__ = ['SQLiteCache']
+
+
+class SQLiteCache(object):
+    '''A dict-like cache stored in an SQLite database file.
+
+    Each operation runs in its own transaction, so several processes (or
+    threads, each of which gets its own connection) can safely use the same
+    file concurrently; SQLite serializes the writers.
+    '''
+
+    def __init__(self, path, table='memo', serializer=pickle, compress=False,
+                 maxsize=None, timeout=30):
+        '''
+        @param path: The path of the database file.
+        @param table: The name of the table to store the items in; several
+            caches can share the same file using different tables.
+        @param serializer: An object with C{dumps(obj)} and C{loads(string)}
+            functions (e.g. C{pickle} or C{marshal}) used for the values.
+        @param compress: If true, compress the serialized values with C{zlib}.
+            If it is an int, it is used as the compression level.
+        @param maxsize: If not None, the maximum number of stored items. When
+            it is exceeded, the least recently used items are deleted, down
+            to 90% of C{maxsize}.
+        @param timeout: How many seconds to wait for a lock held by another
+            connection before raising an C{OperationalError}.
+        '''
+        self._path = path
+        self._timeout = timeout
+        self._serializer = serializer
+        if compress is True:
+            compress = 6
+        self._compress = compress
+        self._maxsize = maxsize
+        # the number of items when it was last counted, plus the insertions
+        # since then (approximate if other connections modify the table)
+        self._size = None
+        self._local = threading.local()
+        self._getQuery = 'SELECT value FROM %s WHERE key=?' % table
+        self._touchQuery = 'UPDATE %s SET atime=? WHERE key=?' % table
+        self._setQuery = ('INSERT OR REPLACE INTO %s (key, value, atime) '
+                          'VALUES (?, ?, ?)' % table)
+        self._delQuery = 'DELETE FROM %s WHERE key=?' % table
+        self._lenQuery = 'SELECT COUNT(*) FROM %s' % table
+        self._clearQuery = 'DELETE FROM %s' % table
+        self._evictQuery = ('DELETE FROM %s WHERE key IN (SELECT key FROM %s '
+                            'ORDER BY atime LIMIT ?)' % (table, table))
+        connection = self._connection()
+        connection.execute('CREATE TABLE IF NOT EXISTS %s (key TEXT PRIMARY '
+                           'KEY, value BLOB, atime REAL)' % table)
+        connection.execute('CREATE INDEX IF NOT EXISTS %s_atime ON %s '
+                           '(atime)' % (table, table))
+
+    def __getitem__(self, key):
+        digest = _digest(key)
+        connection = self._connection()
+        row = connection.execute(self._getQuery, (digest,)).fetchone()
+        if row is None:
+            raise KeyError(key)
+        if self._maxsize is not None:
+            connection.execute(self._touchQuery, (time.time(), digest))
+        value = str(row[0])
+        if self._compress:
+            value = zlib.decompress(value)
+        return self._serializer.loads(value)
+
+    def __setitem__(self, key, value):
+        value = self._serializer.dumps(value)
+        if self._compress:
+            value = zlib.compress(value, self._compress)
+        connection = self._connection()
+        connection.execute(self._setQuery, (_digest(key),
+                                            sqlite.Binary(value), time.time()))
+        if self._maxsize is not None:
+            if self._size is None:
+                self._size = len(self)
+            else:
+                self._size += 1
+            if self._size > self._maxsize:
+                self._evict(connection)
+
+    def __delitem__(self, key):
+        cursor = self._connection().execute(self._delQuery, (_digest(key),))
+        if not cursor.rowcount:
+            raise KeyError(key)
+        if self._size is not None:
+            self._size -= 1
+
+    def __contains__(self, key):
+        return self._connection().execute(self._getQuery,
+                                          (_digest(key),)).fetchone() is not None
+
+    def __len__(self):
+        return self._connection().execute(self._lenQuery).fetchone()[0]
+
+    def clear(self):
+        self._connection().execute(self._clearQuery)
+        self._size = 0
+
+    def close(self):
+        '''Close the database connection of the calling thread.'''
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            del self._local.connection
+
+    def _evict(self, connection):
+        # count the items only when the estimate exceeds maxsize, and delete
+        # a batch of them so that the next count is many insertions away
+        size = len(self)
+        if size > self._maxsize:
+            excess = size - self._maxsize + self._maxsize // 10
+            connection.execute(self._evictQuery, (excess,))
+            size -= excess
+        self._size = size
+
+    def _connection(self):
+        # sqlite connections cannot be shared among threads
+        try: return self._local.connection
+        except AttributeError:
+            # isolation_level=None: autocommit each statement
+            connection = self._local.connection = sqlite.connect(
+                self._path, timeout=self._timeout, isolation_level=None)
+            return connection
+
+
+def _digest(key):
+    return sha1(_encode(key)).hexdigest()
+
+
+def _encode(key):
+    # a string that is the same for equal keys: a type code, the length of
+    # the payload and the payload
+    if key is None:
+        code,payload = 'n', ''
+    elif isinstance(key, (int, long, float, complex)):
+        code,payload = _encodeNumber(key)
+    elif isinstance(key, str):
+        code,payload = 's', key
+    elif isinstance(key, unicode):
+        # ascii unicode strings are equal to the respective str
+        try: code,payload = 's', key.encode('ascii')
+        except UnicodeError:
+            code,payload = 'u', key.encode('utf-8')
+    elif hasattr(key, 'iteritems'):
+        items = [_encode(k) + _encode(v) for k,v in key.iteritems()]
+        items.sort()
+        code,payload = 'd', ''.join(items)
+    elif isinstance(key, tuple):
+        code,payload = 't', ''.join(map(_encode, key))
+    elif isinstance(key, frozenset):
+        items = map(_encode, key)
+        items.sort()
+        code,payload = 'f', ''.join(items)
+    else:
+        # pickle without the memo, which depends on the identity of objects
+        f = StringIO()
+        pickler = pickle.Pickler(f, 2)
+        pickler.fast = 1
+        pickler.dump(key)
+        code,payload = 'p', f.getvalue()
+    return '%s%d:%s' % (code, len(payload), payload)
+
+
+def _encodeNumber(number):
+    # equal numbers have the same encoding regardless of their type
+    if isinstance(number, complex):
+        if number.imag:
+            return 'c', repr(number)
+        number = number.real
+    if isinstance(number, float):
+        try: integer = int(number)
+        except (OverflowError, ValueError):     # inf, nan
+            return 'r', repr(number)
+        if integer != number:
+            return 'r', repr(number)
+        number = integer
+    return 'i', str(int(number))
+
+
+if __name__ == '__main__':
+    import os, sys, tempfile
+    from datastructs.memo import Memoize
+
+    def extract(x):
+        time.sleep(0.001)   # an expensive computation
+        return range(x % 100)
+
+    path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    n = int((sys.argv[1:] or [1000])[0])
+    for run in 'cold', 'warm':
+        for compress in False, True:
+            f = Memoize(extract, lambda: SQLiteCache(path, 'memo%d' % compress,
+                                                     compress=compress))
+            start = time.time()
+            for i in xrange(n):
+                f(i)
+            print '%s run, compress=%-5s: %.3fs' % (run, compress,
+                                                    time.time() - start)
+            f._cache.close()
+    os.remove(path)
@@ -1,37 +1,537 @@
-'''An unmodifiable hashable dict.'''
+'''Unmodifiable hashable dicts.
+
+L{frozendict} is a dict that cannot be modified after its creation;
+L{smallfrozendict} is a more compact variant for a few items, such as keyword
+arguments. L{PersistentDict} is an immutable mapping whose "modifying" methods (L{set
+<PersistentDict.set>}, L{delete <PersistentDict.delete>}, L{update
+<PersistentDict.update>}) return a new mapping in O(log n) time, sharing most
+of its structure with the original.
+'''
 
 __author__ = 'George Sakkis <gsakkis@rutgers.edu>'
-__all__ = ['frozendict', 'Empty']
+__all__ = ['frozendict', 'smallfrozendict', 'PersistentDict', 'Empty']
 
-import sys
+from UserDict import DictMixin
 
-# in python 2.2+, dict can be subclassed; otherwise use UserDict
-if sys.version_info[:2] < (2,2):
-    from UserDict import UserDict as _base
-else:
-    _base = dict
 
+class frozendict(dict):
+    '''An unmodifiable (and thus hashable) dict.
 
+    It is initialized as a dict, from a mapping or an iterable of (key,value)
+    pairs plus the keyword arguments. The hash does not depend on the order of
+    the items; it is computed the first time it is needed.
 
-class frozendict(_base):
-    '''An unmodifiable (and thus hashable) dict.'''
+    @requires: python 2.2+.
+    '''
+
+    # no __dict__; _hash is unset until the first call of __hash__
+    __slots__ = ('_hash',)
+
+    def __hash__(self):
+        h = getattr(self, '_hash', None)
+        if h is None:
+            h = self._hash = hash(frozenset(dict.iteritems(self)))
+        return h
+
+    def __reduce__(self):
+        return (self.__class__, (dict(self),))
 
-    def __init__(self, keyvalues=(), **other):
-        _base.__init__(self)
-        try: keyvalues = keyvalues.items()
-        except AttributeError: pass
-        for k,v in keyvalues:
-            _base.__setitem__(self,k,v)
-        _base.update(self,other)
-        self._hash = hash(tuple(self.items()))
-
-    def __hash__(self): return self._hash
     def __setitem__(self,key,value): self._raise()
     def __delitem__(self,key): self._raise()
     def clear(self): self._raise()
     def setdefault(self,k,default=None): self._raise()
+    def pop(self,k,*default): self._raise()
     def popitem(self): self._raise()
-    def update(self,other): self._raise()
+    def update(self,*other,**kwds): self._raise()
     def _raise(self): raise TypeError('frozendicts are immutable')
 
 Empty = frozendict()
+
+
+class smallfrozendict(tuple):
+    '''A compact unmodifiable hashable dict for a few items with ordered keys,
+    such as keyword arguments.
+
+    It is a tuple of the (key,value) pairs sorted by key, so it takes less
+    memory than a L{frozendict} and it is created, hashed and compared (with
+    other smallfrozendicts) at the speed of a tuple. On the other hand, lookups
+    scan the items, so it should hold at most L{MAXSIZE} items. The keys must
+    be totally ordered (e.g. strings); otherwise equal smallfrozendicts may not
+    compare equal. A smallfrozendict is never equal to a dict.
+    '''
+
+    __slots__ = ()
+
+    #: The maximum number of items that a smallfrozendict should hold.
+    MAXSIZE = 8
+
+    def __new__(cls, keyvalues=(), **other):
+        if other or not isinstance(keyvalues, dict):
+            keyvalues = dict(keyvalues, **other)
+        items = keyvalues.items()
+        items.sort()
+        return tuple.__new__(cls, items)
+
+    def __getitem__(self, key):
+        for k,v in tuple.__iter__(self):
+            if k == key:
+                return v
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        for k,v in tuple.__iter__(self):
+            if k == key:
+                return v
+        return default
+
+    def __contains__(self, key):
+        for k,v in tuple.__iter__(self):
+            if k == key:
+                return True
+        return False
+
+    has_key = __contains__
+
+    def __iter__(self):
+        for k,v in tuple.__iter__(self):
+            yield k
+
+    iterkeys = __iter__
+
+    def itervalues(self):
+        for k,v in tuple.__iter__(self):
+            yield v
+
+    def iteritems(self):
+        return tuple.__iter__(self)
+
+    def keys(self):
+        return list(self)
+
+    def values(self):
+        return list(self.itervalues())
+
+    def items(self):
+        return list(tuple.__iter__(self))
+
+    def __repr__(self):
+        return '%s(%r)' % (self.__class__.__name__, dict(self.iteritems()))
+
+    def __reduce__(self):
+        return (self.__class__, (self.items(),))
+
+
+class PersistentDict(DictMixin, object):
+    '''An immutable mapping implemented as a hash array mapped trie (HAMT).
+
+    The items are stored in a tree of 32-way branching nodes, indexed by
+    successive 5-bit chunks of the key hashes; each node stores only its
+    non-empty branches, along with a bitmap of them. Lookups take
+    O(log32 n) time. L{set}, L{delete} and L{update} return a new mapping
+    that copies only the O(log32 n) nodes on the path to each changed key and
+    shares the rest with the original mapping, which remains unchanged.
+
+    Unlike L{frozendict}, the hash is computed the first time it is needed.
+    Equal keys must have equal hashes, as for dicts.
+    '''
+
+    __slots__ = ('_root', '_len', '_hash')
+
+    def __init__(self, keyvalues=(), **other):
+        '''Create a new mapping from a mapping or an iterable of (key,value)
+        pairs, plus the keyword arguments.'''
+        self._root = _EMPTY_NODE
+        self._len = 0
+        self._hash = None
+        if isinstance(keyvalues, PersistentDict):
+            # share the (immutable) trie
+            self._root, self._len = keyvalues._root, keyvalues._len
+            keyvalues = ()
+        if keyvalues or other:
+            self._root, self._len = self._assocAll(keyvalues, other)
+
+    def __len__(self):
+        return self._len
+
+    def __getitem__(self, key):
+        h = hash(key) & _HASH_MASK
+        node = self._root
+        shift = 0
+        while node.__class__ is _BitmapNode:
+            bit = 1 << ((h >> shift) & 31)
+            bitmap = node.bitmap
+            if not bitmap & bit:
+                raise KeyError(key)
+            bitmap &= bit - 1
+            i = 2 * (_BITCOUNTS[bitmap & 0xFFFF] + _BITCOUNTS[bitmap >> 16])
+            array = node.array
+            k = array[i]
+            if k is _NODE:
+                node = array[i+1]
+                shift += 5
+            elif k is key or k == key:
+                return array[i+1]
+            else:
+                raise KeyError(key)
+        return node.find(h, key)
+
+    def __contains__(self, key):
+        try: self[key]
+        except KeyError:
+            return False
+        return True
+
+    has_key = __contains__
+
+    def __iter__(self):
+        for key,value in _iterItems(self._root):
+            yield key
+
+    def iteritems(self):
+        return _iterItems(self._root)
+
+    def itervalues(self):
+        for key,value in _iterItems(self._root):
+            yield value
+
+    def keys(self):
+        return list(self)
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        if not isinstance(other, (PersistentDict, dict, DictMixin)):
+            return NotImplemented
+        if len(self) != len(other):
+            return False
+        if isinstance(other, PersistentDict) and self._root is other._root:
+            return True
+        for key,value in _iterItems(self._root):
+            try:
+                if other[key] != value:
+                    return False
+            except KeyError:
+                return False
+        return True
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        if equal is NotImplemented:
+            return equal
+        return not equal
+
+    def __hash__(self):
+        if self._hash is None:
+            self._hash = hash(frozenset(_iterItems(self._root)))
+        return self._hash
+
+    def __repr__(self):
+        return '%s(%r)' % (self.__class__.__name__, dict(self.iteritems()))
+
+    def __reduce__(self):
+        return (self.__class__, (dict(self.iteritems()),))
+
+    def set(self, key, value):
+        '''Return a new mapping with C{key} mapped to C{value}.'''
+        root,added = self._root.assoc(0, hash(key) & _HASH_MASK, key, value,
+                                      None)
+        if root is self._root:
+            return self
+        return self._new(root, self._len + added)
+
+    def delete(self, key):
+        '''Return a new mapping without C{key}.
+
+        @raise KeyError: If C{key} is not in the mapping.
+        '''
+        root = self._root.without(0, hash(key) & _HASH_MASK, key)
+        if root is None:
+            root = _EMPTY_NODE
+        return self._new(root, self._len - 1)
+
+    def update(self, keyvalues=(), **other):
+        '''Return a new mapping with the items of a mapping or an iterable of
+        (key,value) pairs, plus the keyword arguments, added to the items of
+        this mapping.'''
+        root,length = self._assocAll(keyvalues, other)
+        if root is self._root:
+            return self
+        return self._new(root, length)
+
+    def __setitem__(self, key, value): self._raise()
+    def __delitem__(self, key): self._raise()
+    def clear(self): self._raise()
+    def setdefault(self, key, default=None): self._raise()
+    def pop(self, key, *default): self._raise()
+    def popitem(self): self._raise()
+    def _raise(self): raise TypeError('PersistentDicts are immutable')
+
+    def _new(self, root, length):
+        new = PersistentDict.__new__(self.__class__)
+        new._root = root
+        new._len = length
+        new._hash = None
+        return new
+
+    def _assocAll(self, keyvalues, other):
+        # the nodes created by this call are owned by a new token, so that
+        # they are updated in place by the subsequent items instead of being
+        # copied again; the nodes of self are never modified
+        owner = object()
+        root = self._root
+        length = self._len
+        if hasattr(keyvalues, 'iteritems'):
+            keyvalues = keyvalues.iteritems()
+        elif hasattr(keyvalues, 'keys'):
+            keyvalues = [(key, keyvalues[key]) for key in keyvalues.keys()]
+        for items in keyvalues, other.iteritems():
+            for key,value in items:
+                root,added = root.assoc(0, hash(key) & _HASH_MASK, key, value,
+                                        owner)
+                length += added
+        return root, length
+
+
+#----- HAMT nodes ------------------------------------------------------------
+
+# only the lower 32 bits of the hashes are used, 5 bits per trie level
+_HASH_MASK = 0xFFFFFFFF
+
+# the key of a subnode entry in a node array
+_NODE = object()
+
+# the number of set bits of all the 16-bit numbers
+_BITCOUNTS = [0]
+for _i in xrange(8):
+    _BITCOUNTS += [count+1 for count in _BITCOUNTS]
+_BITCOUNTS = [high+low for high in _BITCOUNTS for low in _BITCOUNTS]
+del _i
+
+
+class _BitmapNode(object):
+    '''A trie node with an entry for each present 5-bit hash chunk.
+
+    The C{array} stores a (key, value) pair for each entry, in the order of
+    the bits of C{bitmap}; the key of a subnode entry is C{_NODE}. A node is
+    updated in place only if its C{owner} is the (not None) owner of the
+    update.
+    '''
+
+    __slots__ = ('bitmap', 'array', 'owner')
+
+    def __init__(self, bitmap, array, owner):
+        self.bitmap = bitmap
+        self.array = array
+        self.owner = owner
+
+    def assoc(self, shift, h, key, value, owner):
+        '''Return the node with C{key} mapped to C{value} and whether it was
+        a new key.'''
+        bit = 1 << ((h >> shift) & 31)
+        bitmap = self.bitmap
+        index = bitmap & (bit - 1)
+        i = 2 * (_BITCOUNTS[index & 0xFFFF] + _BITCOUNTS[index >> 16])
+        array = self.array
+        inplace = owner is not None and self.owner is owner
+        if not bitmap & bit:
+            if inplace:
+                array[i:i] = [key, value]
+                self.bitmap = bitmap | bit
+                return self, True
+            return _BitmapNode(bitmap | bit, array[:i] + [key, value] +
+                               array[i:], owner), True
+        k = array[i]
+        if k is _NODE:
+            node = array[i+1]
+            newNode,added = node.assoc(shift+5, h, key, value, owner)
+            if newNode is node:
+                return self, added
+            value = newNode
+        elif k is key or k == key:
+            if array[i+1] is value:
+                return self, False
+            added = False
+        else:
+            value = _newNode(shift+5, hash(k) & _HASH_MASK, k, array[i+1],
+                             h, key, value, owner)
+            added = True
+            k = _NODE
+        if not inplace:
+            array = array[:]
+            self = _BitmapNode(bitmap, array, owner)
+        array[i] = k
+        array[i+1] = value
+        return self, added
+
+    def without(self, shift, h, key):
+        '''Return the node without C{key}, or None if it becomes empty.'''
+        bit = 1 << ((h >> shift) & 31)
+        bitmap = self.bitmap
+        if not bitmap & bit:
+            raise KeyError(key)
+        index = bitmap & (bit - 1)
+        i = 2 * (_BITCOUNTS[index & 0xFFFF] + _BITCOUNTS[index >> 16])
+        array = self.array
+        k = array[i]
+        if k is _NODE:
+            node = array[i+1].without(shift+5, h, key)
+            if node is not None:
+                array = array[:]
+                subarray = node.array
+                if len(subarray) == 2 and subarray[0] is not _NODE:
+                    # inline a subnode that is left with a single item
+                    array[i:i+2] = subarray
+                else:
+                    array[i+1] = node
+                return _BitmapNode(bitmap, array, None)
+        elif not (k is key or k == key):
+            raise KeyError(key)
+        if bitmap == bit:
+            return None
+        return _BitmapNode(bitmap ^ bit, array[:i] + array[i+2:], None)
+
+
+class _CollisionNode(object):
+    '''A trie leaf node with the items whose keys have the same hash.'''
+
+    __slots__ = ('hash', 'array', 'owner')
+
+    def __init__(self, hash, array, owner):
+        self.hash = hash
+        self.array = array
+        self.owner = owner
+
+    def find(self, h, key):
+        array = self.array
+        if h == self.hash:
+            for i in xrange(0, len(array), 2):
+                if array[i] == key:
+                    return array[i+1]
+        raise KeyError(key)
+
+    def assoc(self, shift, h, key, value, owner):
+        if h != self.hash:
+            # push this node one level down
+            return _BitmapNode(1 << ((self.hash >> shift) & 31), [_NODE, self],
+                               owner).assoc(shift, h, key, value, owner)
+        array = self.array
+        for i in xrange(0, len(array), 2):
+            if array[i] == key:
+                if array[i+1] is value:
+                    return self, False
+                added = False
+                break
+        else:
+            i = len(array)
+            added = True
+        if owner is None or self.owner is not owner:
+            array = array[:]
+            self = _CollisionNode(h, array, owner)
+        array[i:i+2] = [key, value]
+        return self, added
+
+    def without(self, shift, h, key):
+        array = self.array
+        if h == self.hash:
+            for i in xrange(0, len(array), 2):
+                if array[i] == key:
+                    array = array[:i] + array[i+2:]
+                    if len(array) == 2:
+                        # a single item, to be inlined in the parent
+                        return _BitmapNode(1 << ((h >> shift) & 31), array,
+                                           None)
+                    return _CollisionNode(h, array, None)
+        raise KeyError(key)
+
+
+def _newNode(shift, h1, k1, v1, h2, k2, v2, owner):
+    '''Return a node with the items (k1,v1), (k2,v2).'''
+    if h1 == h2:
+        return _CollisionNode(h1, [k1, v1, k2, v2], owner)
+    b1 = (h1 >> shift) & 31
+    b2 = (h2 >> shift) & 31
+    if b1 == b2:
+        return _BitmapNode(1 << b1, [_NODE, _newNode(shift+5, h1, k1, v1, h2,
+                                                     k2, v2, owner)], owner)
+    if b1 < b2:
+        array = [k1, v1, k2, v2]
+    else:
+        array = [k2, v2, k1, v1]
+    return _BitmapNode((1 << b1) | (1 << b2), array, owner)
+
+
+def _iterItems(node):
+    stack = [node]
+    pop = stack.pop; push = stack.append
+    while stack:
+        array = pop().array
+        for i in xrange(0, len(array), 2):
+            key = array[i]
+            if key is _NODE:
+                push(array[i+1])
+            else:
+                yield key, array[i+1]
+
+
+_EMPTY_NODE = _BitmapNode(0, [], None)
+
+
+if __name__ == '__main__':
+    import sys
+    from timeit import Timer
+
+    def time(stmt, number=1):
+        return min(Timer(stmt).repeat(3, number)) / number
+
+    def kwdsBenchmark(number=100000):
+        '''Compare frozendict and smallfrozendict as (parts of) dict keys for
+        keyword arguments, as they are used by Memoize.'''
+        kwds = {'x': 1, 'y': 'foo'}
+        print 'keys of %d keyword arguments:' % len(kwds)
+        for cls in frozendict, smallfrozendict:
+            cache = {((1,), cls(kwds)): None}
+            print '  %-16s create %.2fus, create+lookup %.2fus, %d bytes' % (
+                cls.__name__, time(lambda: cls(kwds), number) * 1e6,
+                time(lambda: ((1,), cls(kwds)) in cache, number) * 1e6,
+                sys.getsizeof(cls(kwds)))
+
+    def benchmark(n=100000, updates=100):
+        '''Compare a dict and a PersistentDict of n items on construction,
+        lookups and updates that keep the original mapping.'''
+        import random
+        items = [(str(i), i) for i in xrange(n)]
+        keys = [str(random.randrange(n)) for i in xrange(updates)]
+        d = dict(items); p = PersistentDict(items)
+        print '%d items:' % n
+        print '  %-32s %10s %14s' % ('', 'dict', 'PersistentDict')
+        print '  %-32s %9.3fs %13.3fs' % ('construction',
+                                          time(lambda: dict(items)),
+                                          time(lambda: PersistentDict(items)))
+        print '  %-32s %8.2fus %12.2fus' % (
+            'lookup', time(lambda: d['42'], 100000) * 1e6,
+            time(lambda: p['42'], 100000) * 1e6)
+        def copyAndSet():
+            for key in keys:
+                new = d.copy(); new[key] = -1
+        def set():
+            for key in keys:
+                p.set(key, -1)
+        def copyAndDelete():
+            for key in keys:
+                new = d.copy(); del new[key]
+        def delete():
+            for key in keys:
+                p.delete(key)
+        print '  %-32s %8.2fus %12.2fus' % ('set (copy+set for dict)',
+                                            time(copyAndSet) / updates * 1e6,
+                                            time(set) / updates * 1e6)
+        print '  %-32s %8.2fus %12.2fus' % ('delete (copy+del for dict)',
+                                            time(copyAndDelete) / updates * 1e6,
+                                            time(delete) / updates * 1e6)
+        # the hash of a new PersistentDict is not computed yet
+        print '  %-32s %9.3fs %13.3fs' % ('hash',
+            time(lambda: hash(frozenset(d.iteritems()))),
+            time(lambda: hash(p.set('new', 0))))
+
+    kwdsBenchmark()
+    benchmark()
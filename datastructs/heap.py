@@ -58,6 +58,11 @@ class Heap(ListMixin):
     def _get_element(self, pos):
         return self._unwrap(self._lst[pos])
 
+    def _get_slice(self, start, end, step):
+        if end < 0:
+            end = None
+        return map(self._unwrap, self._lst[start:end:step])
+
     def __setitem__(self, pos, item):
         if isinstance(pos, slice):
             raise TypeError('Heap objects do no support slice setting')
@@ -0,0 +1,117 @@
+'''A thread-safe blocking priority queue built on L{datastructs.heap.Heap}.
+
+L{ConcurrentHeapQueue} plugs a L{Heap} into the standard library's
+C{Queue.Queue}, so it inherits its condition variable based protocol:
+C{get} blocks (optionally with a timeout) until an item is available, C{put}
+blocks while a bounded queue is full and C{task_done}/C{join} work as usual.
+Items are retrieved smallest first (or by the heap's C{key}).
+'''
+
+import Queue as _Queue
+
+from datastructs.heap import Heap
+
+__author__ = "George Sakkis <gsakkis@rutgers.edu>"
+__all__ = ['ConcurrentHeapQueue', 'Empty', 'Full']
+
+Empty = _Queue.Empty
+Full = _Queue.Full
+
+
+class ConcurrentHeapQueue(_Queue.Queue):
+    '''A synchronized priority queue.
+
+    All the blocking and locking is done by C{Queue.Queue}; this class only
+    replaces the underlying FIFO container with a L{Heap}.
+    '''
+
+    def __init__(self, maxsize=0, key=None):
+        '''
+        @param maxsize: The maximum number of items in the queue; C{put} blocks
+            when it is reached. If it is <= 0, the queue size is infinite.
+        @param key: Specifies a function of one argument that is used to
+            extract a comparison key from each queued item.
+        '''
+        # must be set before Queue.__init__ calls self._init
+        self._key = key
+        _Queue.Queue.__init__(self, maxsize)
+
+    def peek(self):
+        '''Return the smallest item without removing it.
+
+        @raise Empty: If the queue is empty.
+        '''
+        self.mutex.acquire()
+        try:
+            if not self.queue:
+                raise Empty
+            return self.queue[0]
+        finally:
+            self.mutex.release()
+
+    #---- overrided Queue methods --------------------------------------------
+
+    def _init(self, maxsize):
+        self.queue = Heap(key=self._key)
+
+    def _qsize(self, len=len):
+        return len(self.queue)
+
+    def _put(self, item):
+        self.queue.push(item)
+
+    def _get(self):
+        return self.queue.popmin()
+
+
+if __name__ == '__main__':
+    import sys, time, random, threading
+    from itertools import repeat
+
+    class LockedPollingQueue(object):
+        '''The coarse lock + poll idiom that ConcurrentHeapQueue replaces.'''
+        def __init__(self):
+            self._heap = Heap(); self._lock = threading.Lock()
+        def put(self, item):
+            self._lock.acquire()
+            try: self._heap.push(item)
+            finally: self._lock.release()
+        def get(self):
+            while True:
+                self._lock.acquire()
+                try:
+                    if self._heap:
+                        return self._heap.popmin()
+                finally:
+                    self._lock.release()
+                time.sleep(0.0001)
+
+    def contention(queue, producers, consumers, items):
+        '''Time C{producers} threads putting C{items} each into the queue and
+        C{consumers} threads draining it.'''
+        total = producers * items
+        quotas = [total // consumers] * consumers
+        quotas[-1] += total % consumers
+        def produce():
+            put = queue.put; rand = random.random
+            for _ in repeat(None, items):
+                put(rand())
+        def consume(quota):
+            get = queue.get
+            for _ in repeat(None, quota):
+                get()
+        threads = [threading.Thread(target=produce) for _ in xrange(producers)]
+        threads += [threading.Thread(target=consume, args=(q,)) for q in quotas]
+        start = time.time()
+        for t in threads: t.start()
+        for t in threads: t.join()
+        return time.time() - start
+
+    items = int((sys.argv[1:] or [20000])[0])
+    for producers,consumers in (1,1), (4,1), (1,4), (4,4), (8,8):
+        print '%d producers, %d consumers, %d items each:' % (producers,
+                                                             consumers, items)
+        for factory in LockedPollingQueue, ConcurrentHeapQueue:
+            print '  %-20s %.3fs' % (factory.__name__,
+                                     contention(factory(), producers,
+                                                consumers, items))
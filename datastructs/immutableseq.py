@@ -1,6 +1,7 @@
 '''An immutable sequence type providing memory efficient slicing.'''
 
 from copy import copy
+from bisect import bisect_right
 from itertools import izip,imap,islice,chain
 
 from common.comparable import Comparable
@@ -25,28 +26,43 @@ class ImmutableSequence(object):
         del a
     the memory required to store C{a} cannot be garbage collected after C{del
     a}. Hopefully such cases are rare.
+
+    Concatenation (L{__add__}), repetition (L{__mul__}), L{append} and L{set}
+    return sequences stored in a persistent vector: a relaxed radix balanced
+    (RRB) tree whose leaves are tuples. These operations take O(log n) time
+    (O(log n * log num) for repetition) and the returned sequence shares most
+    of its nodes with its operands. Indexing such a sequence takes O(log n)
+    time; slicing it returns a view, as for any other sequence.
+
+    ImmutableSequences are hashable; the hash is computed the first time it
+    is needed.
     '''
 
     __metaclass__ = Comparable
-    __slots__ = '_sequence', '_len', '_slicetuple'
+    __slots__ = '_sequence', '_len', '_slicetuple', '_hash'
 
     def __init__(self, iterable):
         if isinstance(iterable,ImmutableSequence):
             self._sequence = iterable._sequence
             self._len = iterable._len
             self._slicetuple = iterable._slicetuple
+            self._hash = iterable._hash
             return
         if not isinstance(iterable, tuple):
             iterable = tuple(iterable)
         self._sequence = iterable
         self._len = len(iterable)
         self._slicetuple = (0, self._len , 1)
+        self._hash = None
 
     def __len__(self):
         return self._len
 
     def __iter__(self):
-        return imap(self._sequence.__getitem__, xrange(*self._slicetuple))
+        start,stop,step = self._slicetuple
+        if step == 1 and isinstance(self._sequence, _Vector):
+            return self._sequence.iterRange(start, start+self._len)
+        return imap(self._sequence.__getitem__, xrange(start,stop,step))
 
     def __getitem__(self, indexOrSlice):
         size = len(self)
@@ -67,25 +83,50 @@ class ImmutableSequence(object):
         div,mod = divmod(new_stop-new_start, new_step)
         newSequence._len = max(0,div + (mod!=0))
         newSequence._slicetuple = (new_start, new_stop, new_step)
+        newSequence._hash = None
         return newSequence
 
     def __add__(self,other):
         if isinstance(other,ImmutableSequence):
-            return ImmutableSequence(chain(self,other))
+            return _fromVector(self._vector().concat(other._vector()))
         selftype = _typename(self)
         raise TypeError('can only concatenate %s (not "%s") to '
                         '%s' % (selftype,_typename(other),selftype))
 
     def __mul__(self,num):
-        try:
-            # chain [num] iterators of self together
-            return ImmutableSequence(chain(*imap(lambda n:iter(self),
-                                                  xrange(num))))
-        except TypeError:
+        if not isinstance(num, (int,long)):
             raise TypeError("can't multiply sequence to non-int")
+        # concatenate the powers of two of self that sum up to num; they
+        # share their nodes
+        result = _Vector()
+        power = self._vector()
+        while num > 0:
+            if num & 1:
+                result = result.concat(power)
+            num >>= 1
+            if num:
+                power = power.concat(power)
+        return _fromVector(result)
 
     __rmul__ = __mul__
 
+    def append(self, item):
+        '''Return a new sequence with C{item} appended to this one.'''
+        return _fromVector(self._vector().append(item))
+
+    def set(self, index, item):
+        '''Return a new sequence with the item at C{index} replaced by C{item}.
+
+        @raise IndexError: If C{index} is out of range.
+        '''
+        size = len(self)
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError("%s assignment index out of range" %
+                             _typename(self))
+        return _fromVector(self._vector().set(index, item))
+
     def __str__(self):
         return "<%s>" % ', '.join(imap(repr,self))
 
@@ -94,8 +135,18 @@ class ImmutableSequence(object):
                              ', '.join(imap(repr,self)))
 
     def __eq__(self,other):
+        if self is other:
+            return True
         if not isinstance(other,ImmutableSequence) or len(self) != len(other):
             return False
+        if self._hash is not None and other._hash is not None \
+           and self._hash != other._hash:
+            return False
+        if self._sequence is other._sequence and \
+           self._slicetuple == other._slicetuple:
+            return True
+        if self._isTuple() and other._isTuple():
+            return self._sequence == other._sequence
         for i,j in izip(self,other):
             if i!=j:
                 return False
@@ -108,13 +159,343 @@ class ImmutableSequence(object):
         diff = len(self) - len(other)
         if diff>0: return True
         if diff<0: return False
+        # same length: lexicographic comparison
+        if self._sequence is other._sequence and \
+           self._slicetuple == other._slicetuple:
+            return False
+        if self._isTuple() and other._isTuple():
+            return self._sequence > other._sequence
         for i,j in izip(self,other):
-            if i>j:
-                return True
+            if i!=j:
+                return i>j
         return False
 
+    def __hash__(self):
+        if self._hash is None:
+            if self._isTuple():
+                self._hash = hash(self._sequence)
+            else:
+                self._hash = hash(tuple(self))
+        return self._hash
+
+    def _isTuple(self):
+        # whether self is (a view of) a whole tuple
+        return self._slicetuple[0] == 0 and self._slicetuple[2] == 1 and \
+               isinstance(self._sequence, tuple) and \
+               self._len == len(self._sequence)
+
+
+    def _vector(self):
+        # return the items of self as a _Vector
+        sequence = self._sequence
+        start,stop,step = self._slicetuple
+        if isinstance(sequence, _Vector):
+            if step == 1:
+                return sequence.slice(start, start+self._len)
+            return _Vector(self)
+        if step == 1:
+            return _Vector(sequence[start:start+self._len])
+        return _Vector(sequence[start:stop:step])
+
+
+def _fromVector(vector):
+    sequence = ImmutableSequence.__new__(ImmutableSequence)
+    sequence._sequence = vector
+    sequence._len = len(vector)
+    sequence._slicetuple = (0, sequence._len, 1)
+    sequence._hash = None
+    return sequence
+
+
+#----- persistent vector -----------------------------------------------------
+
+# the maximum number of items of a leaf and of children of an internal node
+_WIDTH = 32
+
+
+class _Vector(object):
+    '''A persistent vector implemented as a relaxed radix balanced tree.
+
+    The leaves of the tree are tuples of at most C{_WIDTH} items and the
+    internal nodes are C{(children, sizes)} tuples of at most C{_WIDTH}
+    children, where C{sizes} are the cumulative numbers of items of the
+    children; unlike a strict radix balanced tree the nodes need not be full,
+    so the child that holds an index is located by bisecting the sizes. All
+    the leaves have the same depth, the height of the tree. Concatenation
+    merges the adjacent nodes along the seam if they fit in a single node,
+    which keeps the nodes (except those at the edges of a slice) half full on
+    average and the height logarithmic.
+    '''
+
+    __slots__ = ('_root', '_height', '_len')
+
+    def __init__(self, iterable=()):
+        items = tuple(iterable)
+        nodes = [items[i:i+_WIDTH] for i in xrange(0, len(items), _WIDTH)]
+        height = 0
+        while len(nodes) > 1:
+            height += 1
+            nodes = [_makeNode(nodes[i:i+_WIDTH], height)
+                     for i in xrange(0, len(nodes), _WIDTH)]
+        if nodes:
+            self._root = nodes[0]
+        else:
+            self._root = ()
+        self._height = height
+        self._len = len(items)
+
+    def __len__(self):
+        return self._len
+
+    def __getitem__(self, index):
+        # index must be in xrange(len(self))
+        node = self._root
+        for level in xrange(self._height):
+            children,sizes = node
+            i = bisect_right(sizes, index)
+            if i:
+                index -= sizes[i-1]
+            node = children[i]
+        return node[index]
+
+    def iterRange(self, start, stop):
+        '''Iterate over the items in C{xrange(start,stop)}.'''
+        if start >= stop:
+            return
+        # the path to the leaf of start, as a list of [children, index]
+        path = []
+        node = self._root
+        index = start
+        for level in xrange(self._height):
+            children,sizes = node
+            i = bisect_right(sizes, index)
+            if i:
+                index -= sizes[i-1]
+            path.append([children, i])
+            node = children[i]
+        remaining = stop - start
+        while True:
+            for item in islice(node, index, index+remaining):
+                yield item
+            remaining -= len(node) - index
+            if remaining <= 0:
+                return
+            # move to the next leaf
+            level = len(path) - 1
+            while path[level][1] == len(path[level][0]) - 1:
+                level -= 1
+            path[level][1] += 1
+            node = path[level][0][path[level][1]]
+            for level in xrange(level+1, len(path)):
+                path[level] = [node[0], 0]
+                node = node[0][0]
+            index = 0
+
+    def concat(self, other):
+        '''Return the concatenation of this and another vector.'''
+        if not other._len:
+            return self
+        if not self._len:
+            return other
+        nodes = _concat(self._root, self._height, other._root, other._height)
+        height = max(self._height, other._height)
+        if len(nodes) == 1:
+            root = nodes[0]
+        else:
+            height += 1
+            root = _makeNode(nodes, height)
+        return _newVector(root, height, self._len + other._len)
+
+    def append(self, item):
+        '''Return a new vector with C{item} appended.'''
+        return self.concat(_newVector((item,), 0, 1))
+
+    def set(self, index, item):
+        '''Return a new vector with the item at C{index} replaced by
+        C{item}.'''
+        return _newVector(_set(self._root, self._height, index, item),
+                          self._height, self._len)
+
+    def slice(self, start, stop):
+        '''Return a vector of the items in C{xrange(start,stop)}.'''
+        if start >= stop:
+            return _Vector()
+        if start == 0 and stop == self._len:
+            return self
+        root = _slice(self._root, self._height, start, stop)
+        height = self._height
+        # drop the roots with a single child
+        while height and len(root[0]) == 1:
+            root = root[0][0]
+            height -= 1
+        return _newVector(root, height, stop - start)
+
+
+def _newVector(root, height, length):
+    vector = _Vector.__new__(_Vector)
+    vector._root = root
+    vector._height = height
+    vector._len = length
+    return vector
+
+
+def _makeNode(children, height):
+    # return an internal node of the given height
+    sizes = []
+    total = 0
+    if height == 1:
+        for leaf in children:
+            total += len(leaf)
+            sizes.append(total)
+    else:
+        for child in children:
+            total += child[1][-1]
+            sizes.append(total)
+    return (tuple(children), tuple(sizes))
+
+
+def _concat(left, leftHeight, right, rightHeight):
+    '''Concatenate two trees and return a list of one or two nodes of height
+    C{max(leftHeight,rightHeight)}.'''
+    # if the children overflow a node, the node away from the seam is kept
+    # full, so that repeated appends (or prepends) fill up the nodes
+    split = _WIDTH
+    if leftHeight > rightHeight:
+        height = leftHeight
+        children,sizes = left
+        nodes = _concat(children[-1], height-1, right, rightHeight)
+        children = children[:-1] + tuple(nodes)
+        if len(children) <= _WIDTH:
+            # only the sizes of the last nodes change
+            sizes = list(sizes[:-1])
+            if sizes:
+                total = sizes[-1]
+            else:
+                total = 0
+            for node in nodes:
+                total += _size(node, height-1)
+                sizes.append(total)
+            return [(children, tuple(sizes))]
+    elif leftHeight < rightHeight:
+        height = rightHeight
+        children = right[0]
+        children = tuple(_concat(left, leftHeight, children[0],
+                                 height-1)) + children[1:]
+        split = len(children) - _WIDTH
+    elif leftHeight:
+        height = leftHeight
+        leftChildren = left[0]; rightChildren = right[0]
+        # merge the adjacent nodes along the seam, at every level
+        children = (leftChildren[:-1] +
+                    tuple(_concat(leftChildren[-1], height-1,
+                                  rightChildren[0], height-1)) +
+                    rightChildren[1:])
+    elif len(left) + len(right) <= _WIDTH:
+        return [left + right]
+    else:
+        return [left, right]
+    if len(children) <= _WIDTH:
+        return [_makeNode(children, height)]
+    return [_makeNode(children[:split], height),
+            _makeNode(children[split:], height)]
+
+
+def _size(node, height):
+    if height:
+        return node[1][-1]
+    return len(node)
+
+
+def _set(node, height, index, item):
+    if not height:
+        return node[:index] + (item,) + node[index+1:]
+    children,sizes = node
+    i = bisect_right(sizes, index)
+    if i:
+        index -= sizes[i-1]
+    children = list(children)
+    children[i] = _set(children[i], height-1, index, item)
+    return (tuple(children), sizes)
+
+
+def _slice(node, height, start, stop):
+    # return a node of the same height with the items in xrange(start,stop)
+    if not height:
+        return node[start:stop]
+    children,sizes = node
+    first = bisect_right(sizes, start)
+    last = bisect_right(sizes, stop-1)
+    if first:
+        offset = sizes[first-1]
+    else:
+        offset = 0
+    if first == last:
+        return _makeNode([_slice(children[first], height-1, start-offset,
+                                 stop-offset)], height)
+    lastOffset = sizes[last-1]
+    children = ((_slice(children[first], height-1, start-offset,
+                        sizes[first]-offset),) +
+                children[first+1:last] +
+                (_slice(children[last], height-1, 0, stop-lastOffset),))
+    return _makeNode(children, height)
+
 
 def _typename(obj):
     try: return obj.__class__.__name__
     except AttributeError:
         return type(obj).__name__
+
+
+if __name__ == '__main__':
+    import time
+
+    def concatenations(n):
+        '''Build a sequence by n concatenations of a single item, with the
+        persistent vector vs by copying the items to a new tuple.'''
+        item = ImmutableSequence([None])
+        start = time.time()
+        sequence = ImmutableSequence([])
+        for i in xrange(n):
+            sequence = sequence + item
+        vectorTime = time.time() - start
+        start = time.time()
+        sequence = ImmutableSequence([])
+        for i in xrange(n):
+            sequence = ImmutableSequence(chain(sequence, item))
+        tupleTime = time.time() - start
+        print '  %7d concatenations: vector %.3fs, tuple copies %.3fs' % (
+            n, vectorTime, tupleTime)
+
+    def indexing(n=100000, number=100000):
+        '''Compare the time of indexing and iterating over a sequence stored
+        in a tuple vs in a vector.'''
+        from timeit import Timer
+        sequences = [('tuple', ImmutableSequence(xrange(n))),
+                     ('vector', ImmutableSequence([]) + ImmutableSequence(xrange(n)))]
+        for name,sequence in sequences:
+            index = Timer(lambda: sequence[n//2]).timeit(number) / number
+            iterate = Timer(lambda: list(sequence)).timeit(3) / 3
+            print '  %-7s index %.2fus, iterate over %d items %.3fs' % (
+                name, index*1e6, n, iterate)
+
+    def comparisons(n=100000):
+        '''Compare the time of comparing equal sequences stored in tuples
+        (compared directly) vs in vectors (compared item by item).'''
+        from timeit import Timer
+        items = range(n)
+        for name,make in [('tuple', lambda: ImmutableSequence(items)),
+                          ('vector', lambda: ImmutableSequence(items).append(0))]:
+            a,b = make(),make()
+            eq = min(Timer(lambda: a == b).repeat(3, 10)) / 10
+            gt = min(Timer(lambda: a > b).repeat(3, 10)) / 10
+            print '  %-7s == %.2fms, > %.2fms, first hash %.2fms' % (
+                name, eq*1e3, gt*1e3,
+                Timer(lambda: hash(make())).timeit(1)*1e3)
+
+    print 'comparison of %d items:' % 100000
+    comparisons()
+    print 'repeated concatenation:'
+    for n in 1000, 3000, 10000:
+        concatenations(n)
+    print 'access:'
+    indexing()
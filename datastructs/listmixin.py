@@ -70,6 +70,16 @@ class ListMixin(object):
   The _constructor() method accepts an iterable and should return a new
   instance of the same class as self, populated with the elements of
   the given iterable.
+
+  Subclasses can also define the bulk methods _get_slice(start, end,
+  step), _set_slice(start, end, step, values) and _delete_indices(start,
+  end, step) for extra speed on slices; by default they call the
+  element methods once per index.  They are given the arguments of
+  xrange() for the indices of a non-empty slice; the indices are within
+  range, but end may be -1 if step < 0.  _get_slice() should return a
+  list of the elements, _set_slice() is given a sequence of
+  len(xrange(start, end, step)) values and _delete_indices() should
+  remove the elements and shift the following ones down.
   """
   def __cmp__(self, other):
     return cmp(list(self), list(other))
@@ -102,14 +112,29 @@ class ListMixin(object):
       raise IndexError('list index out of range')
     return i
 
+  def _get_slice(self, start, end, step):
+    return [self._get_element(i) for i in xrange(start, end, step)]
+
+  def _set_slice(self, start, end, step, values):
+    for (j, assign_val) in enumerate(values):
+      self._set_element(start + j*step, assign_val)
+
+  def _delete_indices(self, start, end, step):
+    indices = range(start, end, step)
+    # Sort indices descending
+    if len(indices) > 0 and indices[0] < indices[-1]:
+      indices.reverse()
+    for j in indices:
+      del self[j]
+
   def __getitem__(self, i):
     if isinstance(i, slice):
       (start, end, step) = self._tuple_from_slice(i)
       if step == None:
-        indices = xrange(start, end)
-      else:
-        indices = xrange(start, end, step)
-      return self._constructor([self._get_element(i) for i in indices])
+        step = 1
+      if len(xrange(start, end, step)) == 0:
+        return self._constructor([])
+      return self._constructor(self._get_slice(start, end, step))
     else:
       return self._get_element(self._fix_index(i))
 
@@ -123,14 +148,14 @@ class ListMixin(object):
           raise ValueError(('attempt to assign sequence of size %d' +
                             ' to extended slice of size %d') %
                            (len(value), len(indices)))
-        for (j, assign_val) in enumerate(value):
-          self._set_element(indices[j], assign_val)
+        if len(indices) > 0:
+          self._set_slice(start, end, step, value)
       else:
         # Normal slice
         if len(value) != (end - start):
           self._resize_region(start, end, len(value))
-        for (j, assign_val) in enumerate(value):
-          self._set_element(start + j, assign_val)
+        if len(value) > 0:
+          self._set_slice(start, start + len(value), 1, value)
     else:
       # Single element
       self._set_element(self._fix_index(i), value)
@@ -140,12 +165,8 @@ class ListMixin(object):
       (start, end, step) = self._tuple_from_slice(i)
       if step != None:
         # Extended slice
-        indices = range(start, end, step)
-        # Sort indices descending
-        if len(indices) > 0 and indices[0] < indices[-1]:
-          indices.reverse()
-        for j in indices:
-          del self[j]
+        if len(xrange(start, end, step)) > 0:
+          self._delete_indices(start, end, step)
       else:
         # Normal slice
         self._resize_region(start, end, 0)
@@ -301,10 +322,43 @@ class TestList(ListMixin):
     assert start <= end
     self.L[start:end] = [None] * new_size
 
+  def _get_slice(self, start, end, step):
+    return self.L[start:_slice_end(end):step]
+
+  def _set_slice(self, start, end, step, values):
+    if step == 1:
+      self.L[start:end] = values
+    else:
+      self.L[start:_slice_end(end):step] = values
+
+  def _delete_indices(self, start, end, step):
+    del self.L[start:_slice_end(end):step]
+
   def __iter__(self):
     return iter(self.L)
 
 
+def _slice_end(end):
+  """
+  Convert an xrange() end to a slice end (-1 means before index 0).
+  """
+  if end < 0:
+    return None
+  return end
+
+
+class ElementList(TestList):
+  """
+  TestList that does not define the bulk slice methods.
+  """
+  _get_slice = ListMixin._get_slice
+  _set_slice = ListMixin._set_slice
+  _delete_indices = ListMixin._delete_indices
+
+  def _constructor(self, iterable):
+    return ElementList(iterable)
+
+
 def test_list_mixin(list_class=TestList, rand_elem=None):
   """
   Unit test for ListMixin.
@@ -576,8 +630,33 @@ def test(list_class=TestList):
   """
   print 'Testing:'
   test_list_mixin(list_class)
+  test_list_mixin(ElementList)
   print '  ListMixin:     OK'
 
 
+def benchmark(n=1000000):
+  """
+  Time slice operations on a list of n elements, with and without the
+  bulk slice methods.
+  """
+  import time
+  print 'Slice operations on %d elements:' % n
+  for list_class in ElementList, TestList:
+    x = list_class(xrange(n))
+    times = []
+    start = time.time()
+    x[1:-1]
+    times.append(time.time() - start)
+    start = time.time()
+    x[::2] = x[1::2]
+    times.append(time.time() - start)
+    start = time.time()
+    del x[::1000]
+    times.append(time.time() - start)
+    print ('  %-12s get %.3fs, extended set %.3fs, del [::1000] %.3fs' %
+           ((list_class.__name__,) + tuple(times)))
+
+
 if __name__ == '__main__':
   test()
+  benchmark()
@@ -6,20 +6,42 @@ be recovered from the cache instead of being computed again. The L{Memoize}
 class wraps a function f into a callable proxy instance that caches
 transparently f's results. In addition, the L{memoizedmethod} function can be
 used within a class definition to wrap a newly defined method as a memoized
-proxy method.
+proxy method. By default the cache is an unbounded dict; the C{maxsize} and
+C{ttl} options bound it using the caches of L{datastructs.cache}.
+L{SynchronizedMemoize} is a thread-safe L{Memoize} that computes each missing
+value only once, no matter how many threads ask for it concurrently.
+L{AsyncMemoize} returns immediately a future of the result and computes the
+missing values in the background. L{batchmemoize} memoizes vectorized
+functions, which map a sequence of elements to the sequence of their results,
+per element.
+
+Every memoized callable keeps statistics of its cache (see L{Memoize.stats})
+and can call hooks on cache misses and evictions; L{allMemoized} returns all
+the live memoized callables, e.g. for exporting their statistics.
 
 The memento pattern is essentially the application of memoization for factory
 functions, functions that generate instances (not necessarily new). Here the
-pattern is implemented as the L{Memento} metaclass.
+pattern is implemented as the L{Memento} metaclass. L{WeakMemento} (and in
+general the metaclasses returned by L{weakMemento}) do not keep the created
+instances alive after they are no longer used.
 
 '''
 
+import sys
+import time
 import types
+import inspect
+import weakref
+import threading
+from itertools import izip
 
-from datastructs.frozendict import frozendict, Empty as EmptyDict
+from datastructs.frozendict import frozendict, smallfrozendict
+from datastructs.cache import LRUCache, TTLCache, WeakValueCache
 
 __author__ = "George Sakkis <gsakkis@rutgers.edu>"
-__all__ = ["Memoize", "Memento", "memoizedmethod"]
+__all__ = ["Memoize", "SynchronizedMemoize", "AsyncMemoize", "Memento",
+           "WeakMemento", "memoizedmethod", "batchmemoize", "weakMemento",
+           "allMemoized"]
 
 
 #=============================================================================
@@ -27,11 +49,34 @@ __all__ = ["Memoize", "Memento", "memoizedmethod"]
 # the default class to be used for caching the function results
 _defaultcache = dict
 
+# the timer used for measuring the compute time of the memoized callables
+_timer = time.time
+
+# all the live Memoize instances
+_registry = weakref.WeakKeyDictionary()
+
+
+def allMemoized():
+    '''Return a list of all the live L{Memoize} instances (including the
+    L{memoizedmethod}s and the L{Memento} metaclass).'''
+    return _registry.keys()
+
 
 class Memoize:
-    '''An implementation of the memoization pattern.'''
+    '''An implementation of the memoization pattern.
+
+    @ivar onMiss: If not None, a callable C{f(memoized, key, elapsed)} that is
+        called after computing (and caching) the value of an uncached C{key};
+        C{elapsed} is the computation time in seconds.
+    @ivar onEvict: If not None, a callable C{f(memoized, key, value)} that is
+        called when an item is evicted from a bounded cache. The cache must
+        have an C{onEvict} attribute, as those of L{datastructs.cache}.
+    '''
 
-    def __init__(self, function, cacheFactory=_defaultcache, makeHashable=None):
+    onMiss = onEvict = None
+
+    def __init__(self, function, cacheFactory=_defaultcache, makeHashable=None,
+                 maxsize=None, ttl=None):
         '''Memoize a function.
 
         @param function: The function to be memoized.
@@ -41,38 +86,406 @@ class Memoize:
         @param makeHashable: A callable f(*args, **kwds) that returns a hashable
             representation of args and kwds if the latter are not hashable.
             Leave it to None if args and kwds are expected to be hashable always.
+        @param maxsize: If not None, cache at most this many results, evicting
+            the least recently used ones (shortcut for an L{LRUCache}
+            C{cacheFactory}).
+        @param ttl: If not None, cached results expire after C{ttl} seconds
+            (shortcut for a L{TTLCache} C{cacheFactory}, bounded by C{maxsize}).
         '''
+        if maxsize is not None or ttl is not None:
+            if cacheFactory is not _defaultcache:
+                raise ValueError('maxsize and ttl cannot be combined with '
+                                 'a cacheFactory')
+            cacheFactory = _boundedCacheFactory(maxsize, ttl)
         self._cache = cacheFactory()
         self._callable = function
         self._makeHashable = makeHashable
+        if makeHashable is not None:
+            self._getKey = makeHashable
+        else:
+            # a key function specialized to the function's signature
+            self._getKey = _keyFunction(function) or self._getKey
+        self._hits = self._misses = self._evictions = 0
+        self._computeTime = 0.0
+        if hasattr(self._cache, 'onEvict'):
+            self._cache.onEvict = self._evicted
+        _registry[self] = None
 
     def __call__(self, *args, **kwds):
         '''
         Return the cached value of for the given arguments, or if it is not
         cached, call the memoized callable and cache the computed value.
         '''
-        cache = self._cache
-        if self._makeHashable is None:
-            key = self._getKey(*args,**kwds)
-        else:
-            key = self._makeHashable(*args,**kwds)
-        try: return cache[key]
+        key = self._getKey(*args,**kwds)
+        try: cachedValue = self._cache[key]
         except KeyError:
-            cachedValue = cache[key] = self._callable(*args,**kwds)
-            return cachedValue
+            return self._compute(key, args, kwds)
+        self._hits += 1
+        return cachedValue
+
+    def stats(self):
+        '''Return a dict of the cache statistics.
+
+        The keys of the dict are:
+         - C{name}: The name of the memoized callable.
+         - C{hits}: The number of calls whose result was found in the cache.
+         - C{misses}: The number of calls that computed their result.
+         - C{evictions}: The number of results evicted from the cache.
+         - C{size}: The current number of cached results (None if the cache
+           does not support C{len}).
+         - C{computeTime}: The total time (in seconds) spent in computing the
+           results.
+        '''
+        try: size = len(self._cache)
+        except TypeError:
+            size = None
+        return {'name': _name(self._callable), 'hits': self._hits,
+                'misses': self._misses, 'evictions': self._evictions,
+                'size': size, 'computeTime': self._computeTime}
+
+    def _compute(self, key, args, kwds):
+        start = _timer()
+        value = self._callable(*args,**kwds)
+        elapsed = _timer() - start
+        self._store(key, value)
+        self._misses += 1
+        self._computeTime += elapsed
+        if self.onMiss is not None:
+            self.onMiss(self, key, elapsed)
+        return value
+
+    def _store(self, key, value):
+        self._cache[key] = value
+
+    def _evicted(self, key, value):
+        self._evictions += 1
+        if self.onEvict is not None:
+            self.onEvict(self, key, value)
 
     def _getKey(self,*args,**kwds):
-        '''Return the cache key for a function call with the given arguments.'''
+        '''Return the cache key for a function call with the given arguments.
+
+        This is the generic version, used if the signature of the memoized
+        callable cannot be introspected.
+        '''
         if kwds:
-            return (args, frozendict(kwds))
-        if not (len(args) == 2 and \
-                isinstance(args[0],tuple) and \
-                isinstance(args[1],frozendict)):
-            return args
-        return (args, EmptyDict)
+            # smallfrozendicts compare equal to tuples of pairs; the tag keeps
+            # keyword arguments apart from positional ones
+            return (_KWDS, args, _frozenKwds(kwds))
+        return args
+
+
+class SynchronizedMemoize(Memoize):
+    '''A thread-safe L{Memoize} that computes each value at most once.
+
+    When several threads call it concurrently with the same uncached
+    arguments, the first one computes the value and the rest wait for it
+    (single-flight), instead of computing it too. Calls with different
+    arguments compute their values in parallel; the calls in progress are
+    kept in a number of dicts ("stripes"), each guarded by its own lock, to
+    reduce lock contention. If the computation raises an exception, it is
+    propagated to all the waiting callers and nothing is cached.
+    '''
+
+    def __init__(self, function, cacheFactory=_defaultcache, makeHashable=None,
+                 maxsize=None, ttl=None, stripes=16):
+        '''Memoize a function.
+
+        @param stripes: The number of locks guarding the calls in progress.
+        @see: L{Memoize.__init__} for the rest of the arguments.
+        '''
+        Memoize.__init__(self, function, cacheFactory, makeHashable, maxsize,
+                         ttl)
+        # guards the cache, which (e.g. an LRUCache) may be mutated on lookup
+        self._cacheLock = threading.Lock()
+        self._stripes = [(threading.Lock(), {}) for i in xrange(stripes)]
+
+    def __call__(self, *args, **kwds):
+        '''
+        Return the cached value of for the given arguments, or if it is not
+        cached, call the memoized callable (or wait for the thread that is
+        already calling it) and cache the computed value.
+        '''
+        key = self._getKey(*args,**kwds)
+        try: value = self._lookup(key)
+        except KeyError: pass
+        else:
+            self._hits += 1
+            return value
+        lock,inflight = self._stripes[hash(key) % len(self._stripes)]
+        lock.acquire()
+        try:
+            call = inflight.get(key)
+            if call is None:
+                # check again: the value may have been computed in between
+                try: value = self._lookup(key)
+                except KeyError: pass
+                else:
+                    self._hits += 1
+                    return value
+                call = inflight[key] = _InflightCall()
+                owner = True
+            else:
+                owner = False
+        finally:
+            lock.release()
+        if not owner:
+            value = call.result()
+            self._hits += 1
+            return value
+        try:
+            try:
+                value = self._compute(key, args, kwds)
+            except:
+                call.setException(sys.exc_info())
+                raise
+            call.setResult(value)
+            return value
+        finally:
+            lock.acquire()
+            try: del inflight[key]
+            finally: lock.release()
+
+    def _lookup(self, key):
+        self._cacheLock.acquire()
+        try: return self._cache[key]
+        finally: self._cacheLock.release()
+
+    def _store(self, key, value):
+        self._cacheLock.acquire()
+        try: self._cache[key] = value
+        finally: self._cacheLock.release()
+
+
+class AsyncMemoize(Memoize):
+    '''A L{Memoize} whose calls return futures of the results.
+
+    A call returns immediately a future, an object with a C{result()} method
+    that waits for the value (or re-raises the exception of the computation)
+    and a C{done()} method that returns whether it is available. Missing
+    values are computed in the background, by default each in a new thread.
+    Concurrent calls with the same uncached arguments share the same future,
+    so each value is computed at most once. Values are cached when they are
+    computed; exceptions are propagated to the future and are not cached.
+    '''
+
+    def __init__(self, function, cacheFactory=_defaultcache, makeHashable=None,
+                 maxsize=None, ttl=None, spawn=None):
+        '''Memoize a function.
+
+        @param spawn: A callable C{f(task)} that arranges for the callable
+            C{task} to be called in the background (e.g. by a thread pool).
+            By default it starts a new daemon thread for each task.
+        @see: L{Memoize.__init__} for the rest of the arguments.
+        '''
+        Memoize.__init__(self, function, cacheFactory, makeHashable, maxsize,
+                         ttl)
+        self._spawn = spawn or _spawnThread
+        # guards both the cache and the calls in progress
+        self._lock = threading.Lock()
+        self._inflight = {}
+
+    def __call__(self, *args, **kwds):
+        '''
+        Return a future of the value for the given arguments: a completed
+        future if the value is cached, otherwise the future of the call in
+        progress for these arguments, starting it if necessary.
+        '''
+        key = self._getKey(*args,**kwds)
+        self._lock.acquire()
+        try:
+            try: value = self._cache[key]
+            except KeyError:
+                call = self._inflight.get(key)
+                if call is not None:
+                    self._hits += 1
+                    return call
+                call = self._inflight[key] = _InflightCall()
+            else:
+                self._hits += 1
+                call = _InflightCall()
+                call.setResult(value)
+                return call
+        finally:
+            self._lock.release()
+        self._spawn(lambda: self._run(call, key, args, kwds))
+        return call
+
+    def _run(self, call, key, args, kwds):
+        try:
+            try:
+                value = self._compute(key, args, kwds)
+            finally:
+                self._lock.acquire()
+                try: del self._inflight[key]
+                finally: self._lock.release()
+        except:
+            call.setException(sys.exc_info())
+        else:
+            call.setResult(value)
+
+    def _store(self, key, value):
+        self._lock.acquire()
+        try: self._cache[key] = value
+        finally: self._lock.release()
+
+
+def _spawnThread(task):
+    thread = threading.Thread(target=task)
+    thread.setDaemon(True)
+    thread.start()
 
 
-def memoizedmethod(function, cacheFactory=_defaultcache, makeHashable=None):
+class _InflightCall(object):
+    '''The (future) result of a memoized call in progress, shared by the
+    callers that wait for it.'''
+
+    def __init__(self):
+        self._done = threading.Event()
+        self._result = self._excinfo = None
+
+    def done(self):
+        return self._done.isSet()
+
+    def setResult(self, result):
+        self._result = result
+        self._done.set()
+
+    def setException(self, excinfo):
+        self._excinfo = excinfo
+        self._done.set()
+
+    def result(self):
+        self._done.wait()
+        if self._excinfo is not None:
+            raise self._excinfo[0], self._excinfo[1], self._excinfo[2]
+        return self._result
+
+
+# markers of the keys that are not plain positional argument tuples; being
+# private, they cannot be the first argument of a call
+_KWDS = object()
+_INVALID = object()
+_UNHASHABLE = object()
+
+def _keyFunction(function):
+    '''Return a cache key function specialized for the signature of the given
+    function, or None if the signature cannot be introspected.
+
+    The returned key function maps all the calls that bind the same values to
+    the function's parameters to the same key, e.g. for C{def f(a, b=2)} all of
+    C{f(1)}, C{f(1,2)}, C{f(1,b=2)} and C{f(b=2,a=1)} have the key C{(1,2)}.
+    Unhashable defaults (e.g. C{def f(a, opts={})}) are represented in the key
+    of the calls that omit them by a placeholder.
+    Calls that do not match the signature get a key of their own; they are
+    expected to raise TypeError when the function is called.
+    '''
+    if inspect.ismethod(function):
+        func = function.im_func
+        bound = function.im_self is not None
+    else:
+        func = function
+        bound = False
+    if not inspect.isfunction(func):
+        return None
+    names,varargs,varkw,defaults = inspect.getargspec(func)
+    if bound:
+        names = names[1:]
+    for name in names:
+        if not isinstance(name, str):   # tuple parameters
+            return None
+    numNames = len(names)
+    defaults = defaults or ()
+    firstDefault = numNames - len(defaults)
+    if bound and len(defaults) > numNames:  # default of the bound argument
+        defaults = defaults[1:]; firstDefault = 0
+    defaults = tuple(map(_keyDefault, defaults))
+
+    def normalize(args, kwds):
+        # slow path: bind kwds and defaults to positional parameters
+        numArgs = len(args)
+        if numArgs > numNames and varargs is None:
+            return _invalidKey(args, kwds)
+        if not kwds:
+            if numArgs < firstDefault:  # missing argument
+                return _invalidKey(args, kwds)
+            return args + defaults[numArgs-firstDefault:]
+        if numArgs < numNames:
+            kwds = kwds.copy()
+            args = list(args)
+            for i in xrange(numArgs, numNames):
+                name = names[i]
+                if name in kwds:
+                    args.append(kwds.pop(name))
+                elif i >= firstDefault:
+                    args.append(defaults[i-firstDefault])
+                else:   # missing argument
+                    return _invalidKey(args, kwds)
+            args = tuple(args)
+            if not kwds:
+                return args
+        if varkw is None:
+            return _invalidKey(args, kwds)
+        for name in names:
+            if name in kwds:    # multiple values for an argument
+                return _invalidKey(args, kwds)
+        return (_KWDS, args, _frozenKwds(kwds))
+
+    if numNames == 1 and varargs is None and varkw is None:
+        # single argument: the argument itself is the key
+        def getKey(*args, **kwds):
+            if not kwds and len(args) == 1:
+                return args[0]
+            key = normalize(args, kwds)
+            if len(key) == 1:
+                return key[0]
+            return key
+    elif varargs is None:
+        def getKey(*args, **kwds):
+            if not kwds and len(args) == numNames:
+                return args
+            return normalize(args, kwds)
+    else:
+        def getKey(*args, **kwds):
+            if not kwds and len(args) >= numNames:
+                return args
+            return normalize(args, kwds)
+    return getKey
+
+
+def _name(callable):
+    try: return '%s.%s' % (callable.__module__, callable.__name__)
+    except AttributeError:
+        return repr(callable)
+
+
+def _frozenKwds(kwds):
+    # the keyword arguments of most calls fit in a smallfrozendict
+    if len(kwds) <= smallfrozendict.MAXSIZE:
+        return smallfrozendict(kwds)
+    return frozendict(kwds)
+
+
+def _keyDefault(value):
+    # the value of an omitted argument in the key
+    try: hash(value)
+    except TypeError:
+        return _UNHASHABLE
+    return value
+
+
+def _invalidKey(args, kwds):
+    return (_INVALID, tuple(args), frozendict(kwds or ()))
+
+
+def _boundedCacheFactory(maxsize, ttl):
+    if ttl is None:
+        return lambda: LRUCache(maxsize)
+    return lambda: TTLCache(ttl, maxsize)
+
+
+def memoizedmethod(function, cacheFactory=_defaultcache, makeHashable=None,
+                   maxsize=None, ttl=None):
     '''Create a memoized proxy method from a function.
 
     This function is to be called from within a class definition, exactly as
@@ -88,9 +501,90 @@ def memoizedmethod(function, cacheFactory=_defaultcache, makeHashable=None):
             def foo(...):
                 ...
 
+    The optional arguments are the same as in L{Memoize}.
+
     @requires: python 2.3+.
     '''
-    return types.MethodType(Memoize(function,cacheFactory,makeHashable), None)
+    return _MemoizedMethod(function, cacheFactory, makeHashable, maxsize, ttl)
+
+
+class _MemoizedMethod(Memoize, object):
+    '''A Memoize that binds to the instance it is accessed from, like a
+    function.'''
+
+    def __get__(self, obj, cls):
+        return types.MethodType(self, obj, cls)
+
+
+def batchmemoize(function, cacheFactory=_defaultcache, makeHashable=None,
+                 maxsize=None, ttl=None):
+    '''Memoize a vectorized function per element.
+
+    The function must take a sequence of elements and return the sequence of
+    their results, in the same order. The returned callable looks up each
+    element in the cache and calls the function at most once, with the
+    distinct uncached elements only (in the order they first appear); it
+    returns the list of the results of all the given elements::
+        @batchmemoize
+        def fetchUsers(ids):
+            ...
+        fetchUsers([1,2,3])     # calls fetchUsers([1,2,3])
+        fetchUsers([3,4,1,4])   # calls fetchUsers([4])
+
+    @param makeHashable: A callable f(element) that returns a hashable
+        representation of an element, if the elements are not hashable.
+    @see: L{Memoize.__init__} for the rest of the arguments. The C{elapsed}
+        time passed to C{onMiss} is the time of the whole call divided by the
+        number of the computed elements.
+    @raise ValueError: If the function returns a different number of results
+        than the number of elements it was called with.
+    '''
+    return _BatchMemoize(function, cacheFactory, makeHashable, maxsize, ttl)
+
+
+class _BatchMemoize(Memoize):
+
+    def __call__(self, elements):
+        cache = self._cache
+        makeHashable = self._makeHashable
+        results = []
+        # the distinct uncached keys and elements, in order of appearance
+        uncachedKeys = []; uncached = []
+        # maps each uncached key to its indices in results
+        indices = {}
+        for element in elements:
+            if makeHashable is not None:
+                key = makeHashable(element)
+            else:
+                key = element
+            try: results.append(cache[key])
+            except KeyError:
+                keyIndices = indices.get(key)
+                if keyIndices is None:
+                    keyIndices = indices[key] = []
+                    uncachedKeys.append(key); uncached.append(element)
+                keyIndices.append(len(results))
+                results.append(None)
+        self._hits += len(results) - len(uncached)
+        if not uncached:
+            return results
+        start = _timer()
+        values = list(self._callable(uncached))
+        elapsed = _timer() - start
+        if len(values) != len(uncached):
+            raise ValueError('%s returned %d results for %d elements' % (
+                _name(self._callable), len(values), len(uncached)))
+        for key,value in izip(uncachedKeys, values):
+            self._store(key, value)
+            for i in indices[key]:
+                results[i] = value
+        self._misses += len(uncached)
+        self._computeTime += elapsed
+        if self.onMiss is not None:
+            elapsed /= len(uncached)
+            for key in uncachedKeys:
+                self.onMiss(self, key, elapsed)
+        return results
 
 
 class Memento(type):
@@ -103,3 +597,144 @@ class Memento(type):
     @requires: python 2.2+.
     '''
     __call__ = memoizedmethod(type.__call__)
+
+
+def weakMemento(hotsize=0):
+    '''Return a L{Memento} metaclass that holds weak references to the
+    instances it creates.
+
+    The instances are garbage collected (and created anew on the next
+    instantiation call) once they are no longer referenced elsewhere, so that
+    the memento does not grow unboundedly. The instances must support weak
+    references; in particular, classes that define C{__slots__} must include
+    C{'__weakref__'} in them.
+
+    @param hotsize: The number of the most recently requested instances that
+        are kept alive by the metaclass, even if they are not referenced
+        elsewhere.
+    '''
+    class WeakMemento(Memento):
+        __call__ = memoizedmethod(type.__call__,
+                                  lambda: WeakValueCache(hotsize))
+    return WeakMemento
+
+WeakMemento = weakMemento()
+
+
+if __name__ == '__main__':
+    import time
+    from timeit import Timer
+
+    def callOverhead(number=200000):
+        '''Time cache hits of memoized functions, with the signature-specific
+        keys vs the generic keys.'''
+        def f1(x): return x
+        def f2(a, b=2): return a
+        def f3(a, *args, **kwds): return a
+        calls = [('f1(1)', f1, (1,), {}),
+                 ('f2(1,2)', f2, (1,2), {}),
+                 ('f2(1)', f2, (1,), {}),
+                 ('f2(1,b=2)', f2, (1,), {'b':2}),
+                 ('f3(1,2,3)', f3, (1,2,3), {}),
+                 ('f3(1,x=3)', f3, (1,), {'x':3})]
+        print 'call overhead of cache hits (us/call):'
+        print '  %-12s %8s %8s' % ('', 'generic', 'specific')
+        for name,function,args,kwds in calls:
+            generic = Memoize(function)
+            del generic._getKey     # fall back to Memoize._getKey
+            times = []
+            for memoized in generic, Memoize(function):
+                memoized(*args,**kwds)
+                timer = Timer(lambda: memoized(*args,**kwds))
+                times.append(min(timer.repeat(3, number)) * 1e6 / number)
+            print '  %-12s %8.3f %8.3f' % ((name,) + tuple(times))
+
+    def duplicates(memoizeClass, threads=8, keys=20, calls=400):
+        '''Call a slow memoized function from a number of threads with
+        overlapping keys and return the number of computations and the time.'''
+        computed = []
+        def slow(x):
+            computed.append(x)
+            time.sleep(0.005)
+            return x
+        f = memoizeClass(slow)
+        def worker(seed):
+            for i in xrange(calls // threads):
+                f((seed + i) % keys)
+        workers = [threading.Thread(target=worker, args=(i,))
+                   for i in xrange(threads)]
+        start = time.time()
+        for t in workers: t.start()
+        for t in workers: t.join()
+        return len(computed), time.time() - start
+
+    def mementoMemory(n=100000):
+        '''Create (and drop) a number of distinct instances of a Memento and a
+        WeakMemento class and report how many are retained by the cache.'''
+        import gc, resource
+        print 'creating and dropping %d distinct instances:' % n
+        for name,metaclass in [('Memento', Memento),
+                               ('WeakMemento', WeakMemento),
+                               ('weakMemento(1000)', weakMemento(1000))]:
+            class Point(object):
+                __metaclass__ = metaclass
+                def __init__(self, x, y):
+                    self.x = x; self.y = y
+            gc.collect()
+            before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            for i in xrange(n):
+                Point(i, i+1)
+            gc.collect()
+            after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            print '  %-20s %6d instances retained, max RSS grew %6d KB' % (
+                name, len(metaclass.__call__._cache), after - before)
+            metaclass.__call__._cache.clear()
+
+    def fanout(calls=400, keys=20):
+        '''Issue a number of calls of a slow memoized function with
+        overlapping keys from a single thread and wait for all the results.'''
+        computed = []
+        def lookup(x):
+            computed.append(x)
+            time.sleep(0.005)   # an upstream request
+            return x
+        print '%d calls from a single thread, %d distinct keys:' % (calls, keys)
+        for name,memoized in [('Memoize', Memoize(lookup)),
+                              ('AsyncMemoize', AsyncMemoize(lookup))]:
+            del computed[:]
+            start = time.time()
+            results = [memoized(i % keys) for i in xrange(calls)]
+            if isinstance(memoized, AsyncMemoize):
+                results = [future.result() for future in results]
+            print '  %-20s %3d computations in %.3fs' % (name, len(computed),
+                                                         time.time() - start)
+
+    def batches(calls=200, size=50, universe=1000):
+        '''Call a vectorized function with a fixed per-call overhead on
+        random batches, memoizing it per element by batchmemoize vs per
+        batch by Memoize.'''
+        import random
+        def fetch(ids):
+            time.sleep(0.001 + 0.00001 * len(ids))  # round trip + transfer
+            return [-id for id in ids]
+        batches = [random.sample(xrange(universe), size)
+                   for i in xrange(calls)]
+        print '%d calls of batches of %d out of %d distinct elements:' % (
+            calls, size, universe)
+        for name,memoized in [('no memoization', fetch),
+                              ('Memoize', Memoize(fetch, makeHashable=tuple)),
+                              ('batchmemoize', batchmemoize(fetch))]:
+            start = time.time()
+            for batch in batches:
+                memoized(batch)
+            print '  %-20s %.3fs' % (name, time.time() - start)
+
+    callOverhead()
+    mementoMemory()
+    fanout()
+    batches()
+    for threads in 1, 4, 16:
+        print '%d threads, 20 distinct keys:' % threads
+        for cls in Memoize, SynchronizedMemoize:
+            print '  %-20s %3d computations in %.3fs' % (
+                (cls.__name__,) + duplicates(cls, threads))
@@ -0,0 +1,219 @@
+'''A list of fixed-width numbers stored in a memory-mapped file.'''
+
+import os
+import mmap
+import struct
+import tempfile
+from array import array
+
+from datastructs.listmixin import ListMixin
+
+__author__ = "George Sakkis <gsakkis@rutgers.edu>"
+__all__ = ['MmapArrayList']
+
+
+class MmapArrayList(ListMixin):
+    '''A mutable sequence with the interface of C{list}, whose items are
+    fixed-width numbers (as in the C{array} module) stored in a memory-mapped
+    file.
+
+    The list can be much larger than the available RAM; the operating system
+    pages the file in and out as needed. Items are read and written directly
+    in the mapping (with C{struct.unpack_from}/C{pack_into}) and resizing
+    moves the following items within the mapping (C{mmap.move}), without
+    copying them through Python strings. The capacity of the file grows
+    (and shrinks) geometrically, so that appending takes amortized constant
+    time.
+
+    Slices are new lists in temporary files; use L{view} to access the raw
+    bytes of a range of items without copying them.
+    '''
+
+    #: The minimum capacity of the file, in items.
+    MINCAPACITY = 16
+
+    def __init__(self, iterable=(), typecode='i', path=None):
+        '''
+        @param iterable: The initial items; they are appended to the items
+            already stored in C{path}, if any.
+        @param typecode: The C{array} typecode of the items. The typecodes
+            that are not supported by C{struct} (e.g. 'u') are not allowed.
+        @raise ValueError: If the typecode is not supported by both C{array}
+            and C{struct}.
+        @param path: The path of the file to store the items in. If it is
+            None, a temporary file is used, which is deleted when the list is
+            closed or garbage collected. Otherwise the file contains exactly
+            the items (in native byte order) after L{close}.
+        '''
+        try:
+            array(typecode)
+            self._struct = struct.Struct(typecode)
+        except (TypeError, ValueError, struct.error):
+            raise ValueError('unsupported typecode: %r' % typecode)
+        self.typecode = typecode
+        self.itemsize = self._struct.size
+        if path is None:
+            self._file = tempfile.TemporaryFile()
+        elif os.path.exists(path):
+            self._file = open(path, 'r+b')
+        else:
+            self._file = open(path, 'w+b')
+        self._file.seek(0, 2)
+        self._len = self._file.tell() // self.itemsize
+        self._capacity = max(self._len, self.MINCAPACITY)
+        self._file.truncate(self._capacity * self.itemsize)
+        self._mmap = mmap.mmap(self._file.fileno(),
+                               self._capacity * self.itemsize)
+        self.extend(iterable)
+
+    def view(self, start=0, stop=None):
+        '''Return a read-only view of the bytes of C{self[start:stop]}.
+
+        The view refers directly to the mapped memory (it is a C{memoryview}
+        if the mapping supports it, otherwise a C{buffer}). It reflects later
+        item assignments but it must not be used after the list is resized.
+        '''
+        (start, stop, ignore) = self._tuple_from_slice(slice(start, stop))
+        size = self.itemsize
+        try: return memoryview(self._mmap)[start*size:stop*size]
+        except (NameError, TypeError):
+            return buffer(self._mmap, start*size, (stop-start)*size)
+
+    def flush(self):
+        '''Flush the changes to the file.'''
+        self._mmap.flush()
+
+    def close(self):
+        '''Truncate the file to the stored items and close it.'''
+        self._mmap.close()
+        self._file.truncate(self._len * self.itemsize)
+        self._file.close()
+
+    def append(self, item):
+        if self._len == self._capacity:
+            self._resize(2 * self._capacity)
+        self._struct.pack_into(self._mmap, self._len * self.itemsize, item)
+        self._len += 1
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        # read the items in blocks
+        step = max(mmap.PAGESIZE // self.itemsize, 1)
+        for start in xrange(0, self._len, step):
+            for item in self._read(start, min(start+step, self._len)):
+                yield item
+
+    def __repr__(self):
+        return '%s(%s, %r)' % (self.__class__.__name__, self, self.typecode)
+
+    #---- ListMixin hooks ----------------------------------------------------
+
+    def _constructor(self, iterable):
+        return self.__class__(iterable, self.typecode)
+
+    def _get_element(self, i):
+        return self._struct.unpack_from(self._mmap, i * self.itemsize)[0]
+
+    def _set_element(self, i, x):
+        self._struct.pack_into(self._mmap, i * self.itemsize, x)
+
+    def _resize_region(self, start, end, new_size):
+        size = self.itemsize
+        length = self._len + new_size - (end - start)
+        if length > self._capacity:
+            self._resize(max(length, 2 * self._capacity))
+        tail = self._len - end
+        if tail and new_size != end - start:
+            self._mmap.move((start + new_size) * size, end * size, tail * size)
+        self._len = length
+        if length < self._capacity // 4:
+            self._resize(2 * length)
+
+    def _get_slice(self, start, end, step):
+        if step > 0:
+            return self._read(start, end)[::step]
+        return self._read(end + 1, start + 1)[::step]
+
+    def _set_slice(self, start, end, step, values):
+        values = self._array(values)
+        if step == 1:
+            self._write(start, values)
+        elif step > 0:
+            items = self._read(start, end)
+            items[::step] = values
+            self._write(start, items)
+        else:
+            items = self._read(end + 1, start + 1)
+            items[::step] = values
+            self._write(end + 1, items)
+
+    def _delete_indices(self, start, end, step):
+        if step < 0:
+            # delete the same items in ascending order
+            last = start
+            start += (len(xrange(start, end, step)) - 1) * step
+            end, step = last + 1, -step
+        items = self._read(start, end)
+        del items[::step]
+        self._write(start, items)
+        self._resize_region(start + len(items), end, 0)
+
+    #---- internal methods ---------------------------------------------------
+
+    def _array(self, values):
+        if isinstance(values, array) and values.typecode == self.typecode:
+            return values
+        return array(self.typecode, values)
+
+    def _read(self, start, end):
+        size = self.itemsize
+        items = array(self.typecode)
+        items.fromstring(self._mmap[start*size:end*size])
+        return items
+
+    def _write(self, start, items):
+        size = self.itemsize
+        self._mmap[start*size:(start+len(items))*size] = items.tostring()
+
+    def _resize(self, capacity):
+        capacity = max(capacity, self.MINCAPACITY)
+        if capacity != self._capacity:
+            self._mmap.resize(capacity * self.itemsize)
+            self._capacity = capacity
+
+
+if __name__ == '__main__':
+    import time
+
+    def benchmark(n=1000000, ops=1000):
+        print '%d items:' % n
+        factories = [('list', list),
+                     ('array', lambda it: array('d', it)),
+                     ('MmapArrayList', lambda it: MmapArrayList(it, 'd'))]
+        for name,factory in factories:
+            timings = []
+            start = time.time()
+            x = factory(xrange(n))
+            timings.append(time.time() - start)
+            start = time.time()
+            for i in xrange(n):
+                x.append(i)
+            timings.append(time.time() - start)
+            start = time.time()
+            for i in xrange(0, 2*n, 2*n // ops):
+                x.insert(i, i)
+            timings.append(time.time() - start)
+            start = time.time()
+            for i in xrange(0, 2*n, 2*n // ops):
+                x[i]
+            timings.append(time.time() - start)
+            start = time.time()
+            x[::3]
+            timings.append(time.time() - start)
+            print ('  %-14s build %.3fs, %d appends %.3fs, %d inserts %.3fs, '
+                   '%d indexings %.4fs, x[::3] %.3fs' % (name, timings[0], n,
+                    timings[1], ops, timings[2], ops, timings[3], timings[4]))
+
+    benchmark()
@@ -0,0 +1,231 @@
+'''Set operations over sorted iterables.
+
+The functions of this module take iterables whose elements are in ascending
+order and return iterators over the (sorted, distinct) elements of their
+union, intersection, difference or symmetric difference. The inputs are
+consumed lazily and only a constant number of elements per input is kept in
+memory, so they can be arbitrarily large streams (e.g. the lines of sorted
+files); since the results are sorted iterators too, the operations can be
+nested::
+    >>> list(difference(union([1,5,9], [2,5]), intersection([2,9], (9,10))))
+    [1, 2, 5]
+
+Sequences (objects with C{__len__} and C{__getitem__}, such as lists, tuples,
+arrays and L{datastructs.sortedsets.SortedSet}) are searched by galloping
+(exponential and then binary search) instead of scanned, so intersecting or
+subtracting a sequence takes time sublinear in its length when the other
+input is much smaller. Other iterables are scanned.
+'''
+
+from bisect import bisect_left
+
+from pending.moreiter import itermerge
+
+__author__ = "George Sakkis <gsakkis@rutgers.edu>"
+__all__ = ['union', 'intersection', 'difference', 'symmetric_difference']
+
+
+def union(*iterables):
+    '''Return an iterator over the elements of any of the iterables.
+
+    >>> list(union([1,3,3,5], [2,3], [], [6]))
+    [1, 2, 3, 5, 6]
+    '''
+    return _unique(itermerge(*iterables))
+
+
+def intersection(*iterables):
+    '''Return an iterator over the elements of all the iterables.
+
+    >>> list(intersection([1,2,3,5,8,13], xrange(0,100,2), [2,8,9]))
+    [2, 8]
+    '''
+    cursors = map(_cursor, iterables)
+    if not cursors:
+        return
+    for cursor in cursors:
+        if not cursor.valid:
+            return
+    # leapfrog: seek each cursor in turn to the largest value seen so far,
+    # until all of them agree
+    value = max([cursor.value for cursor in cursors])
+    matched = 0
+    while True:
+        for cursor in cursors:
+            if not cursor.seek(value):
+                return
+            if value < cursor.value:
+                # the cursor is counted again when it is visited next
+                value = cursor.value
+                matched = 0
+            else:
+                matched += 1
+            if matched == len(cursors):
+                yield value
+                while not value < cursor.value:
+                    if not cursor.advance():
+                        return
+                # the cursor is counted again when it is visited next
+                value = cursor.value
+                matched = 0
+
+
+def difference(iterable, *others):
+    '''Return an iterator over the elements of the first iterable that are
+    not in any of the others.
+
+    >>> list(difference([1,2,3,5,8,13], xrange(0,100,2), [13,14]))
+    [1, 3, 5]
+    '''
+    cursors = [cursor for cursor in map(_cursor, others) if cursor.valid]
+    for value in _unique(iterable):
+        found = False
+        for cursor in cursors[:]:
+            if not cursor.seek(value):
+                cursors.remove(cursor)
+            elif not value < cursor.value:
+                found = True
+                break
+        if not found:
+            yield value
+
+
+def symmetric_difference(*iterables):
+    '''Return an iterator over the elements of an odd number of the
+    iterables.
+
+    For two iterables these are the elements of exactly one of them.
+
+    >>> list(symmetric_difference([1,2,3,5], [2,3,4], [3,5,6]))
+    [1, 3, 4, 6]
+    '''
+    merged = itermerge(*map(_unique, iterables))
+    try: last = merged.next()
+    except StopIteration:
+        return
+    count = 1
+    for value in merged:
+        if last < value:
+            if count % 2:
+                yield last
+            last = value
+            count = 1
+        else:
+            count += 1
+    if count % 2:
+        yield last
+
+
+#----- helpers ----------------------------------------------------------------
+
+def _unique(iterable):
+    # drop the consecutive duplicates of a sorted iterable
+    iterator = iter(iterable)
+    try: last = iterator.next()
+    except StopIteration:
+        return
+    yield last
+    for value in iterator:
+        if last < value:
+            yield value
+            last = value
+
+
+def _cursor(iterable):
+    if (hasattr(iterable, '__len__') and hasattr(iterable, '__getitem__')
+        and not hasattr(iterable, 'keys')):
+        return _SequenceCursor(iterable)
+    return _IteratorCursor(iterable)
+
+
+class _IteratorCursor(object):
+    '''A position in a sorted iterable.
+
+    While C{valid} is true, C{value} is the element at the position.
+    '''
+
+    def __init__(self, iterable):
+        self._next = iter(iterable).next
+        self.value = None
+        self.advance()
+
+    def advance(self):
+        '''Move to the next element; return whether there is one.'''
+        try: self.value = self._next()
+        except StopIteration:
+            self.valid = False
+        else:
+            self.valid = True
+        return self.valid
+
+    def seek(self, value):
+        '''Move to the first element that is not smaller than C{value};
+        return whether there is one.'''
+        while self.valid and self.value < value:
+            self.advance()
+        return self.valid
+
+
+class _SequenceCursor(_IteratorCursor):
+
+    def __init__(self, sequence):
+        self._sequence = sequence
+        self._len = len(sequence)
+        self._pos = -1
+        self.value = None
+        self.advance()
+
+    def advance(self):
+        self._pos += 1
+        self.valid = self._pos < self._len
+        if self.valid:
+            self.value = self._sequence[self._pos]
+        return self.valid
+
+    def seek(self, value):
+        if not self.valid or not self.value < value:
+            return self.valid
+        sequence, size = self._sequence, self._len
+        # gallop: find lo,hi such that sequence[lo] < value <= sequence[hi]
+        lo, step = self._pos, 1
+        while lo + step < size and sequence[lo + step] < value:
+            lo += step
+            step *= 2
+        self._pos = bisect_left(sequence, value, lo + 1, min(lo + step, size))
+        self.valid = self._pos < size
+        if self.valid:
+            self.value = sequence[self._pos]
+        return self.valid
+
+
+if __name__ == '__main__':
+    import time
+    import random
+
+    def benchmark(n=1000000, m=1000):
+        big = sorted(random.sample(xrange(10*n), n))
+        small = sorted(random.sample(xrange(10*n), m))
+        print 'Intersection and difference of %d and %d sorted ints:' % (n, m)
+        for name,wrap in (('sequences (galloping)', list),
+                          ('iterators (scanning)', iter)):
+            start = time.time()
+            count = len(list(intersection(wrap(small), wrap(big))))
+            t1 = time.time() - start
+            start = time.time()
+            list(difference(wrap(small), wrap(big)))
+            t2 = time.time() - start
+            print '  %-22s intersection %.4fs, difference %.4fs (%d common)' % (
+                name, t1, t2, count)
+        start = time.time()
+        set(small).intersection(big)
+        print '  %-22s intersection %.4fs' % ('set', time.time() - start)
+        streams = [sorted(random.sample(xrange(10*n), n // 10))
+                   for i in xrange(10)]
+        start = time.time()
+        count = 0
+        for value in union(*streams):
+            count += 1
+        print '%d-way union of %d elements: %.3fs' % (len(streams), count,
+                                                      time.time() - start)
+
+    benchmark()
@@ -1,31 +1,28 @@
-#TODO: extra tests for asserting correct order
-
 from itertools import ifilter,ifilterfalse,chain,tee
+from bisect import bisect_left,bisect_right,insort
 import sets
 
 _set_types = (set,frozenset,sets.BaseSet)
 
-__all__ = ['InsertionOrderedSet']
+__all__ = ['InsertionOrderedSet', 'SortedSet', 'SortedDict']
 
+# the fields of a linked list node
+_PREV, _NEXT, _KEY = range(3)
 
-class InsertionOrderedSet(set):
-    '''
-    A set with iteration ordering defined by the the order in which elements
-    were inserted into the set (insertion-order).
-    '''
 
-    __slots__ = ['_list']
+class _OrderedSet(set):
+    '''
+    Base class of the sets with a defined iteration order.
 
-    def __init__(self, iterable=()):
-        self._list = []
-        super(InsertionOrderedSet,self).__init__()
-        self._update(iterable)
+    Subclasses keep track of the order in C{__init__}, C{__iter__}, C{add},
+    C{remove}, C{pop} and C{clear}; the rest of the operations are defined
+    in terms of them and return sets of the same class.
+    '''
 
-    def __iter__(self):
-        return iter(self._list)
+    __slots__ = []
 
     def __repr__(self):
-        return '%s(%r)' % (self.__class__.__name__, self._list)
+        return '%s(%r)' % (self.__class__.__name__, list(self))
 
     #--- Standard set operations ---------------------------------------------
 
@@ -124,9 +121,8 @@ class InsertionOrderedSet(set):
         '''Update a set with the intersection of itself and another.'''
         if not isinstance(other, _set_types):
             other = set(other)
-        common = filter(other.__contains__, self)
-        self.clear()
-        self._update(common)
+        for elt in ifilterfalse(other.__contains__, list(self)):
+            self.remove(elt)
 
     def __ixor__(self, other):
         '''Update a set with the symmetric difference of itself and another.'''
@@ -153,43 +149,26 @@ class InsertionOrderedSet(set):
         for elt in ifilter(self.__contains__, other):
             self.remove(elt)
 
-    #--- Other mutating operations -------------------------------------------
-
-    def add(self, element):
-        '''Add an element to a set.
+    def update(self, *others):
+        '''Update a set with the union of itself and others.'''
+        for other in others:
+            self._update(other)
 
-        This has no effect if the element is already present.
-        '''
-        if element not in self:
-            super(InsertionOrderedSet,self).add(element)
-            self._list.append(element)
+    #--- Other mutating operations -------------------------------------------
 
-    def remove(self, element):
-        '''Remove an element from a set; it must be a member.
+    def discard(self, element):
+        '''Remove an element from a set if it is a member.
 
-        If the element is not a member, raise a KeyError.
+        If the element is not a member, do nothing.
         '''
-        super(InsertionOrderedSet,self).remove(element)
-        self._list.remove(element)
-
-    def pop(self):
-        '''Remove and return an arbitrary set element.'''
-        result = super(InsertionOrderedSet,self).pop()
-        self._list.remove(result)
-        return result
-
-    def clear(self):
-        '''Remove all elements from this set.'''
-        super(InsertionOrderedSet,self).clear()
-        del self._list[:]
+        if element in self:
+            self.remove(element)
 
     #--- Copying and pickling ------------------------------------------------
 
     def copy(self):
         '''Return a shallow copy of a set.'''
-        result = super(InsertionOrderedSet,self).copy()
-        result._list = list(self._list)
-        return result
+        return self.__class__(self)
 
     __copy__ = copy # For the copy module
 
@@ -205,11 +184,10 @@ class InsertionOrderedSet(set):
     # XXX: __builtin__.set.__getstate__ cannot be subclassed currently
     if set is sets.Set:
         def __getstate__(self):
-            return super(InsertionOrderedSet,self).__getstate__(), self._list
+            return super(_OrderedSet,self).__getstate__(), list(self)
 
         def __setstate__(self, state):
-            sup_state, self._list = state
-            super(InsertionOrderedSet,self).__setstate__(sup_state)
+            self.__init__(state[1])
 
     #--- Assorted helpers ----------------------------------------------------
 
@@ -218,10 +196,550 @@ class InsertionOrderedSet(set):
             self.add(elt)
 
     def _repr(self):
-        return '%s(%r)' % (self.__class__.__name__, self._list)
+        return '%s(%r)' % (self.__class__.__name__, list(self))
 
     def _binary_sanity_check(self, other):
         # Check that the other argument to a binary operation is also
         # a set, raising a TypeError otherwise.
         if not isinstance(other, _set_types):
             raise TypeError, 'Binary operation only permitted between sets'
+
+
+class InsertionOrderedSet(_OrderedSet):
+    '''
+    A set with iteration ordering defined by the the order in which elements
+    were inserted into the set (insertion-order).
+    '''
+
+    __slots__ = ['_map', '_root']
+
+    def __init__(self, iterable=()):
+        # self._map: maps each element to its node in a circular doubly
+        # linked list of the elements in insertion order
+        self._map = {}
+        self._root = _newList()
+        super(InsertionOrderedSet,self).__init__()
+        self._update(iterable)
+
+    def __iter__(self):
+        root = self._root
+        node = root[_NEXT]
+        while node is not root:
+            yield node[_KEY]
+            node = node[_NEXT]
+
+    def add(self, element):
+        '''Add an element to a set.
+
+        This has no effect if the element is already present.
+        '''
+        if element not in self:
+            super(InsertionOrderedSet,self).add(element)
+            root = self._root
+            last = root[_PREV]
+            last[_NEXT] = root[_PREV] = self._map[element] = [last, root,
+                                                              element]
+
+    def remove(self, element):
+        '''Remove an element from a set; it must be a member.
+
+        If the element is not a member, raise a KeyError.
+        '''
+        super(InsertionOrderedSet,self).remove(element)
+        try: node = self._map.pop(element)
+        except TypeError:
+            # a set element is looked up as a frozenset
+            node = self._map.pop(frozenset(element))
+        prev,next = node[_PREV],node[_NEXT]
+        prev[_NEXT] = next; next[_PREV] = prev
+
+    def pop(self):
+        '''Remove and return the most recently inserted set element.'''
+        if not self:
+            raise KeyError('pop from an empty set')
+        result = self._root[_PREV][_KEY]
+        self.remove(result)
+        return result
+
+    def clear(self):
+        '''Remove all elements from this set.'''
+        super(InsertionOrderedSet,self).clear()
+        self._map.clear()
+        self._root = _newList()
+
+
+class SortedSet(_OrderedSet):
+    '''
+    A set whose elements are iterated in sorted order.
+
+    Besides the set operations, a SortedSet supports positional access
+    (C{s[k]} is the k-th smallest element and C{s.index(x)} is the rank of
+    C{x}), binary search (L{bisect_left}, L{bisect_right}) and range queries
+    (L{irange}). Adding and removing an element takes O(log n) time (plus
+    shifting a sublist of at most a few hundred elements); L{update} with
+    many elements merges them in linear time.
+    '''
+
+    __slots__ = ['_sorted']
+
+    def __init__(self, iterable=()):
+        self._sorted = _SortedList()
+        super(SortedSet,self).__init__()
+        self._update(iterable)
+
+    def __iter__(self):
+        return iter(self._sorted)
+
+    def __reversed__(self):
+        return reversed(self._sorted)
+
+    def __getitem__(self, index):
+        '''Return the element of the given rank (or a list of elements for
+        a slice).'''
+        return self._sorted[index]
+
+    def index(self, element):
+        '''Return the number of elements smaller than C{element}, which must
+        be a member.
+
+        If the element is not a member, raise a ValueError.
+        '''
+        if element not in self:
+            raise ValueError('%r is not in set' % (element,))
+        return self._sorted.bisect_left(element)
+
+    def bisect_left(self, element):
+        '''Return the number of elements smaller than C{element}.'''
+        return self._sorted.bisect_left(element)
+
+    def bisect_right(self, element):
+        '''Return the number of elements smaller than or equal to
+        C{element}.'''
+        return self._sorted.bisect_right(element)
+
+    bisect = bisect_right
+
+    def irange(self, minimum=None, maximum=None, inclusive=(True,True),
+               reverse=False):
+        '''Iterate over the elements between C{minimum} and C{maximum}.
+
+        @param minimum, maximum: The bounds of the range; None for no bound.
+        @param inclusive: A pair of booleans, whether each bound is included
+            in the range.
+        @param reverse: If true, iterate in descending order.
+        '''
+        return self._sorted.irange(minimum, maximum, inclusive, reverse)
+
+    def add(self, element):
+        '''Add an element to a set.
+
+        This has no effect if the element is already present.
+        '''
+        if element not in self:
+            super(SortedSet,self).add(element)
+            self._sorted.add(element)
+
+    def remove(self, element):
+        '''Remove an element from a set; it must be a member.
+
+        If the element is not a member, raise a KeyError.
+        '''
+        super(SortedSet,self).remove(element)
+        self._sorted.remove(element)
+
+    def pop(self, index=-1):
+        '''Remove and return the element of the given rank (by default the
+        largest one).'''
+        if not self:
+            raise KeyError('pop from an empty set')
+        result = self._sorted.pop(index)
+        super(SortedSet,self).remove(result)
+        return result
+
+    def clear(self):
+        '''Remove all elements from this set.'''
+        super(SortedSet,self).clear()
+        self._sorted.clear()
+
+    def _update(self, iterable):
+        new = set(ifilterfalse(self.__contains__, iterable))
+        super(_OrderedSet,self).update(new)
+        self._sorted.update(new)
+
+
+class SortedDict(dict):
+    '''
+    A dict whose keys are iterated in sorted order.
+
+    Besides the dict operations, a SortedDict supports positional access
+    (L{peekitem}, L{index}), binary search (L{bisect_left}, L{bisect_right})
+    and range queries (L{irange}) on its keys, with the same complexity as
+    L{SortedSet}.
+    '''
+
+    __slots__ = ['_sorted']
+
+    def __init__(self, *args, **kwds):
+        self._sorted = _SortedList()
+        super(SortedDict,self).__init__()
+        self.update(*args, **kwds)
+
+    def __setitem__(self, key, value):
+        if key not in self:
+            self._sorted.add(key)
+        super(SortedDict,self).__setitem__(key, value)
+
+    def __delitem__(self, key):
+        super(SortedDict,self).__delitem__(key)
+        self._sorted.remove(key)
+
+    def __iter__(self):
+        return iter(self._sorted)
+
+    iterkeys = __iter__
+
+    def __reversed__(self):
+        return reversed(self._sorted)
+
+    def keys(self):
+        return list(self._sorted)
+
+    def itervalues(self):
+        for key in self._sorted:
+            yield self[key]
+
+    def values(self):
+        return list(self.itervalues())
+
+    def iteritems(self):
+        for key in self._sorted:
+            yield key, self[key]
+
+    def items(self):
+        return list(self.iteritems())
+
+    def __repr__(self):
+        return '%s({%s})' % (self.__class__.__name__,
+                             ', '.join(['%r: %r' % item
+                                        for item in self.iteritems()]))
+
+    def __reduce__(self):
+        return (self.__class__, (self.items(),))
+
+    def copy(self):
+        return self.__class__(self)
+
+    __copy__ = copy
+
+    def clear(self):
+        super(SortedDict,self).clear()
+        self._sorted.clear()
+
+    def pop(self, key, *default):
+        if key in self:
+            self._sorted.remove(key)
+        return super(SortedDict,self).pop(key, *default)
+
+    def popitem(self):
+        '''Remove and return the item with the largest key.'''
+        if not self:
+            raise KeyError('popitem(): dictionary is empty')
+        key = self._sorted.pop()
+        return key, super(SortedDict,self).pop(key)
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def update(self, *args, **kwds):
+        if len(args) > 1:
+            raise TypeError('update expected at most 1 arguments, got %d' %
+                            len(args))
+        if args:
+            other = args[0]
+            if hasattr(other, 'keys'):
+                items = [(key, other[key]) for key in other.keys()]
+            else:
+                items = list(other)
+        else:
+            items = []
+        items += kwds.items()
+        self._sorted.update(set([key for key,value in items
+                                 if key not in self]))
+        super(SortedDict,self).update(items)
+
+    #--- Sorted key operations -----------------------------------------------
+
+    def peekitem(self, index=-1):
+        '''Return the item whose key has the given rank (by default the item
+        with the largest key).'''
+        key = self._sorted[index]
+        return key, self[key]
+
+    def index(self, key):
+        '''Return the number of keys smaller than C{key}, which must be in
+        the dict.
+
+        If the key is not in the dict, raise a KeyError.
+        '''
+        if key not in self:
+            raise KeyError(key)
+        return self._sorted.bisect_left(key)
+
+    def bisect_left(self, key):
+        '''Return the number of keys smaller than C{key}.'''
+        return self._sorted.bisect_left(key)
+
+    def bisect_right(self, key):
+        '''Return the number of keys smaller than or equal to C{key}.'''
+        return self._sorted.bisect_right(key)
+
+    bisect = bisect_right
+
+    def irange(self, minimum=None, maximum=None, inclusive=(True,True),
+               reverse=False):
+        '''Iterate over the keys between C{minimum} and C{maximum}.
+
+        @param minimum, maximum: The bounds of the range; None for no bound.
+        @param inclusive: A pair of booleans, whether each bound is included
+            in the range.
+        @param reverse: If true, iterate in descending order.
+        '''
+        return self._sorted.irange(minimum, maximum, inclusive, reverse)
+
+
+def _newList():
+    root = [None, None, None]
+    root[_PREV] = root[_NEXT] = root
+    return root
+
+
+class _SortedList(object):
+    '''A sorted list of distinct elements, stored as a list of sorted
+    sublists of up to 2*LOAD elements each.'''
+
+    LOAD = 500
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        # self._maxes: the last (largest) element of each sublist
+        # self._offsets: the index of the first element of each sublist in the
+        # whole list, or None if it has to be recomputed
+        self._lists = []
+        self._maxes = []
+        self._offsets = None
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        for sublist in self._lists:
+            for element in sublist:
+                yield element
+
+    def __reversed__(self):
+        for sublist in reversed(self._lists):
+            for element in reversed(sublist):
+                yield element
+
+    def add(self, element):
+        lists, maxes = self._lists, self._maxes
+        if not maxes:
+            lists.append([element]); maxes.append(element)
+        else:
+            i = bisect_right(maxes, element)
+            if i == len(maxes):
+                i -= 1
+                lists[i].append(element)
+                maxes[i] = element
+            else:
+                insort(lists[i], element)
+            if len(lists[i]) > 2 * self.LOAD:
+                sublist = lists[i]
+                lists[i+1:i+1] = [sublist[self.LOAD:]]
+                del sublist[self.LOAD:]
+                maxes[i:i+1] = [sublist[-1], lists[i+1][-1]]
+        self._offsets = None
+        self._len += 1
+
+    def remove(self, element):
+        # the element must be in the list
+        i = bisect_left(self._maxes, element)
+        sublist = self._lists[i]
+        self._delete(i, bisect_left(sublist, element))
+
+    def pop(self, index=-1):
+        i, j = self._locate(index)
+        element = self._lists[i][j]
+        self._delete(i, j)
+        return element
+
+    def update(self, elements):
+        # elements: an iterable of elements that are not in the list
+        elements = sorted(elements)
+        if len(elements) * 8 < self._len:
+            for element in elements:
+                self.add(element)
+            return
+        # merge the two sorted runs in linear time
+        if self._len:
+            elements = list(self) + elements
+            elements.sort()
+        load = self.LOAD
+        self._lists = [elements[i:i+load]
+                       for i in xrange(0, len(elements), load)]
+        self._maxes = [sublist[-1] for sublist in self._lists]
+        self._offsets = None
+        self._len = len(elements)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in xrange(*index.indices(self._len))]
+        i, j = self._locate(index)
+        return self._lists[i][j]
+
+    def bisect_left(self, element):
+        i = bisect_left(self._maxes, element)
+        if i == len(self._maxes):
+            return self._len
+        return self._getOffsets()[i] + bisect_left(self._lists[i], element)
+
+    def bisect_right(self, element):
+        i = bisect_right(self._maxes, element)
+        if i == len(self._maxes):
+            return self._len
+        return self._getOffsets()[i] + bisect_right(self._lists[i], element)
+
+    def irange(self, minimum, maximum, inclusive, reverse):
+        start, stop = 0, self._len
+        if minimum is not None:
+            if inclusive[0]:
+                start = self.bisect_left(minimum)
+            else:
+                start = self.bisect_right(minimum)
+        if maximum is not None:
+            if inclusive[1]:
+                stop = self.bisect_right(maximum)
+            else:
+                stop = self.bisect_left(maximum)
+        if reverse:
+            return self._iterReversed(start, stop)
+        return self._iterRange(start, stop)
+
+    def _iterRange(self, start, stop):
+        if start >= stop:
+            return
+        i, j = self._locate(start)
+        lists = self._lists
+        remaining = stop - start
+        while remaining > 0:
+            sublist = lists[i][j:j+remaining]
+            for element in sublist:
+                yield element
+            remaining -= len(sublist)
+            i += 1; j = 0
+
+    def _iterReversed(self, start, stop):
+        if start >= stop:
+            return
+        i, j = self._locate(stop - 1)
+        lists = self._lists
+        remaining = stop - start
+        while remaining > 0:
+            sublist = lists[i][max(j+1-remaining, 0):j+1]
+            sublist.reverse()
+            for element in sublist:
+                yield element
+            remaining -= len(sublist)
+            i -= 1
+            if i >= 0:
+                j = len(lists[i]) - 1
+
+    def _locate(self, index):
+        # return the (sublist, position) indices of the element at index
+        if index < 0:
+            index += self._len
+        if not 0 <= index < self._len:
+            raise IndexError('index out of range')
+        offsets = self._getOffsets()
+        i = bisect_right(offsets, index) - 1
+        return i, index - offsets[i]
+
+    def _getOffsets(self):
+        offsets = self._offsets
+        if offsets is None:
+            offsets = self._offsets = []
+            total = 0
+            for sublist in self._lists:
+                offsets.append(total)
+                total += len(sublist)
+        return offsets
+
+    def _delete(self, i, j):
+        sublist = self._lists[i]
+        del sublist[j]
+        if sublist:
+            self._maxes[i] = sublist[-1]
+        else:
+            del self._lists[i]
+            del self._maxes[i]
+        self._offsets = None
+        self._len -= 1
+
+
+if __name__ == '__main__':
+    import time
+    import random
+
+    def benchmark(n=1000000, removals=100000):
+        removed = random.sample(xrange(n), removals)
+        print 'Removing %d elements from a set of %d:' % (removals, n)
+        for cls in set, InsertionOrderedSet:
+            s = cls(xrange(n))
+            start = time.time()
+            for elt in removed:
+                s.remove(elt)
+            print '  %-20s remove: %.3fs' % (cls.__name__, time.time()-start),
+            s = cls(xrange(n))
+            start = time.time()
+            s.difference_update(removed)
+            print 'difference_update: %.3fs' % (time.time()-start)
+
+    def sortedBenchmark(n=1000000, batches=100, queries=10000):
+        data = random.sample(xrange(10*n), n)
+        batchsize = n // batches
+        print 'Inserting %d elements in %d batches:' % (n, batches)
+        start = time.time()
+        keys = []
+        for i in xrange(0, n, batchsize):
+            keys.extend(data[i:i+batchsize])
+            keys.sort()
+        print '  %-20s %.3fs' % ('list + sort', time.time()-start)
+        start = time.time()
+        s = SortedSet()
+        for i in xrange(0, n, batchsize):
+            s.update(data[i:i+batchsize])
+        print '  %-20s %.3fs' % ('SortedSet.update', time.time()-start)
+        start = time.time()
+        s = SortedSet()
+        for elt in data:
+            s.add(elt)
+        print '  %-20s %.3fs' % ('SortedSet.add', time.time()-start)
+        def irange():
+            x = data[random.randrange(n)]
+            return list(s.irange(x, x+100))
+        print '%d queries:' % queries
+        for name,query in (('s[k]', lambda: s[random.randrange(n)]),
+                           ('index', lambda: s.index(random.choice(data))),
+                           ('irange(x, x+100)', irange)):
+            start = time.time()
+            for i in xrange(queries):
+                query()
+            print '  %-20s %.3fs' % (name, time.time()-start)
+
+    benchmark()
+    sortedBenchmark()
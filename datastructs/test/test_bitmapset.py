@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+
+import copy
+import random
+import unittest
+import cPickle as pickle
+
+import datastructs.bitmapset as bitmapset
+from datastructs.bitmapset import *
+
+__author__ = "George Sakkis <gsakkis@rutgers.edu>"
+
+
+class BitmapSetTestCase(unittest.TestCase):
+    def setUp(self):
+        # one chunk of each kind of container and a chunk of a huge key
+        self.sparse = random.sample(xrange(2**16), 1000)
+        self.dense = random.sample(xrange(2**16, 2**17), 20000)
+        self.runs = range(2**17 + 100, 2**17 + 5000) + range(2**17 + 6000,
+                                                              2**17 + 9000)
+        self.huge = [2**64 - 1, 2**63]
+        self.elements = self.sparse + self.dense + self.runs + self.huge
+        self.set = set(self.elements)
+        self.bitmapset = BitmapSet(self.elements)
+        self.bitmapset.optimize()
+
+    def assertSameSet(self, bitmapset, expected):
+        self.assertEquals(len(bitmapset), len(expected))
+        self.assertEquals(list(bitmapset), sorted(expected))
+
+    def test_containers(self):
+        kinds = [c.__class__ for c in self.bitmapset._containers]
+        self.assertEquals(kinds, [bitmapset._ArrayContainer,
+                                  bitmapset._BitmapContainer,
+                                  bitmapset._RunContainer,
+                                  bitmapset._ArrayContainer,
+                                  bitmapset._ArrayContainer])
+        self.assertSameSet(self.bitmapset, self.set)
+
+    def test_membership(self):
+        s = self.bitmapset
+        for element in self.elements:
+            self.failUnless(element in s)
+        for element in 2**16 + 1, 2**17 + 5500, 2**17 + 9000, 2**64, -1, 'a':
+            self.assertEquals(element in s, element in self.set)
+        # elements equal to integers are members, as in a set
+        s = BitmapSet([1, 2**40])
+        for element in 1.0, 2.0**40, 1L, True:
+            self.assertEquals(element in s, element in set([1, 2**40]))
+        for element in 1.5, float('inf'), float('nan'), '1', None:
+            self.failIf(element in s)
+        s.discard(1.0)
+        self.assertSameSet(s, [2**40])
+        # and they are stored as integers
+        s, expected = BitmapSet([1, 2, 3]), set([1, 2, 3])
+        for other in set([1.0]), set([2.0, 4.0, 2**40 + 0.0]), [3.0, 2]:
+            self.assertEquals(s.intersection(other),
+                              expected.intersection(other))
+            self.assertEquals(s.union(other), expected.union(other))
+            self.assertEquals(s.symmetric_difference(other),
+                              expected.symmetric_difference(other))
+            self.assertEquals(s.difference(other), expected.difference(other))
+            if isinstance(other, set):
+                self.assertEquals(s & other, expected & other)
+                self.assertEquals(s | other, expected | other)
+                self.assertEquals(s ^ other, expected ^ other)
+                c = s.copy()
+                c &= other
+                self.assertEquals(c, expected & other)
+        self.assertSameSet(s.intersection([2.0]), [2])
+        self.failUnless(type(list(s | set([4.0]))[-1]) is int)
+        s.add(4.0)
+        self.assertSameSet(s, [1, 2, 3, 4])
+        self.assertSameSet(BitmapSet([5.0, 5]), [5])
+
+    def test_invalid_elements(self):
+        s = BitmapSet()
+        self.assertRaises(TypeError, s.add, 'a')
+        self.assertRaises(TypeError, s.add, 1.5)
+        self.assertRaises(ValueError, s.add, -1)
+        self.assertRaises(ValueError, s.add, 2**64)
+        self.assertRaises(ValueError, BitmapSet, [1, -1])
+        self.assertRaises(TypeError, BitmapSet, [1, None])
+        self.assertEquals(len(s), 0)
+
+    def test_mutations(self):
+        s, expected = self.bitmapset, set(self.set)
+        for i in xrange(10000):
+            element = random.choice((random.randrange(2**18),
+                                     random.choice(self.elements[:-2])))
+            if i % 2:
+                s.add(element); expected.add(element)
+            else:
+                s.discard(element); expected.discard(element)
+        self.assertSameSet(s, expected)
+        self.assertRaises(KeyError, s.remove, -1)
+        s.remove(2**63)
+        self.failIf(2**63 in s)
+        self.assertEquals(s.pop(), 2**64 - 1)
+        self.assertEquals(s.pop(), max(expected - set(self.huge)))
+        s.clear()
+        self.assertEquals(len(s), 0)
+        self.assertRaises(KeyError, s.pop)
+
+    def test_conversions(self):
+        # a chunk becomes a bitmap above 4096 elements and back below
+        s = BitmapSet(xrange(0, 8192, 2))
+        self.assertEquals(s._containers[0].__class__,
+                          bitmapset._ArrayContainer)
+        s.add(1)
+        self.assertEquals(s._containers[0].__class__,
+                          bitmapset._BitmapContainer)
+        s.remove(1)
+        self.assertEquals(s._containers[0].__class__,
+                          bitmapset._ArrayContainer)
+        # a run that is split too often is no longer a run
+        s = BitmapSet(xrange(100))
+        s.optimize()
+        self.assertEquals(s._containers[0].__class__, bitmapset._RunContainer)
+        for element in xrange(1, 100, 2):
+            s.remove(element)
+        self.assertEquals(s._containers[0].__class__,
+                          bitmapset._ArrayContainer)
+        self.assertSameSet(s, range(0, 100, 2))
+
+    def test_operations(self):
+        others = [self.sparse[:500] + self.dense[::3] + range(2**16, 2**17, 7),
+                  self.runs[100:] + range(2**17 + 4000, 2**17 + 7000),
+                  self.huge[:1] + [5, 2**40], []]
+        s1, set1 = self.bitmapset, self.set
+        for other in others:
+            s2, set2 = BitmapSet(other), set(other)
+            for op in 'and', 'or', 'sub', 'xor':
+                op = '__%s__' % op
+                expected = getattr(set1, op)(set2)
+                self.assertSameSet(getattr(s1, op)(s2), expected)
+                self.assertSameSet(getattr(s1, op)(set2), expected)
+                result = getattr(set1, op)(s2)
+                if result is NotImplemented:
+                    result = getattr(s2, op.replace('__', '__r', 1))(set1)
+                self.assertEquals(result, expected)
+                self.failUnless(isinstance(result, set))
+            self.assertSameSet(s1.union(other), set1.union(other))
+            self.assertSameSet(s1.intersection(other),
+                               set1.intersection(other))
+            self.assertSameSet(s1.difference(other), set1.difference(other))
+            self.assertSameSet(s1.symmetric_difference(other),
+                               set1.symmetric_difference(other))
+        self.assertSameSet(s1, set1)
+        self.assertRaises(TypeError, s1.__or__, set(['a']))
+        self.assertSameSet(s1 & set(['a', 5]), set1 & set([5]))
+
+    def test_inplace_operations(self):
+        other = self.dense[::2] + self.runs[::3] + [2**40]
+        for op in 'iand', 'ior', 'isub', 'ixor':
+            s = self.bitmapset.copy()
+            result = getattr(s, '__%s__' % op)(BitmapSet(other))
+            self.failUnless(result is s)
+            expected = getattr(set(self.set), '__%s__' % op)(set(other))
+            self.assertSameSet(s, expected)
+            s = self.bitmapset.copy()
+            getattr(s, '__%s__' % op)(set(other))
+            self.assertSameSet(s, expected)
+        self.assertRaises(TypeError, self.bitmapset.__ior__, other)
+        s = self.bitmapset.copy()
+        s.update(other, [3, 2**50])
+        self.assertSameSet(s, self.set.union(other, [3, 2**50]))
+        self.assertSameSet(self.bitmapset, self.set)
+
+    def test_comparisons(self):
+        s = self.bitmapset
+        subset = BitmapSet(self.elements[::2])
+        self.assertEquals(s, BitmapSet(sorted(self.elements)))
+        self.assertEquals(s, self.set)
+        self.failIf(s != self.set)
+        self.failUnless(subset < s and s > subset and s <= s and s >= subset)
+        self.failIf(s < s or subset >= s)
+        self.failUnless(subset <= self.set and subset.issubset(self.elements))
+        self.failUnless(s.issuperset(self.elements[::3]))
+        self.failIf(subset.issuperset(self.elements))
+        self.assertRaises(TypeError, s.__le__, self.elements)
+        self.assertRaises(TypeError, hash, s)
+
+    def test_copy(self):
+        s = self.bitmapset
+        for c in s.copy(), copy.copy(s), copy.deepcopy(s), BitmapSet(s):
+            self.assertEquals(c, s)
+            c.add(2**17 + 5500)
+            c.discard(self.sparse[0])
+            self.assertSameSet(s, self.set)
+
+    def test_serialization(self):
+        s = self.bitmapset
+        data = s.tostring()
+        self.failUnless(len(data) < len(self.sparse) * 2 + 8192 + 1000)
+        self.assertEquals(BitmapSet.fromstring(data), s)
+        self.assertEquals(BitmapSet.fromstring(''), BitmapSet())
+        for protocol in 0, 2:
+            self.assertEquals(pickle.loads(pickle.dumps(s, protocol)), s)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+
+import unittest
+import cPickle as pickle
+
+import datastructs.btreelist as btreelist
+from datastructs.btreelist import *
+from datastructs import listmixin
+
+__author__ = "George Sakkis <gsakkis@rutgers.edu>"
+
+
+class ListMixinTestCase(unittest.TestCase):
+    def test_list_mixin(self):
+        listmixin.test_list_mixin(BTreeList)
+
+
+class BTreeListTestCase(unittest.TestCase):
+    def setUp(self):
+        # small nodes to exercise deep trees
+        self._sizes = btreelist._MAXSIZE, btreelist._MINSIZE
+        btreelist._MAXSIZE, btreelist._MINSIZE = 4, 2
+
+    def tearDown(self):
+        btreelist._MAXSIZE, btreelist._MINSIZE = self._sizes
+
+    def assertValid(self, x):
+        def check(node, height, isRoot):
+            self.failUnless(len(node.children) <= 4)
+            if not isRoot:
+                self.failUnless(len(node.children) >= 2)
+            if height:
+                self.assertEquals(node.size,
+                                  sum([child.size for child in node.children]))
+                for child in node.children:
+                    check(child, height-1, False)
+        check(x._root, x._height, True)
+
+    def test_insert_delete(self):
+        x = BTreeList(); y = []
+        for i in xrange(200):
+            j = (i * 7) % (i + 1)
+            x.insert(j, i); y.insert(j, i)
+        self.assertValid(x)
+        self.assertEquals(list(x), y)
+        while y:
+            j = len(y) // 3
+            self.assertEquals(x.pop(j), y.pop(j))
+            self.assertValid(x)
+        self.assertEquals(len(x), 0)
+
+    def test_slices(self):
+        y = range(300)
+        x = BTreeList(y)
+        for start,stop in (0,300), (17,18), (5,250), (100,99), (-40,-3):
+            self.assertEquals(list(x[start:stop]), y[start:stop])
+            self.assertValid(x[start:stop])
+        x[10:200] = range(5); y[10:200] = range(5)
+        self.assertEquals(list(x), y)
+        del x[3:50]; del y[3:50]
+        self.assertEquals(list(x), y)
+        self.assertValid(x)
+
+    def test_concat(self):
+        x = BTreeList(range(100))
+        z = x + x[:3] + BTreeList(range(1000))
+        self.assertEquals(list(z), range(100) + range(3) + range(1000))
+        self.assertValid(z)
+        x += x
+        self.assertEquals(list(x), range(100) * 2)
+        self.assertEquals(list(x * 5), range(100) * 10)
+        self.assertValid(x * 5)
+        self.assertEquals(len(x * 0), 0)
+
+    def test_copy_on_write(self):
+        x = BTreeList(range(100))
+        y = x.copy()
+        z = x[10:90]
+        x[50] = 'x'; x.insert(20, 'y'); del x[0]
+        y[50] = 'z'; y.append('w')
+        self.assertEquals(list(y), range(50) + ['z'] + range(51,100) + ['w'])
+        self.assertEquals(list(z), range(10,90))
+        self.assertEquals(list(x), range(1,20) + ['y'] + range(20,50) + ['x'] +
+                          range(51,100))
+        # slices share nodes with the list in both directions
+        x = BTreeList(range(10000))
+        for y in x[0:5000], x[:], x[10:9000]:
+            expected = list(y)
+            x[10] = 'x'; x.insert(20, 'y'); del x[30]
+            self.assertEquals(list(y), expected)
+        expected = list(x)
+        y[5] = 'z'; y.insert(100, 'w'); del y[0:50]
+        self.assertEquals(list(x), expected)
+        # a list that contains the same nodes twice
+        x = BTreeList(range(10)) * 4
+        x[3] = 'x'
+        self.assertEquals(list(x), [0,1,2,'x'] + range(4,10) + range(10) * 3)
+
+    def test_pickle(self):
+        x = BTreeList(range(100))
+        self.assertEquals(pickle.loads(pickle.dumps(x, 2)), x)
+
+
+if __name__ == '__main__':
+    unittest.main()
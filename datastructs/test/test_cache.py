@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+
+import unittest
+from datastructs.cache import *
+
+__author__ = "George Sakkis <gsakkis@rutgers.edu>"
+
+
+class FakeTimer(object):
+    def __init__(self):
+        self.now = 0
+    def __call__(self):
+        return self.now
+
+
+class CacheTestCase(unittest.TestCase):
+    def test_LRUCache(self):
+        c = LRUCache(3)
+        for i in range(5):
+            c[i] = str(i)
+        self.assertEquals(c.keys(), [2,3,4])
+        self.assertEquals(c[2], '2')    # 2 becomes the most recent
+        c[5] = '5'
+        self.assertEquals(c.keys(), [4,2,5])
+        c[4] = 'four'                   # updating also refreshes the key
+        c[6] = '6'
+        self.assertEquals(c.keys(), [5,4,6])
+        self.assertEquals(c[4], 'four')
+        self.assertRaises(KeyError, c.__getitem__, 2)
+        del c[5]
+        self.assertEquals(len(c), 2)
+        self.failIf(5 in c)
+        self.assertEquals(c.get(5), None)
+        c.clear()
+        self.assertEquals(len(c), 0)
+        c = LRUCache(0)
+        c[1] = 1
+        self.failIf(1 in c)
+        self.assertRaises(ValueError, LRUCache, -1)
+
+    def test_LFUCache(self):
+        c = LFUCache(3)
+        for i in range(3):
+            c[i] = i
+        for i in range(3):
+            for j in range(i+1):
+                c[i]
+        c[3] = 3                        # evicts 0 (1 hit)
+        self.assertEquals(sorted(c), [1,2,3])
+        c[4] = 4                        # evicts 3 (no hits)
+        self.assertEquals(sorted(c), [1,2,4])
+        c[4]; c[4]; c[4]
+        c[5] = 5                        # evicts 1 (2 hits)
+        self.assertEquals(sorted(c), [2,4,5])
+        # ties are broken by recency
+        c = LFUCache(2)
+        c[1] = 1; c[2] = 2
+        c[2]; c[1]
+        c[3] = 3
+        self.assertEquals(sorted(c), [1,3])
+        del c[3]
+        c[4] = 4; c[5] = 5
+        self.assertEquals(sorted(c), [1,5])
+        self.assertEquals(len(c), 2)
+        c.clear()
+        self.assertEquals(len(c), 0)
+        c = LFUCache(0)
+        c[1] = 1
+        self.failIf(1 in c)
+
+    def test_TTLCache(self):
+        timer = FakeTimer()
+        c = TTLCache(10, timer=timer)
+        c[1] = 1
+        timer.now = 5
+        c[2] = 2
+        self.assertEquals(sorted(c), [1,2])
+        timer.now = 10
+        self.failIf(1 in c)
+        self.assertRaises(KeyError, c.__getitem__, 1)
+        self.assertEquals(c[2], 2)
+        c[2] = 'two'                    # setting renews the expiration time
+        timer.now = 19
+        self.assertEquals(c[2], 'two')
+        timer.now = 20
+        self.assertEquals(len(c), 0)
+        c = TTLCache(10, 2, timer=timer)
+        for i in range(4):
+            c[i] = i
+        self.assertEquals(list(c), [2,3])
+
+    def test_onEvict(self):
+        timer = FakeTimer()
+        for c in LRUCache(2), LFUCache(2), TTLCache(10, 2, timer=timer):
+            evicted = []
+            c.onEvict = lambda key,value: evicted.append((key,value))
+            c[1] = 'a'; c[2] = 'b'; c[3] = 'c'
+            del c[2]
+            self.assertEquals(evicted, [(1,'a')])
+        timer.now = 10
+        self.assertRaises(KeyError, c.__getitem__, 3)
+        self.assertEquals(evicted, [(1,'a'),(3,'c')])
+
+    def test_WeakValueCache(self):
+        import gc
+        class Value(object):
+            pass
+        for hotsize,alive in (0,[0]), (2,[0,4]):
+            c = WeakValueCache(hotsize)
+            values = [Value() for i in range(5)]
+            for i in range(5):
+                c[i] = values[i]
+            self.assertEquals(len(c), 5)
+            self.failUnless(c[0] is values[0])
+            del values[1:]; gc.collect()
+            # 0 is still referenced; 0 and 4 are the most recently used
+            self.assertEquals(sorted(c), alive)
+            del c[0]
+            self.failIf(0 in c)
+            c.clear()
+            self.assertEquals(len(c), 0)
+
+    def test_WeightedLRUCache(self):
+        c = WeightedLRUCache(10, len)
+        c['a'] = 'x' * 4
+        c['b'] = 'x' * 4
+        self.assertEquals(c.weight(), 8)
+        c['a']
+        c['c'] = 'x' * 3                # evicts b
+        self.assertEquals(c.keys(), ['a','c'])
+        self.assertEquals(c.weight(), 7)
+        c['d'] = 'x' * 11               # too heavy; not cached
+        self.assertEquals(c.keys(), ['a','c'])
+        c['a'] = ''
+        self.assertEquals(c.weight(), 3)
+        del c['c']
+        self.assertEquals(c.weight(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+
+import os
+import time
+import shutil
+import marshal
+import tempfile
+import unittest
+from datastructs.diskcache import *
+from datastructs.memo import Memoize
+from datastructs.frozendict import frozendict
+
+__author__ = "George Sakkis <gsakkis@rutgers.edu>"
+
+
+class SQLiteCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'cache.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_dict(self):
+        for kwds in {}, {'compress':True}, {'serializer':marshal}:
+            c = SQLiteCache(self.path, table='t%d' % len(kwds), **kwds)
+            keys = [1, 'a', (1,2.5,'x'), ((1,2), frozendict(z=3))]
+            for i,key in enumerate(keys):
+                c[key] = [i] * 100
+            self.assertEquals(len(c), len(keys))
+            for i,key in enumerate(keys):
+                self.failUnless(key in c)
+                self.assertEquals(c[key], [i] * 100)
+            c[1] = None
+            self.assertEquals(c[1], None)
+            del c[1]
+            self.failIf(1 in c)
+            self.assertRaises(KeyError, c.__getitem__, 1)
+            self.assertRaises(KeyError, c.__delitem__, 1)
+            c.clear()
+            self.assertEquals(len(c), 0)
+            c.close()
+
+    def test_equal_keys(self):
+        c = SQLiteCache(self.path)
+        a = 'ab' * 20
+        b = ''.join(['ab'] * 20)
+        self.failIf(a is b)
+        c[(a,a)] = 1
+        self.failUnless((a,b) in c and (b,b) in c)
+        c[1] = 'x'
+        for key in 1, 1.0, 1L, True, 1+0j:
+            self.assertEquals(c[key], 'x')
+        c[(u'a', 2.0, frozenset([1, 2]))] = 'y'
+        self.assertEquals(c[('a', 2, frozenset([2.0, 1]))], 'y')
+        c[frozendict(x=a, y=(1, 2))] = 'z'
+        self.assertEquals(c[frozendict(y=(1.0, 2), x=b)], 'z')
+        for key in 2, 1.5, 'b', u'\xe9', (1,), frozenset([1]), (a,):
+            self.failIf(key in c)
+        self.assertEquals(len(c), 4)
+
+    def test_persistence(self):
+        calls = []
+        def square(x):
+            calls.append(x)
+            return x*x
+        f = Memoize(square, lambda: SQLiteCache(self.path))
+        self.assertEquals(map(f, range(5)), [0,1,4,9,16])
+        f._cache.close()
+        # a new run finds the results of the previous one
+        f = Memoize(square, lambda: SQLiteCache(self.path))
+        self.assertEquals(map(f, range(6)), [0,1,4,9,16,25])
+        self.assertEquals(calls, range(5) + [5])
+
+    def test_maxsize(self):
+        c = SQLiteCache(self.path, maxsize=3)
+        for i in range(3):
+            c[i] = i
+            time.sleep(0.01)
+        c[0]                # 1 becomes the least recently used
+        time.sleep(0.01)
+        c[3] = 3
+        self.assertEquals(len(c), 3)
+        self.failIf(1 in c)
+        for i in 0,2,3:
+            self.failUnless(i in c)
+        # larger caches are trimmed to 90% of maxsize at a time
+        c = SQLiteCache(self.path, 'batch', maxsize=20)
+        for i in range(21):
+            c[i] = i
+        self.assertEquals(len(c), 18)
+        self.failIf(0 in c or 2 in c)
+        self.failUnless(3 in c and 20 in c)
+
+    def test_processes(self):
+        if not hasattr(os, 'fork'):
+            return
+        children = []
+        for i in range(4):
+            pid = os.fork()
+            if not pid:
+                status = 1
+                try:
+                    try:
+                        c = SQLiteCache(self.path)
+                        for j in range(50):
+                            c[i,j] = i*j
+                        status = 0
+                    except Exception:
+                        pass
+                finally:
+                    os._exit(status)
+            children.append(pid)
+        for pid in children:
+            self.assertEquals(os.waitpid(pid, 0)[1], 0)
+        c = SQLiteCache(self.path)
+        self.assertEquals(len(c), 200)
+        self.assertEquals(c[3,7], 21)
+
+
+if __name__ == '__main__':
+    unittest.main()
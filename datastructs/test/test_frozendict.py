@@ -19,9 +19,138 @@ class FrozenDictTestCase(unittest.TestCase):
         self.assertRaises(TypeError, d.setdefault, 'x', 2)
         self.assertRaises(TypeError, d.popitem)
         self.assertRaises(TypeError, d.update, {})
+        self.assertRaises(TypeError, d.pop, 'x')
         # a frozendict can be a key to a dict
         self.assertEquals(len({d:1, d:2}), 1)
 
+    def test_hash(self):
+        import pickle
+        # keys with the same hash are stored in insertion order
+        items = [(i*2**32, i) for i in range(10)]
+        d1 = frozendict(items)
+        d2 = frozendict(reversed(items))
+        self.assertNotEquals(d1.items(), d2.items())
+        self.assertEquals(hash(d1), hash(d2))
+        self.assertEquals(hash(d1), hash(PersistentDict(items)))
+        for protocol in 0,2:
+            d = pickle.loads(pickle.dumps(d1, protocol))
+            self.assertEquals(d, d1)
+            self.assertEquals(d.__class__, frozendict)
+            self.assertEquals(hash(d), hash(d1))
+
+
+class SmallFrozenDictTestCase(unittest.TestCase):
+    def test_smallfrozendict(self):
+        self.assertEquals(smallfrozendict().items(), [])
+        d = smallfrozendict((['y',2],['x',1]))
+        self.assertEquals(d, smallfrozendict({'x':1,'y':2}))
+        self.assertEquals(d, smallfrozendict(x=1,y=2))
+        self.assertEquals(d, smallfrozendict({'x':1}, y=2))
+        self.assertNotEquals(d, smallfrozendict(x=1,y=3))
+        self.assertEquals(len(d), 2)
+        self.assertEquals(d['x'], 1)
+        self.assertRaises(KeyError, d.__getitem__, 'z')
+        self.assertEquals(d.get('z', 0), 0)
+        self.failUnless('y' in d)
+        self.failIf(2 in d)
+        self.assertEquals(list(d), ['x','y'])
+        self.assertEquals(d.values(), [1,2])
+        self.assertEquals(d.items(), [('x',1),('y',2)])
+        self.assertEquals(dict(d.iteritems()), {'x':1,'y':2})
+        self.assertEquals(len({d:1, smallfrozendict(y=2,x=1):2}), 1)
+        import pickle
+        for protocol in 0,2:
+            self.assertEquals(pickle.loads(pickle.dumps(d, protocol)), d)
+
+
+class CollidingKey(object):
+    '''A key whose hash is determined by a few low bits of its value.'''
+    def __init__(self, value, bits=7):
+        self.value = value
+        self.hash = value & ((1<<bits) - 1)
+    def __hash__(self):
+        return self.hash
+    def __eq__(self, other):
+        return self.value == other.value
+
+
+class PersistentDictTestCase(unittest.TestCase):
+    def test_init(self):
+        self.assertEquals(PersistentDict(), {})
+        self.assertEquals(PersistentDict((['x',1],['y',2])), {'x':1, 'y':2})
+        self.assertEquals(PersistentDict({'x':1,'y':2}), {'x':1,'y':2})
+        self.assertEquals(PersistentDict(x=1,y=2), {'x':1,'y':2})
+        p = PersistentDict(x=1)
+        self.assertEquals(PersistentDict(p, y=2), {'x':1,'y':2})
+        self.assertEquals(p, {'x':1})
+        self.assertEquals(PersistentDict(frozendict(x=1)), {'x':1})
+
+    def test_operations(self):
+        import random
+        for keys in range(3000), [str(i) for i in range(1000)], \
+                    [CollidingKey(i) for i in range(400)]:
+            model = {}
+            p = PersistentDict()
+            versions = []
+            for i in xrange(3 * len(keys)):
+                key = random.choice(keys)
+                if key in model and random.random() < 0.4:
+                    del model[key]
+                    p = p.delete(key)
+                else:
+                    model[key] = i
+                    p = p.set(key, i)
+                if not i % 100:
+                    versions.append((p, model.copy()))
+            self.assertEquals(len(p), len(model))
+            self.assertEquals(dict(p.iteritems()), model)
+            self.assertEquals(sorted(p.keys()), sorted(model.keys()))
+            for key in keys:
+                self.assertEquals(p.get(key), model.get(key))
+                self.assertEquals(key in p, key in model)
+            # the older versions are unchanged
+            for version,versionModel in versions:
+                self.assertEquals(version, versionModel)
+            # delete everything
+            for key in model.keys():
+                p = p.delete(key)
+            self.assertEquals(len(p), 0)
+            self.assertEquals(list(p), [])
+            self.assertRaises(KeyError, p.delete, keys[0])
+
+    def test_update(self):
+        p = PersistentDict(zip(range(100), range(100)))
+        q = p.update(zip(range(50,150), 'x'*100), extra=1)
+        self.assertEquals(len(q), 151)
+        self.assertEquals(q[49], 49)
+        self.assertEquals(q[50], 'x')
+        self.assertEquals(q['extra'], 1)
+        self.assertEquals(p, dict(zip(range(100), range(100))))
+        self.failUnless(p.update() is p)
+        self.failUnless(p.set(1, 1) is p)
+
+    def test_immutable(self):
+        p = PersistentDict(x=1)
+        self.assertRaises(TypeError, p.__setitem__, 'x', 2)
+        self.assertRaises(TypeError, p.__delitem__, 'x')
+        self.assertRaises(TypeError, p.clear)
+        self.assertRaises(TypeError, p.setdefault, 'x', 2)
+        self.assertRaises(TypeError, p.pop, 'x')
+        self.assertRaises(TypeError, p.popitem)
+
+    def test_hash(self):
+        import pickle
+        items = [(i, str(i)) for i in range(100)]
+        p = PersistentDict(items)
+        q = PersistentDict(reversed(items))
+        self.assertEquals(p, q)
+        self.assertEquals(hash(p), hash(q))
+        self.assertEquals(len({p:1, q:2}), 1)
+        self.assertNotEquals(p, p.set(0, 0))
+        self.assertNotEquals(p, p.delete(0))
+        self.assertNotEquals(p, None)
+        self.assertEquals(pickle.loads(pickle.dumps(p)), p)
+
 
 if __name__ == '__main__':
     unittest.main()
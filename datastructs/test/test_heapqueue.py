@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+
+import time
+import random
+import unittest
+import threading
+from datastructs.heapqueue import *
+
+__author__ = "George Sakkis <gsakkis@rutgers.edu>"
+
+
+class ConcurrentHeapQueueTestCase(unittest.TestCase):
+    def test_order(self):
+        q = ConcurrentHeapQueue()
+        data = [random.random() for _ in xrange(100)]
+        for item in data:
+            q.put(item)
+        self.assertEquals(q.qsize(), len(data))
+        self.assertEquals(q.peek(), min(data))
+        self.assertEquals([q.get() for _ in data], sorted(data))
+        self.failUnless(q.empty())
+        self.assertRaises(Empty, q.peek)
+
+    def test_key(self):
+        q = ConcurrentHeapQueue(key=lambda x: -x)
+        for item in 3,1,4,1,5:
+            q.put(item)
+        self.assertEquals([q.get() for _ in xrange(5)], [5,4,3,1,1])
+
+    def test_timeout(self):
+        q = ConcurrentHeapQueue(maxsize=1)
+        self.assertRaises(Empty, q.get_nowait)
+        self.assertRaises(Empty, q.get, True, 0.01)
+        q.put(1)
+        self.failUnless(q.full())
+        self.assertRaises(Full, q.put_nowait, 2)
+        self.assertRaises(Full, q.put, 2, True, 0.01)
+        self.assertEquals(q.get(), 1)
+
+    def test_blocking(self):
+        q = ConcurrentHeapQueue(maxsize=2)
+        produced = range(200)
+        consumed = []
+        def produce(items):
+            for item in items:
+                q.put(item)
+        def consume(n):
+            for _ in xrange(n):
+                consumed.append(q.get())
+        threads = [threading.Thread(target=produce, args=(produced[i::4],))
+                   for i in xrange(4)]
+        threads += [threading.Thread(target=consume, args=(50,))
+                    for i in xrange(4)]
+        for t in threads: t.start()
+        for t in threads: t.join(10)
+        self.assertEquals(sorted(consumed), produced)
+        self.failUnless(q.empty())
+
+
+if __name__ == '__main__':
+    unittest.main()
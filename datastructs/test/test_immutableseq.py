@@ -28,6 +28,12 @@ class ImmutableSequenceTestSuite(unittest.TestSuite):
         # __mul__ test suites
         for n in range(-1,len(aSequence)):
             self.addSuite(self._makeTestCase(aSequence[1:]*n, anImmutable[1:]*n))
+        # slices of a concatenation (stored in a persistent vector)
+        for slice in iterSlices(aSequence):
+            self.addSuite(self._makeTestCase((aSequence*2)[1:-1][slice],
+                                             (anImmutable*2)[1:-1][slice]))
+        self.addSuite(PersistentVectorTestCase)
+        self.addSuite(HashCompareTestCase)
 
     def addSuite(self,testCase):
         self.addTest(unittest.TestLoader().loadTestsFromTestCase(testCase))
@@ -97,6 +103,113 @@ class ImmutableSequenceTestSuite(unittest.TestSuite):
             self.failIf(x<=y)
 
 
+class PersistentVectorTestCase(unittest.TestCase):
+    def test_operations(self):
+        import random
+        random.seed(0)
+        for i in xrange(100):
+            model = []; immutable = ImmutableSequence([])
+            for j in xrange(50):
+                r = random.random()
+                if r < 0.3:
+                    other = range(random.choice([0,1,5,40,100]))
+                    if random.random() < 0.5:
+                        model = model + other
+                        immutable = immutable + ImmutableSequence(other)
+                    else:
+                        model = other + model
+                        immutable = ImmutableSequence(other) + immutable
+                elif r < 0.5:
+                    model.append(j)
+                    immutable = immutable.append(j)
+                elif r < 0.65 and model:
+                    index = random.randrange(-len(model), len(model))
+                    model[index] = -j
+                    immutable = immutable.set(index, -j)
+                elif r < 0.85:
+                    start = random.randint(-len(model)-2, len(model)+2)
+                    stop = random.randint(-len(model)-2, len(model)+2)
+                    step = random.choice([1,1,2,-1,-3])
+                    model = model[start:stop:step]
+                    immutable = immutable[start:stop:step]
+                else:
+                    n = random.choice([0,1,2,3])
+                    model = model*n
+                    immutable = immutable*n
+                self.assertEquals(len(immutable), len(model))
+                self.assertEquals(list(immutable), model)
+                if model:
+                    index = random.randrange(len(model))
+                    self.assertEquals(immutable[index], model[index])
+
+    def test_persistence(self):
+        a = ImmutableSequence(xrange(1000))
+        b = a.append(1000).set(0, -1)
+        c = a + b
+        d = c.set(1500, None)
+        self.assertEquals(list(a), range(1000))
+        self.assertEquals(list(b), [-1] + range(1,1001))
+        self.assertEquals(len(c), 2001)
+        self.assertEquals(c[1500], 500)
+        self.assertEquals(d[1500], None)
+        self.assertRaises(IndexError, a.set, 1000, 0)
+        self.assertRaises(IndexError, a.set, -1001, 0)
+
+    def test_height(self):
+        # repeated appends/prepends/concatenations keep the tree shallow
+        a = b = c = ImmutableSequence([])
+        for i in xrange(5000):
+            a = a.append(i)
+            b = ImmutableSequence([i]) + b
+            c = c + ImmutableSequence([i,i])
+        self.assertEquals(list(a), range(5000))
+        self.assertEquals(list(b), range(4999,-1,-1))
+        for immutable in a,b,c:
+            self.failUnless(immutable._sequence._height <= 3)
+        self.assertEquals(list((a*1000)[-5:]), range(4995,5000))
+        self.assertEquals(len(a*1000), 5000000)
+
+
+class HashCompareTestCase(unittest.TestCase):
+    def test_hash(self):
+        items = range(100)
+        whole = ImmutableSequence(items)
+        equals = [ImmutableSequence(items), ImmutableSequence(xrange(100)),
+                  ImmutableSequence(range(-1,101))[1:-1],
+                  ImmutableSequence(range(50)) + ImmutableSequence(range(50,100)),
+                  ImmutableSequence(range(99,-1,-1))[::-1]]
+        for other in equals:
+            self.assertEquals(whole, other)
+            self.assertEquals(hash(whole), hash(other))
+            self.assertEquals({whole: 1}[other], 1)
+        # slices and new versions don't inherit the hash
+        hash(whole)
+        self.assertNotEquals(hash(whole[1:]), hash(whole))
+        self.assertEquals(hash(whole[1:]), hash(ImmutableSequence(items[1:])))
+        self.assertEquals(hash(whole.set(0, -1)),
+                          hash(ImmutableSequence([-1] + items[1:])))
+        self.assertNotEquals(whole, whole.set(99, None))
+
+    def test_compare(self):
+        # same length: lexicographic order
+        for x,y in ([1,5], [2,0]), ([1,2,3], [1,2,4]), ([0,9], [1,0]):
+            for immutables in ((ImmutableSequence(x), ImmutableSequence(y)),
+                               (ImmutableSequence(x).append(None)[:-1],
+                                ImmutableSequence(y))):
+                a,b = immutables
+                self.failUnless(a < b)
+                self.failUnless(b > a)
+                self.failIf(a > b)
+                self.failUnless(a <= b)
+                self.failIf(a >= b)
+        a = ImmutableSequence(range(10))
+        for b in a, a[:], ImmutableSequence(a):
+            self.failUnless(a == b)
+            self.failUnless(a >= b)
+            self.failIf(a > b)
+            self.failIf(a != b)
+
+
 def iterSlices(sequence, validOnly=True):
     indexes = steps = range(-len(sequence)-1, len(sequence)+2) + [None]
     if validOnly:
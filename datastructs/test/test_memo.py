@@ -19,6 +19,209 @@ class MemoTestCase(unittest.TestCase):
             self.assertEquals(foo(1,2,3,4,z="6"), memfoo(1,2,3,4,z="6"))
             self.assertEquals(foo(1,2,3,4,5,z="6"), memfoo(1,2,3,4,5,z="6"))
 
+    def test_keys(self):
+        calls = []
+        def f(a, b=2, *args, **kwds):
+            calls.append(1)
+            return a, b, args, kwds
+        memf = Memoize(f)
+        # all these calls bind the same arguments
+        for args,kwds in [((1,), {}), ((1,2), {}), ((1,), {'b':2}),
+                          ((), {'a':1}), ((), {'b':2, 'a':1})]:
+            self.assertEquals(memf(*args,**kwds), (1,2,(),{}))
+        self.assertEquals(len(calls), 1)
+        self.assertEquals(memf(1,2,3,x=4), (1,2,(3,),{'x':4}))
+        self.assertEquals(memf(1,2,3,x=4), (1,2,(3,),{'x':4}))
+        self.assertEquals(memf(1,x=4), (1,2,(),{'x':4}))
+        self.assertEquals(len(calls), 3)
+        # invalid calls are not confused with valid ones
+        def g(x):
+            calls.append(x)
+            return x
+        memg = Memoize(g)
+        self.assertEquals(memg(()), ())
+        self.assertEquals(memg(x=(1,2)), (1,2))
+        self.assertEquals(memg((1,2)), (1,2))
+        self.assertEquals(len(calls), 5)
+        self.assertRaises(TypeError, memg)
+        self.assertRaises(TypeError, memg, 1, 2)
+        self.assertRaises(TypeError, memg, (), x=1)
+        self.assertRaises(TypeError, memg, y=1)
+        self.assertRaises(TypeError, memf)
+        self.assertRaises(TypeError, memf, 1, a=1)
+        # bound methods don't include self in the key
+        class C(object):
+            def m(self, a, b=0):
+                return a + b
+        memm = Memoize(C().m)
+        self.assertEquals(memm(1), 1)
+        self.assertEquals(memm(1, b=0), 1)
+        self.assertEquals(memm._cache.keys(), [(1,0)])
+        # unhashable defaults
+        def h(a, opts={}, *args):
+            calls.append(a)
+            return a, opts
+        memh = Memoize(h)
+        self.assertEquals(memh(1), (1, {}))
+        self.assertEquals(memh(a=1), (1, {}))
+        self.assertEquals(len(calls), 6)
+        self.assertRaises(TypeError, memh, 1, {})
+        # callables that cannot be introspected use the generic key
+        memmax = Memoize(max)
+        self.assertEquals(memmax(3,4), 4)
+        self.assertEquals(memmax((3,4), key=lambda x:-x), 3)
+        # keyword arguments are not confused with positional tuples
+        class F(object):
+            def __call__(self, *args, **kwds):
+                return args, kwds
+        memF = Memoize(F())
+        self.assertEquals(memF(1, x=1), ((1,), {'x':1}))
+        self.assertEquals(memF((1,), (('x',1),)), (((1,), (('x',1),)), {}))
+        self.assertEquals(memF(1, x=1), ((1,), {'x':1}))
+
+    def test_bounded(self):
+        calls = []
+        def square(x):
+            calls.append(x)
+            return x*x
+        memsquare = Memoize(square, maxsize=2)
+        for i in 1,2,1,3,2,1:
+            self.assertEquals(memsquare(i), i*i)
+        self.assertEquals(calls, [1,2,3,2,1])
+        self.assertEquals(len(memsquare._cache), 2)
+        memsquare = Memoize(square, ttl=60)
+        for i in 1,1:
+            self.assertEquals(memsquare(i), i*i)
+        self.assertEquals(calls, [1,2,3,2,1,1])
+        self.assertRaises(ValueError, Memoize, square, lambda: {}, maxsize=2)
+
+    def test_SynchronizedMemoize(self):
+        import time, threading
+        foo = self._aFunction()
+        memfoo = SynchronizedMemoize(foo, stripes=3)
+        for i in range(3):
+            self.assertEquals(foo(1,2), memfoo(1,2))
+            self.assertEquals(foo(1,2,3,4,z="6"), memfoo(1,2,3,4,z="6"))
+        # stress test: each value is computed exactly once
+        computed = []; lock = threading.Lock()
+        def slow(x):
+            lock.acquire(); computed.append(x); lock.release()
+            time.sleep(0.001)
+            if x == 0:
+                raise ZeroDivisionError
+            return 10*x
+        memslow = SynchronizedMemoize(slow, maxsize=100)
+        results = []; errors = []
+        def worker(seed):
+            for i in xrange(100):
+                x = (seed+i) % 20
+                try: results.append((x, memslow(x)))
+                except ZeroDivisionError:
+                    errors.append(x)
+        threads = [threading.Thread(target=worker, args=(i,))
+                   for i in xrange(10)]
+        for t in threads: t.start()
+        for t in threads: t.join()
+        self.assertEquals(sorted(set(computed)), range(20))
+        # exceptions are not cached, so 0 may be computed more than once
+        self.assertEquals(len([x for x in computed if x]), 19)
+        self.assertEquals(len(results) + len(errors), 1000)
+        for x,y in results:
+            self.assertEquals(y, 10*x)
+        self.assertEquals(set(errors), set([0]))
+
+    def test_AsyncMemoize(self):
+        import threading
+        foo = self._aFunction()
+        memfoo = AsyncMemoize(foo)
+        for i in range(3):
+            self.assertEquals(foo(1,2), memfoo(1,2).result())
+            self.assertEquals(foo(1,2,3,4,z="6"), memfoo(1,2,3,4,z="6").result())
+        # concurrent calls share the call in progress
+        computed = []; release = threading.Event()
+        def lookup(x):
+            computed.append(x)
+            release.wait()
+            if x == 0:
+                raise ZeroDivisionError
+            return 10*x
+        tasks = []
+        memlookup = AsyncMemoize(lookup, maxsize=2, spawn=tasks.append)
+        futures = [memlookup(i % 3) for i in range(9)]
+        self.assertEquals(len(tasks), 3)
+        self.failUnless(futures[0] is futures[3] is futures[6])
+        self.failIf(futures[1].done())
+        release.set()
+        for task in tasks: task()
+        self.failUnless(futures[1].done())
+        self.assertEquals([f.result() for f in futures[1:3]], [10,20])
+        self.assertRaises(ZeroDivisionError, futures[3].result)
+        # hits return completed futures; exceptions are not cached
+        self.failUnless(memlookup(1).done())
+        self.assertEquals(memlookup(2).result(), 20)
+        memlookup(0)
+        self.assertEquals(len(tasks), 4)
+        self.assertEquals(memlookup.stats()['misses'], 2)
+        self.assertEquals(memlookup.stats()['size'], 2)
+        # the default spawn runs the calls in threads
+        memlookup = AsyncMemoize(lookup)
+        futures = map(memlookup, [1,2,1])
+        self.assertEquals([f.result() for f in futures], [10,20,10])
+
+    def test_batchmemoize(self):
+        calls = []
+        def squares(xs):
+            calls.append(list(xs))
+            return [x*x for x in xs]
+        memsquares = batchmemoize(squares)
+        self.assertEquals(memsquares([3,1,2]), [9,1,4])
+        self.assertEquals(memsquares([4,1,5,4,3]), [16,1,25,16,9])
+        self.assertEquals(memsquares([2,2]), [4,4])
+        self.assertEquals(memsquares([]), [])
+        self.assertEquals(calls, [[3,1,2], [4,5]])
+        stats = memsquares.stats()
+        self.assertEquals((stats['hits'], stats['misses']), (5,5))
+        # bounded caches, unhashable elements
+        memsquares = batchmemoize(lambda xs: squares([x[0] for x in xs]),
+                                  makeHashable=tuple, maxsize=2)
+        self.assertEquals(memsquares([[1],[2],[3]]), [1,4,9])
+        self.assertEquals(memsquares([[3],[1]]), [9,1])
+        self.assertEquals(calls[-2:], [[1,2,3], [1]])
+        # the function must return a result per element
+        self.assertRaises(ValueError, batchmemoize(lambda xs: xs[1:]), [1,2])
+
+    def test_stats(self):
+        def square(x):
+            return x*x
+        memsquare = Memoize(square, maxsize=2)
+        self.failUnless(memsquare in allMemoized())
+        misses = []; evictions = []
+        memsquare.onMiss = lambda m,key,elapsed: misses.append(key)
+        memsquare.onEvict = lambda m,key,value: evictions.append((key,value))
+        for i in 1,2,1,3,2,1:
+            memsquare(i)
+        stats = memsquare.stats()
+        self.assertEquals(stats['name'], __name__ + '.square')
+        self.assertEquals(stats['hits'], 1)
+        self.assertEquals(stats['misses'], 5)
+        self.assertEquals(stats['evictions'], 3)
+        self.assertEquals(stats['size'], 2)
+        self.failUnless(stats['computeTime'] >= 0)
+        self.assertEquals(misses, [1,2,3,2,1])
+        self.assertEquals(evictions, [(2,4),(1,1),(3,9)])
+        # the registry does not keep the memoized callables alive
+        import gc, weakref
+        ref = weakref.ref(memsquare)
+        del memsquare; gc.collect()
+        self.assertEquals(ref(), None)
+        # SynchronizedMemoize
+        memsquare = SynchronizedMemoize(square)
+        for i in 1,2,1,3,2,1:
+            memsquare(i)
+        stats = memsquare.stats()
+        self.assertEquals((stats['hits'], stats['misses'], stats['size']),
+                          (3,3,3))
+
     def test_memoizedmethod(self):
         foo = self._aFunction()
         class C:
@@ -31,12 +234,14 @@ class MemoTestCase(unittest.TestCase):
                 return foo(self._x,self._y,alpha,beta)
 
             memfoo2 = memoizedmethod(foo)
+            memfoo4 = memoizedmethod(foo, maxsize=100)
 
         class Csub(C):
             memfoo3 = memoizedmethod(C.foo)
 
         c = Csub(1,2)
-        memfoos = [getattr(c,name) for name in 'memfoo1','memfoo2','memfoo3']
+        memfoos = [getattr(c,name) for name in 'memfoo1','memfoo2','memfoo3',
+                                              'memfoo4']
         args = 3,4
         for i in range(10):
             v = c.foo(*args)
@@ -75,6 +280,30 @@ class MemoTestCase(unittest.TestCase):
         self.assertNotSame(Foo(1,x="4"), Bar(1,x="4"))
         self.assertNotSame(Foo(1,2,3,x="4"), Bar(1,2,3,x="4"))
 
+    def test_WeakMemento(self):
+        import gc
+        for metaclass in WeakMemento, weakMemento(2):
+            class Foo(object):
+                __metaclass__ = metaclass
+                def __init__(self, arg1, arg2=None, *args, **kwds):
+                    pass
+            self.assertSame(Foo(1), Foo(1))
+            self.assertSame(Foo(1,x="4"), Foo(1,x="4"))
+            foo = Foo(2)
+            self.assertSame(foo, Foo(2))
+            self.assertNotSame(Foo(1), Foo(2))
+            cache = metaclass.__call__._cache
+            for i in range(10):
+                Foo(i,i)
+            gc.collect()
+            # only the referenced (and the hot) instances are still cached
+            if metaclass is WeakMemento:
+                self.assertEquals(len(cache), 1)
+            else:
+                self.assertEquals(len(cache), 3)
+                self.assertSame(Foo(9,9), Foo(9,9))
+            self.assertSame(foo, Foo(2))
+
     def assertSame(self,x,y):
         self.assertEquals(id(x), id(y))
 
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+
+import os
+import shutil
+import tempfile
+import unittest
+from array import array
+
+from datastructs.mmaparraylist import *
+from datastructs import listmixin
+
+__author__ = "George Sakkis <gsakkis@rutgers.edu>"
+
+
+class MmapArrayListTestCase(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'items.dat')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_list_mixin(self):
+        listmixin.test_list_mixin(MmapArrayList)
+
+    def test_typecodes(self):
+        x = MmapArrayList([0.5, 1.5], 'd')
+        x.append(2)
+        self.assertEquals(list(x), [0.5, 1.5, 2.0])
+        self.assertEquals(x.itemsize, array('d').itemsize)
+        self.assertEquals(x[1:].typecode, 'd')
+        self.assertRaises(ValueError, MmapArrayList, [], 'u')
+        # typecodes of struct that are not typecodes of array
+        for typecode in 'q', 'Q', '?', '2i', 'x', '5s':
+            self.assertRaises(ValueError, MmapArrayList, [1, 2, 3], typecode)
+
+    def test_capacity(self):
+        x = MmapArrayList()
+        for i in xrange(1000):
+            x.append(i)
+        self.failUnless(1000 <= x._capacity < 2000)
+        del x[10:]
+        self.failUnless(x._capacity < 100)
+        self.assertEquals(list(x), range(10))
+
+    def test_view(self):
+        x = MmapArrayList(range(10), 'h')
+        view = x.view(2, 5)
+        self.assertEquals(len(view), 3 * x.itemsize)
+        self.assertEquals(str(view), array('h', [2,3,4]).tostring())
+        x[3] = 7
+        self.assertEquals(str(view), array('h', [2,7,4]).tostring())
+
+    def test_persistence(self):
+        x = MmapArrayList(range(100), 'l', self.path)
+        x[50:60] = []
+        x.close()
+        self.assertEquals(os.path.getsize(self.path), 90 * x.itemsize)
+        x = MmapArrayList([-1], 'l', self.path)
+        self.assertEquals(list(x), range(50) + range(60,100) + [-1])
+        x.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1312,6 +1312,32 @@ class TestVariousIteratorArgs(unittest.TestCase):
 
 #==============================================================================
 
+class TestInsertionOrder(unittest.TestCase):
+
+    def test_order(self):
+        s = set('abracadabra')
+        self.assertEqual(list(s), list('abrcd'))
+        s.add('z'); s.add('a')
+        s.remove('b'); s.discard('c'); s.discard('q')
+        self.assertEqual(list(s), list('ardz'))
+        self.assertEqual(s.pop(), 'z')
+        s.update('xb', 'ya')
+        self.assertEqual(list(s), list('ardxby'))
+        self.assertEqual(list(s | set('qa')), list('ardxbyq'))
+        self.assertEqual(list(s & set('yxa')), list('axy'))
+        self.assertEqual(list(s - set('yxa')), list('rdb'))
+        self.assertEqual(list(s ^ set('yqa')), list('rdxbq'))
+        s -= set('dx')
+        s &= set('raybz')
+        self.assertEqual(list(s), list('arby'))
+        self.assertEqual(list(s.copy()), list('arby'))
+        self.assertEqual(list(pickle.loads(pickle.dumps(s))), list('arby'))
+        s.clear()
+        s.add('c')
+        self.assertEqual(list(s), ['c'])
+
+#==============================================================================
+
 def test_main(verbose=None):
     import sys
     from test import test_sets
@@ -1347,6 +1373,7 @@ def test_main(verbose=None):
         TestCopyingNested,
         TestIdentities,
         TestVariousIteratorArgs,
+        TestInsertionOrder,
         )
 
     test_support.run_unittest(*test_classes)
@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+
+import random
+import unittest
+
+from datastructs.sortediters import *
+from datastructs.sortedsets import SortedSet
+
+__author__ = "George Sakkis <gsakkis@rutgers.edu>"
+
+
+class SortedItersTestCase(unittest.TestCase):
+    def setUp(self):
+        self.inputs = [sorted([random.randrange(100) for i in xrange(n)])
+                       for n in (0, 1, 30, 60, 200)]
+
+    def check(self, func, setfunc):
+        for k in 1, 2, 3:
+            for args in self._combinations(k):
+                expected = sorted(setfunc(*map(set, args)))
+                for wrap in list, tuple, iter, SortedSet:
+                    self.assertEquals(list(func(*map(wrap, args))), expected)
+
+    def _combinations(self, k):
+        if not k:
+            return [[]]
+        return [[x] + rest for x in self.inputs
+                for rest in self._combinations(k-1)]
+
+    def test_union(self):
+        self.check(union, set.union)
+        self.assertEquals(list(union()), [])
+
+    def test_intersection(self):
+        self.check(intersection, set.intersection)
+        self.assertEquals(list(intersection()), [])
+        # mixed sequences and iterators
+        self.assertEquals(list(intersection(iter([1,3,5,7]), xrange(0,10,3),
+                                            [1,3,4])), [3])
+
+    def test_difference(self):
+        self.check(difference, set.difference)
+
+    def test_symmetric_difference(self):
+        def odd(*sets):
+            return [x for x in set().union(*sets)
+                    if len([s for s in sets if x in s]) % 2]
+        self.check(symmetric_difference, odd)
+
+    def test_laziness(self):
+        def count():
+            i = 0
+            while True:
+                yield i
+                i += 1
+        self.assertEquals(list(intersection(count(), [5, 7, 10**6])),
+                          [5, 7, 10**6])
+        it = union(count(), count())
+        self.assertEquals([it.next() for i in xrange(3)], [0, 1, 2])
+
+
+if __name__ == '__main__':
+    unittest.main()
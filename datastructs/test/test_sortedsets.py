@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+
+import random
+import pickle
+import unittest
+
+import datastructs.sortedsets as sortedsets
+from datastructs.sortedsets import *
+
+__author__ = "George Sakkis <gsakkis@rutgers.edu>"
+
+
+class SortedTestCase(unittest.TestCase):
+    def setUp(self):
+        # small sublists to exercise splitting and merging
+        self._load = sortedsets._SortedList.LOAD
+        sortedsets._SortedList.LOAD = 4
+        self.elements = random.sample(xrange(1000), 200)
+
+    def tearDown(self):
+        sortedsets._SortedList.LOAD = self._load
+
+
+class SortedSetTestCase(SortedTestCase):
+    def test_order(self):
+        s = SortedSet(self.elements)
+        self.assertEquals(list(s), sorted(self.elements))
+        self.assertEquals(list(reversed(s)), sorted(self.elements)[::-1])
+        s.add(-1); s.add(1001); s.add(-1)
+        s.remove(self.elements[0]); s.discard(self.elements[1])
+        expected = sorted(self.elements[2:] + [-1, 1001])
+        self.assertEquals(list(s), expected)
+        self.assertEquals(s.pop(), 1001)
+        self.assertEquals(s.pop(0), -1)
+        self.assertRaises(KeyError, SortedSet().pop)
+        self.assertEquals(list(s & set(self.elements[:50])),
+                          sorted(self.elements[2:50]))
+        self.assertEquals(list(s | set([2000, -2000])),
+                          [-2000] + expected[1:-1] + [2000])
+        self.assertEquals(list(pickle.loads(pickle.dumps(s))), list(s))
+
+    def test_positions(self):
+        s = SortedSet(self.elements)
+        expected = sorted(self.elements)
+        for i in 0, 1, 57, 199, -1, -200:
+            self.assertEquals(s[i], expected[i])
+        self.assertEquals(s[10:20], expected[10:20])
+        self.assertRaises(IndexError, s.__getitem__, 200)
+        for i,elt in enumerate(expected):
+            self.assertEquals(s.index(elt), i)
+        self.assertRaises(ValueError, s.index, 1001)
+        self.assertEquals(s.bisect_left(expected[5]), 5)
+        self.assertEquals(s.bisect_right(expected[5]), 6)
+        self.assertEquals(s.bisect(-1), 0)
+        self.assertEquals(s.bisect(1001), 200)
+
+    def test_irange(self):
+        s = SortedSet(range(0, 100, 2))
+        self.assertEquals(list(s.irange(10, 20)), [10,12,14,16,18,20])
+        self.assertEquals(list(s.irange(9, 21)), [10,12,14,16,18,20])
+        self.assertEquals(list(s.irange(10, 20, (False,False))),
+                          [12,14,16,18])
+        self.assertEquals(list(s.irange(10, 20, reverse=True)),
+                          [20,18,16,14,12,10])
+        self.assertEquals(list(s.irange(maximum=4)), [0,2,4])
+        self.assertEquals(list(s.irange(95)), [96,98])
+        self.assertEquals(list(s.irange(20, 10)), [])
+
+    def test_update(self):
+        s = SortedSet(self.elements[:100])
+        s.update(self.elements[50:], [-5, -5])
+        self.assertEquals(list(s), sorted(self.elements + [-5]))
+        s.update([5000])
+        self.assertEquals(s[-1], 5000)
+        self.assertEquals(len(s), 202)
+
+
+class SortedDictTestCase(SortedTestCase):
+    def test_dict(self):
+        d = SortedDict([(x, str(x)) for x in self.elements], z=None)
+        keys = sorted(self.elements) + ['z']
+        self.assertEquals(d.keys(), keys)
+        self.assertEquals(d.values(), [d[key] for key in keys])
+        del d['z']
+        self.assertEquals(d.pop(keys[0]), str(keys[0]))
+        self.assertEquals(d.pop(-1, 'x'), 'x')
+        self.assertEquals(d.popitem(), (keys[-2], str(keys[-2])))
+        d.setdefault(-1, 'a')
+        d[2000] = 'b'
+        d.update({-1: 'c', 3000: 'd'})
+        self.assertEquals(d.items()[:1] + d.items()[-2:],
+                          [(-1,'c'), (2000,'b'), (3000,'d')])
+        self.assertEquals(len(d), len(keys))
+        self.assertEquals(list(reversed(d))[:2], [3000, 2000])
+        self.assertEquals(pickle.loads(pickle.dumps(d)).items(), d.items())
+        self.assertEquals(d.copy().keys(), d.keys())
+        d.clear()
+        self.assertEquals(d.keys(), [])
+
+    def test_positions(self):
+        d = SortedDict.fromkeys(self.elements, 0)
+        keys = sorted(self.elements)
+        self.assertEquals(d.peekitem(), (keys[-1], 0))
+        self.assertEquals(d.peekitem(3), (keys[3], 0))
+        self.assertEquals(d.index(keys[3]), 3)
+        self.assertRaises(KeyError, d.index, 1001)
+        self.assertEquals(d.bisect_left(keys[3]), 3)
+        self.assertEquals(d.bisect_right(keys[3]), 4)
+        self.assertEquals(list(d.irange(keys[3], keys[6], (False,True))),
+                          keys[4:7])
+
+
+if __name__ == '__main__':
+    unittest.main()
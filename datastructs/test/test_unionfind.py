@@ -1,6 +1,8 @@
 #!/usr/bin/env python
 
+import random
 import unittest
+import datastructs.unionfind
 from datastructs.unionfind import *
 
 __author__ = "George Sakkis <gsakkis@rutgers.edu>"
@@ -59,6 +61,196 @@ class UnionfindTestCase(unittest.TestCase):
         self.assertEquals(len(u.getSet(0)), 6)
         self.assertEquals(len(u.getSet(5)), 4)
         self.assertRaises(KeyError, u.getSet, 10)
+
+    def test_sets(self):
+        u = UnionFind().add(*range(10))
+        u.union(0,1,2)
+        u.union(3,4)
+        u.union(5,6,7,8)
+        u.union(3,0)
+        self.assertEquals(sorted(sorted(s) for s in u.iterSets()),
+                          [[0,1,2,3,4], [5,6,7,8], [9]])
+        for i,size in zip(range(10), [5]*5 + [4]*4 + [1]):
+            self.assertEquals(u.setSize(i), size)
+            self.assertEquals(len(u.getSet(i)), size)
+            self.failUnless(i in u.getSet(i))
+        self.assertRaises(KeyError, u.setSize, 10)
+        # repeated finds do not accumulate any bookkeeping
+        for i in xrange(100):
+            u.inSameSet(*range(10))
+        self.assertEquals(len(u._next), 10)
+        self.assertEquals(len(u._sizes), u.numSets())
+
+    def test_unionPairs(self):
+        u = UnionFind().add(*range(5))
+        self.assertEquals(u.unionPairs([0,2,5,6], [1,3,6,2]), u)
+        self.assertEquals(len(u), 7)
+        self.assertEquals(u.numSets(), 3)
+        self.failUnless(u.inSameSet(0,1))
+        self.failUnless(u.inSameSet(2,3,5,6))
+        roots = u.findMany([0,1,2,3,4,5,6])
+        self.assertEquals(roots, map(u.__getitem__, range(7)))
+        self.assertRaises(KeyError, u.findMany, [0,7])
+        labels = u.labels()
+        self.assertEquals(sorted(labels), range(7))
+        self.assertRaises(ValueError, u.unionPairs, [0,7], [4])
+        self.assertEquals((len(u), u.numSets()), (7, 3))
+        self.assertEquals(sorted(set(labels.values())), range(u.numSets()))
+        for i in labels:
+            for j in labels:
+                self.assertEquals(labels[i] == labels[j], u.inSameSet(i,j))
+
+
+class RollbackUnionfindTestCase(unittest.TestCase):
+    def test_union(self):
+        # a RollbackUnionFind behaves like a UnionFind
+        u,v = RollbackUnionFind(), UnionFind()
+        pairs = [(random.randrange(50),random.randrange(50))
+                 for i in xrange(40)]
+        for pair in pairs:
+            u.union(*pair); v.union(*pair)
+        self.assertEquals(len(u), len(v))
+        self.assertEquals(u.numSets(), v.numSets())
+        self.assertEquals(sorted(map(sorted, u.iterSets())),
+                          sorted(map(sorted, v.iterSets())))
+
+    def test_rollback(self):
+        u = RollbackUnionFind().add(*range(10))
+        start = u.checkpoint()
+        u.union(0,1,2)
+        u.union(3,4)
+        middle = u.checkpoint()
+        state = self._state(u)
+        u.union(2,3,10,11)
+        u.unionPairs([5,7], [6,8])
+        self.failUnless(u.inSameSet(0,4,11))
+        self.assertEquals(len(u), 12)
+        self.assertEquals(u.numSets(), 4)
+        self.assertEquals(u.rollback(middle), u)
+        self.assertEquals(self._state(u), state)
+        self.assertEquals(len(u), 10)
+        self.assertEquals(u.numSets(), 7)
+        self.assertEquals(u.setSize(0), 3)
+        self.failIf(u.inSameSet(0,4))
+        self.failIf(10 in u)
+        u.rollback(start)
+        self.assertEquals(u.numSets(), 10)
+        self.assertEquals(sorted(map(list, u.iterSets())),
+                          [[i] for i in range(10)])
+        u.rollback(0)
+        self.assertEquals(len(u), 0)
+        self.assertRaises(ValueError, u.rollback, middle)
+        self.assertRaises(ValueError, u.rollback, -1)
+
+    def _state(self, u):
+        return [dict(d) for d in u._parents, u._next, u._ranks, u._sizes]
+
+
+class IntUnionfindTestCase(unittest.TestCase):
+    def test_init(self):
+        u = IntUnionFind(10)
+        self.assertEquals(len(u), 10)
+        self.assertEquals(u.numSets(), 10)
+        self.assertEquals(list(u), range(10))
+        for i in u:
+            self.assertEquals(u[i], i)
+            for j in u:
+                self.failUnless(i != j ^ u.inSameSet(i,j))
+        for i in -1, 10, 11:
+            self.assertRaises(KeyError, u.__getitem__, i)
+
+    def test_union(self):
+        u = IntUnionFind(10)
+        self.assertEquals(u.union(), u)
+        self.assertEquals(u.union(1), u)
+        self.assertRaises(KeyError, u.union, 10)
+        self.failIf(u.inSameSet(0,1))
+        u.union(0,1)
+        self.failUnless(u.inSameSet(0,1))
+        self.assertEquals(u.numSets(), 9)
+        u.union(2,3,4)
+        u.union(5,6,7,8)
+        self.failUnless(u.inSameSet(2,3,4))
+        self.failUnless(u.inSameSet(5,6,7,8))
+        self.failIf(u.inSameSet(2,5))
+        self.assertEquals(u.numSets(), 4)
+        # uniting items already in the same set has no effect
+        u.union(8,5,7)
+        self.assertEquals(u.numSets(), 4)
+        u.union(0,2,9)
+        self.failUnless(u.inSameSet(0,1,2,3,4,9))
+        self.assertEquals(u.numSets(), 2)
+        self.assertEquals(len(u), 10)
+
+    def test_long_chain(self):
+        n = 1000
+        u = IntUnionFind(n)
+        for i in xrange(1,n):
+            u.union(i-1,i)
+        self.assertEquals(u.numSets(), 1)
+        self.failUnless(u.inSameSet(*range(n)))
+
+    def test_batch(self):
+        # test both the pure python and the numpy (if installed) versions
+        numpy = datastructs.unionfind.numpy
+        try:
+            datastructs.unionfind.numpy = None
+            self._test_batch()
+        finally:
+            datastructs.unionfind.numpy = numpy
+        if numpy is not None:
+            self._test_batch()
+            pairs = numpy.array([[0,1],[5,4]])
+            u = IntUnionFind(6).unionPairs(pairs[:,0], pairs[:,1])
+            self.assertEquals(list(u.labels()), [0,0,1,2,3,3])
+
+    def _test_batch(self):
+        n = 200
+        lefts = [random.randrange(n) for i in xrange(n//2)]
+        rights = [random.randrange(n) for i in xrange(n//2)]
+        u = IntUnionFind(n)
+        self.assertEquals(u.unionPairs(lefts, rights), u)
+        expected = IntUnionFind(n)
+        for pair in zip(lefts, rights):
+            expected._union(*pair)
+        self.assertEquals(u.numSets(), expected.numSets())
+        labels = u.labels()
+        self.assertEquals(len(labels), n)
+        self.assertEquals(sorted(set(labels)), range(u.numSets()))
+        self.assertEquals(labels[0], 0)
+        for i in xrange(n):
+            for j in xrange(n):
+                self.assertEquals(labels[i] == labels[j],
+                                  expected.inSameSet(i,j))
+        roots = u.findMany(xrange(n))
+        self.assertEquals(list(roots), map(u.__getitem__, xrange(n)))
+        sizes = {}
+        for root in roots:
+            sizes[root] = sizes.get(root,0) + 1
+        for root,size in sizes.iteritems():
+            self.assertEquals(u.setSize(root), size)
+        self.assertEquals(list(IntUnionFind(3).labels()), [0,1,2])
+        self.assertEquals(list(IntUnionFind(0).labels()), [])
+        self.assertEquals(IntUnionFind(3).unionPairs([], []).numSets(), 3)
+        self.assertRaises(KeyError, u.findMany, [0,n])
+        self.assertRaises(KeyError, u.unionPairs, [0], [-1])
+        numSets = u.numSets()
+        self.assertRaises(ValueError, u.unionPairs, [0,1], [2])
+        self.assertEquals(u.numSets(), numSets)
+        # batches of all sizes, below and above the numpy threshold
+        n = 2000
+        u,expected = IntUnionFind(n),IntUnionFind(n)
+        for size in 1, 3, 150, 1, 40, 600, 2, 300, 1, 1000:
+            lefts = [random.randrange(n) for i in xrange(size)]
+            rights = [random.randrange(n) for i in xrange(size)]
+            u.unionPairs(lefts, rights)
+            for pair in zip(lefts, rights):
+                expected._union(*pair)
+            self.assertEquals(u.numSets(), expected.numSets())
+            for i in xrange(n):
+                self.assertEquals(u.setSize(i), expected.setSize(i))
+            self.assertEquals(list(u.labels()), list(expected.labels()))
         
+
 if __name__ == '__main__':
     unittest.main()        
@@ -1,7 +1,17 @@
 '''A disjoint-sets implementation as a union-find data structure.'''
 
 __author__ = "George Sakkis <gsakkis@rutgers.edu>"
-__all__ = ["UnionFind"]
+__all__ = ["UnionFind", "RollbackUnionFind", "IntUnionFind"]
+
+from array import array
+from itertools import izip,imap
+
+try: import numpy
+except ImportError:
+    numpy = None
+
+# the minimum number of pairs that IntUnionFind.unionPairs joins with numpy
+_NUMPY_MIN_PAIRS = 100
 
 
 class UnionFind:
@@ -12,6 +22,9 @@ class UnionFind:
     the L{union} of two or more sets B{in-place}. No other set operation except
     for union is implemented by this class; however L{getSet} can be called to
     get a L{sets.Set} instance representing the set an item belongs to.
+
+    The members of each set are linked in a circular list, so L{getSet} takes
+    time proportional to the size of the set and L{setSize} constant time.
     '''
     
     def __init__(self):
@@ -19,9 +32,12 @@ class UnionFind:
         self._ranks = {}
         # self._parents: maps each object to its parent in the union-find forest
         self._parents = {}
-        # self._descendants: maps each object that is currently a root in the
-        # the union-find forest to the list of its descendants
-        self._descendants = {}
+        # self._next: maps each object to the next member of its set; the
+        # members of each set form a circular linked list
+        self._next = {}
+        # self._sizes: maps each object that is currently a root in the
+        # union-find forest to the size of its set
+        self._sizes = {}
     
     def add(self, *objects):
         '''Add each object in a new singleton set.
@@ -32,7 +48,9 @@ class UnionFind:
         for object in objects:
             if object not in self._parents:
                 self._parents[object] = object
+                self._next[object] = object
                 self._ranks[object] = 0
+                self._sizes[object] = 1
         return self
     
     def inSameSet(self, *objects):
@@ -55,14 +73,22 @@ class UnionFind:
     def __iter__(self):
         '''Return an iterator over the elements of this UnionFind.'''
         return iter(self._parents)
+
+    def __contains__(self, object):
+        '''Check if the object is in this UnionFind.'''
+        return object in self._parents
         
     def numSets(self):
         '''Return the number of sets in this UnionFind.'''
         return len(self._ranks)
     
     def iterSets(self):
-        '''Return an iterator over the disjoint sets of this UnionFind.'''
-        return iter([self.getSet(x) for x in self._ranks])
+        '''Return an iterator over the disjoint sets of this UnionFind.
+
+        The sets are created lazily; the UnionFind must not be modified while
+        iterating.
+        '''
+        return imap(self.getSet, self._ranks)
     
     def getSet(self,object):
         '''Return the set that the given object belongs to.
@@ -71,10 +97,14 @@ class UnionFind:
         @rtype: sets.Set
         '''
         import sets
-        parent = self[object]
-        set = sets.Set(self._descendants[parent])
-        set.add(parent)
-        return set
+        return sets.Set(self._iterMembers(self[object]))
+
+    def setSize(self, object):
+        '''Return the size of the set that the given object belongs to.
+
+        @raise KeyError: If the object is not in this UnionFind.
+        '''
+        return self._sizes[self[object]]
 
     def __getitem__(self, object):
         '''Find the representative of the set that the object is in.
@@ -91,7 +121,6 @@ class UnionFind:
             current = parent
         for node in pathToRoot:
             self._parents[node] = current
-        self._descendants.setdefault(current,[]).extend(pathToRoot)
         return current
     
     def __str__(self):
@@ -129,20 +158,399 @@ class UnionFind:
         '''
         # make sure the objects are in this UnionFind
         for object in object1,object2:
-            if object not in self:
+            if object not in self._parents:
                 self.add(object)
-        highRankedRoot,lowRankedRoot = self[object1],self[object2]
-        if highRankedRoot != lowRankedRoot:
-            highRank,lowRank = self._ranks[highRankedRoot],self._ranks[lowRankedRoot]
-            if lowRank > highRank:
-                highRankedRoot,lowRankedRoot = lowRankedRoot,highRankedRoot
-            self._parents[lowRankedRoot] = highRankedRoot
-            self._descendants[highRankedRoot].append(lowRankedRoot)
-            try:
-                lowChildren = self._descendants.pop(lowRankedRoot)
-                self._descendants[highRankedRoot] += lowChildren
-            except KeyError: pass
-            if lowRank == highRank:
-                self._ranks[highRankedRoot] += 1
-            del self._ranks[lowRankedRoot]
+        root1,root2 = self[object1],self[object2]
+        if root1 != root2:
+            self._link(root1,root2)
+        return self
+
+    def unionPairs(self, lefts, rights):
+        '''Join the sets of each pair of objects C{(lefts[i], rights[i])}.
+
+        This is equivalent to calling C{self.union(x,y)} for each C{(x,y)} in
+        C{izip(lefts,rights)} but it processes all the pairs in a single loop.
+        Any object that is not in this UnionFind is first L{added <add>}.
+        @param lefts,rights: Equal length sequences of objects.
+        @raise ValueError: If C{lefts} and C{rights} have different lengths.
+        @return: self
+        '''
+        _checkLengths(lefts, rights)
+        parents,add = self._parents,self.add
+        find,link = self.__getitem__,self._link
+        for object1,object2 in izip(lefts,rights):
+            if object1 not in parents:
+                add(object1)
+            if object2 not in parents:
+                add(object2)
+            root1,root2 = find(object1),find(object2)
+            if root1 != root2:
+                link(root1,root2)
+        return self
+
+    def findMany(self, objects):
+        '''Return a list of the representatives of the given objects.
+
+        @raise KeyError: If any object is not in this UnionFind.
+        '''
+        return map(self.__getitem__, objects)
+
+    def labels(self):
+        '''Return a dict that maps each element to the (0-based) index of its
+        set.
+
+        The indexes are compact, i.e. they are C{range(self.numSets())}.
+        '''
+        find = self.__getitem__
+        root2label = {}; labels = {}
+        for object in self._parents:
+            labels[object] = root2label.setdefault(find(object),
+                                                   len(root2label))
+        return labels
+
+    def _link(self, highRankedRoot, lowRankedRoot):
+        '''Join the sets of two distinct roots, using union by rank.'''
+        highRank,lowRank = self._ranks[highRankedRoot],self._ranks[lowRankedRoot]
+        if lowRank > highRank:
+            highRankedRoot,lowRankedRoot = lowRankedRoot,highRankedRoot
+        self._parents[lowRankedRoot] = highRankedRoot
+        # splice the two circular member lists into one
+        next = self._next
+        next[highRankedRoot],next[lowRankedRoot] = \
+            next[lowRankedRoot],next[highRankedRoot]
+        self._sizes[highRankedRoot] += self._sizes.pop(lowRankedRoot)
+        if lowRank == highRank:
+            self._ranks[highRankedRoot] += 1
+        del self._ranks[lowRankedRoot]
+
+    def _iterMembers(self, object):
+        '''Iterate over the members of the set of the given object.'''
+        next = self._next
+        current = object
+        while True:
+            yield current
+            current = next[current]
+            if current == object:
+                break
+
+
+class RollbackUnionFind(UnionFind):
+    '''A union-find data structure whose changes can be undone.
+
+    Every L{add} and every union that joins two distinct sets is recorded in a
+    stack of changes. L{checkpoint} marks the current state and L{rollback}
+    restores a marked state in time proportional to the number of changes
+    since then, instead of copying the whole structure.
+
+    To make the changes reversible, finds do not compress paths; union by
+    rank alone keeps the trees at logarithmic height.
+    '''
+
+    def __init__(self):
+        '''Create an empty rollback union find data structure.'''
+        UnionFind.__init__(self)
+        # self._changes: stack of the changes since the creation; each one is
+        # either (object,) for an addition or a (lowRankedRoot,
+        # highRankedRoot, lowRank, lowSize, rankIncreased) tuple for a link
+        self._changes = []
+
+    def add(self, *objects):
+        '''Add each object in a new singleton set.
+
+        It has no effect on objects already in this UnionFind.
+        @return: self
+        '''
+        for object in objects:
+            if object not in self._parents:
+                UnionFind.add(self, object)
+                self._changes.append((object,))
+        return self
+
+    def checkpoint(self):
+        '''Return a marker of the current state, to be passed to L{rollback}.'''
+        return len(self._changes)
+
+    def rollback(self, checkpoint):
+        '''Undo all the changes made after the given checkpoint.
+
+        Rolling back to a checkpoint invalidates all the checkpoints taken
+        after it.
+        @param checkpoint: A value returned by L{checkpoint}.
+        @raise ValueError: If the checkpoint is no longer valid.
+        @return: self
+        '''
+        changes = self._changes
+        if not 0 <= checkpoint <= len(changes):
+            raise ValueError('Invalid checkpoint: %r' % checkpoint)
+        parents,next = self._parents,self._next
+        ranks,sizes = self._ranks,self._sizes
+        while len(changes) > checkpoint:
+            change = changes.pop()
+            if len(change) == 1:
+                object = change[0]
+                del parents[object], next[object], ranks[object], sizes[object]
+            else:
+                low,high,lowRank,lowSize,rankIncreased = change
+                parents[low] = low
+                next[high],next[low] = next[low],next[high]
+                sizes[high] -= lowSize
+                sizes[low] = lowSize
+                ranks[low] = lowRank
+                if rankIncreased:
+                    ranks[high] -= 1
+        return self
+
+    def __getitem__(self, object):
+        '''Find the representative of the set that the object is in.
+
+        The object must be hashable.
+        @raise KeyError: If the object is not in this UnionFind.
+        '''
+        parents = self._parents
+        parent = parents[object]
+        while parent != object:
+            object = parent
+            parent = parents[object]
+        return object
+
+    def _link(self, highRankedRoot, lowRankedRoot):
+        ranks = self._ranks
+        highRank,lowRank = ranks[highRankedRoot],ranks[lowRankedRoot]
+        if lowRank > highRank:
+            highRankedRoot,lowRankedRoot = lowRankedRoot,highRankedRoot
+            highRank,lowRank = lowRank,highRank
+        self._changes.append((lowRankedRoot, highRankedRoot, lowRank,
+                              self._sizes[lowRankedRoot], lowRank == highRank))
+        UnionFind._link(self, highRankedRoot, lowRankedRoot)
+
+
+class IntUnionFind:
+    '''A union-find data structure over the dense integers C{0..n-1}.
+
+    This provides the same interface as L{UnionFind} for the special (but
+    common) case that the elements are the integers of C{xrange(n)}, fixed
+    at construction time. Parents and set sizes are stored in two C{array}s
+    instead of dicts, so it needs only two machine words per element. Finds
+    use path halving and unions link the smaller set under the larger one.
+
+    The batch methods L{unionPairs}, L{findMany} and L{labels} use C{numpy}
+    (if it is installed) to process whole arrays of elements at once;
+    L{unionPairs} touches only the sets of the given pairs, and joins small
+    batches one pair at a time.
+    '''
+
+    def __init__(self, n):
+        '''Create a union find data structure of C{n} singleton sets.'''
+        self._parents = array('l', xrange(n))
+        self._sizes = array('l', [1]) * n
+        self._numSets = n
+
+    def inSameSet(self, *objects):
+        '''Check if all the objects are in the same set.
+
+        @raise KeyError: If any object is not in this IntUnionFind.
+        @rtype: bool
+        '''
+        if objects:
+            parent = self[objects[0]]
+            for object in objects[1:]:
+                if self[object] != parent:
+                    return False
+        return True
+
+    def __len__(self):
+        '''Return the number of elements in this IntUnionFind.'''
+        return len(self._parents)
+
+    def __iter__(self):
+        '''Return an iterator over the elements of this IntUnionFind.'''
+        return iter(xrange(len(self._parents)))
+
+    def numSets(self):
+        '''Return the number of sets in this IntUnionFind.'''
+        return self._numSets
+
+    def setSize(self, object):
+        '''Return the size of the set that the given object belongs to.
+
+        @raise KeyError: If the object is not in this IntUnionFind.
+        '''
+        return self._sizes[self[object]]
+
+    def __getitem__(self, object):
+        '''Find the representative of the set that the object is in.
+
+        @raise KeyError: If the object is not an integer in C{[0,len(self))}.
+        '''
+        parents = self._parents
+        if not 0 <= object < len(parents):
+            raise KeyError(object)
+        while True:
+            parent = parents[object]
+            if parent == object:
+                return object
+            # path halving: point to the grandparent and skip to it
+            grandparent = parents[object] = parents[parent]
+            object = grandparent
+
+    def __str__(self):
+        return ", ".join(["%s->%s" % pair for pair in enumerate(self._parents)])
+
+    def union(self, *objects):
+        '''Join the sets that contain the given objects.
+
+        @raise KeyError: If any object is not in this IntUnionFind.
+        @return: self
+        '''
+        if len(objects) == 1:
+            self[objects[0]]
+        for object in objects[1:]:
+            self._union(objects[0], object)
+        return self
+
+    def _union(self, object1, object2):
+        root1,root2 = self[object1],self[object2]
+        if root1 != root2:
+            sizes = self._sizes
+            if sizes[root1] < sizes[root2]:
+                root1,root2 = root2,root1
+            self._parents[root2] = root1
+            sizes[root1] += sizes[root2]
+            self._numSets -= 1
+        return self
+
+    def unionPairs(self, lefts, rights):
+        '''Join the sets of each pair of objects C{(lefts[i], rights[i])}.
+
+        @param lefts,rights: Equal length sequences of integers (or C{numpy}
+            arrays).
+        @raise KeyError: If any object is not in this IntUnionFind.
+        @raise ValueError: If C{lefts} and C{rights} have different lengths.
+        @return: self
+        '''
+        _checkLengths(lefts, rights)
+        if numpy is not None and len(lefts) >= _NUMPY_MIN_PAIRS:
+            return self._numpyUnionPairs(lefts, rights)
+        find = self.__getitem__
+        parents,sizes = self._parents,self._sizes
+        for object1,object2 in izip(lefts,rights):
+            root1,root2 = find(object1),find(object2)
+            if root1 != root2:
+                if sizes[root1] < sizes[root2]:
+                    root1,root2 = root2,root1
+                parents[root2] = root1
+                sizes[root1] += sizes[root2]
+                self._numSets -= 1
+        return self
+
+    def findMany(self, objects):
+        '''Return an C{array('l')} of the representatives of the given
+        objects.
+
+        @raise KeyError: If any object is not in this IntUnionFind.
+        '''
+        if numpy is not None:
+            objects = self._numpyIndices(objects)
+            roots = _findRoots(self._numpyParents(), objects)
+            return array('l', roots.tostring())
+        return array('l', map(self.__getitem__, objects))
+
+    def labels(self):
+        '''Return an C{array('l')} of the (0-based) set index of each element.
+
+        The indexes are compact, i.e. they are C{range(self.numSets())}, and
+        numbered in the order of the sets' smallest element.
+        '''
+        if numpy is not None:
+            parents = self._numpyParents()
+            _jumpToRoots(parents)
+            roots,firsts,inverse = numpy.unique(parents, return_index=True,
+                                                return_inverse=True)
+            # renumber the sets by their smallest element
+            root2label = numpy.empty(len(roots), dtype='l')
+            root2label[numpy.argsort(firsts)] = numpy.arange(len(roots))
+            return array('l', root2label[inverse].tostring())
+        find = self.__getitem__
+        root2label = {}; labels = array('l')
+        for object in xrange(len(self._parents)):
+            labels.append(root2label.setdefault(find(object), len(root2label)))
+        return labels
+
+    def _numpyUnionPairs(self, lefts, rights):
+        lefts,rights = self._numpyIndices(lefts),self._numpyIndices(rights)
+        parents = self._numpyParents()
+        sizes = numpy.frombuffer(self._sizes, dtype='l')
+        # only the roots of the paired objects are touched: number them
+        # locally, the largest set first, and union the local numbers
+        roots = _findRoots(parents, numpy.concatenate((lefts,rights)))
+        touched,local = numpy.unique(roots, return_inverse=True)
+        order = numpy.argsort(-sizes[touched], kind='mergesort')
+        touched = touched[order]
+        rank = numpy.empty(len(order), dtype='l')
+        rank[order] = numpy.arange(len(order))
+        local = rank[local]
+        locals1,locals2 = local[:len(lefts)],local[len(lefts):]
+        # hook-and-jump: hook the larger of each pair of distinct local roots
+        # under the smallest one it is paired with, flatten all trees by
+        # pointer jumping and repeat for the pairs that are still apart; the
+        # smallest local number of each set is its largest old root (union
+        # by size)
+        merged = numpy.arange(len(touched))
+        while True:
+            _jumpToRoots(merged)
+            roots1,roots2 = merged[locals1],merged[locals2]
+            apart = roots1 != roots2
+            if not apart.any():
+                break
+            locals1,locals2 = locals1[apart],locals2[apart]
+            roots1,roots2 = roots1[apart],roots2[apart]
+            numpy.minimum.at(merged, numpy.maximum(roots1,roots2),
+                             numpy.minimum(roots1,roots2))
+        newSizes = numpy.zeros(len(touched), dtype='l')
+        numpy.add.at(newSizes, merged, sizes[touched])
+        parents[touched] = touched[merged]
+        sizes[touched] = newSizes
+        self._numSets -= int((newSizes == 0).sum())
         return self
+
+    def _numpyParents(self):
+        # a writable view of self._parents; it never copies
+        if not self._parents:
+            return numpy.zeros(0, dtype='l')
+        return numpy.frombuffer(self._parents, dtype='l')
+
+    def _numpyIndices(self, objects):
+        if isinstance(objects, numpy.ndarray):
+            objects = objects.astype('l', copy=False)
+        else:
+            objects = numpy.fromiter(objects, dtype='l')
+        if len(objects):
+            for object in objects.min(), objects.max():
+                if not 0 <= object < len(self._parents):
+                    raise KeyError(object)
+        return objects
+
+
+def _checkLengths(lefts, rights):
+    if len(lefts) != len(rights):
+        raise ValueError('lefts and rights must have the same length')
+
+
+def _findRoots(parents, objects):
+    '''Return a numpy array of the roots of the given objects in a numpy
+    parents array, following only the paths from these objects.'''
+    roots = parents[objects]
+    while True:
+        grandparents = parents[roots]
+        if (grandparents == roots).all():
+            return roots
+        roots = grandparents
+
+
+def _jumpToRoots(parents):
+    '''Point every element of a numpy parents array directly to its root.'''
+    while True:
+        grandparents = parents[parents]
+        if (grandparents == parents).all():
+            break
+        parents[:] = grandparents